@@ -2,8 +2,8 @@ import json
 import logging.config
 import os
 import uuid
+from typing import Callable, Dict, List
 
-import time
 from cltl.chatui.api import Chats
 from cltl.chatui.memory import MemoryChats
 from cltl.combot.event.bdi import IntentionEvent, Intention
@@ -29,7 +29,18 @@ from flask import Flask
 from werkzeug.middleware.dispatcher import DispatcherMiddleware
 from werkzeug.serving import run_simple
 
+from app_service.admin.service import AdminService
+from app_service.chatui.admission import AdmissionControl
 from app_service.context.service import ContextService
+from app_service.event_bus.lanes import PriorityEventBus, TopicLanes
+from app_service.event_bus.observed import ObservedEventBus, ProcessObserver
+from app_service.event_bus.routed import RoutedKombuEventBus, TenantContext
+from app_service.event_log.policy import EventLogPolicy, PolicyLogWriter
+from app_service.event_log.writer import BufferedLogWriter
+from app_service.health.checks import event_bus_connected, topic_workers_alive, topic_workers_idle
+from app_service.health.service import HealthService
+from app_service.metrics.collector import MetricsCollector, MetricsEventBus
+from app_service.metrics.service import MetricsService
 
 os.environ["CLTL_TENANT"] = str(uuid.uuid4())
 logging.config.fileConfig(os.environ.get('CLTL_LOGGING_CONFIG', default='config/logging.config'),
@@ -64,18 +75,79 @@ class InfraContainer(KombuEventBusContainer, K8LocalConfigurationContainer, Thre
     def event_bus(self):
         config = self.config_manager.get_config("cltl.event")
         implementation = config.get("implementation")
+        routed_event_bus = None
         if implementation == "internal":
-            return SynchronousEventBus()
+            event_bus = SynchronousEventBus()
         elif implementation == "kombu":
-            return super().event_bus
+            kombu_config = self.config_manager.get_config("cltl.event.kombu")
+            if "routing" in kombu_config and kombu_config.get("routing") == "tenant":
+                routed_event_bus = RoutedKombuEventBus.from_config(self.event_bus_serializer, self.config_manager,
+                                                                    self.topic_lanes)
+                event_bus = routed_event_bus
+            else:
+                event_bus = super().event_bus
         else:
             raise ValueError("Unknown implementation: " + implementation)
 
+        if self.topic_lanes:
+            lane_latency = self.metrics_service.collector.lane_latency if self.metrics_service else None
+            event_bus = PriorityEventBus(event_bus, self.topic_lanes, observer=lane_latency)
+
+        if self.metrics_service:
+            event_bus = MetricsEventBus(event_bus, self.metrics_service.collector)
+
+        # The tenant is entered before the other observers are notified
+        observers = [TenantContext(routed_event_bus)] if routed_event_bus else []
+
+        return ObservedEventBus(event_bus, observers + self.process_observers())
+
+    def process_observers(self) -> List[ProcessObserver]:
+        return [self.metrics_service.collector] if self.metrics_service else []
+
+    @property
+    @singleton
+    def topic_lanes(self) -> TopicLanes:
+        config = self.config_manager.get_config("cltl.event.lanes")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return TopicLanes.from_config(self.config_manager)
+
+    @property
+    @singleton
+    def admin_service(self):
+        config = self.config_manager.get_config("app.admin")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return AdminService.from_config(self.config_manager)
+
+    @property
+    @singleton
+    def health_service(self) -> HealthService:
+        return HealthService.from_config(self.readiness_checks(), lambda: topic_workers_idle(self.event_bus), self.config_manager)
+
+    @property
+    @singleton
+    def metrics_service(self):
+        config = self.config_manager.get_config("app.metrics")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return MetricsService(MetricsCollector())
+
+    def readiness_checks(self) -> Dict[str, Callable[[], bool]]:
+        return {
+            "event_bus": lambda: event_bus_connected(self.event_bus),
+            "topic_workers": lambda: topic_workers_alive(self),
+        }
+
     def start(self):
         pass
 
     def stop(self):
-        pass
+        if self.admin_service:
+            self.admin_service.stop()
 
 
 class EmissorStorageContainer(InfraContainer):
@@ -93,7 +165,8 @@ class EmissorStorageContainer(InfraContainer):
     @property
     @singleton
     def emissor_data_client(self) -> EmissorDataClient:
-        return EmissorDataClient("http://0.0.0.0:8000/emissor")
+        port = self.config_manager.get_config("app.server").get_int("port")
+        return EmissorDataClient(f"http://0.0.0.0:{port}/emissor")
 
     def start(self):
         logger.info("Start Emissor Data Storage")
@@ -157,13 +230,34 @@ class ChatUIContainer(InfraContainer):
     def chatui_service(self) -> ChatUiService:
         return ChatUiService.from_config(MemoryChats(), self.event_bus, self.resource_manager, self.config_manager)
 
+    @property
+    @singleton
+    def admission_control(self) -> AdmissionControl:
+        config = self.config_manager.get_config("app.admission")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return AdmissionControl.from_config(self.event_bus, self.config_manager)
+
+    @property
+    @singleton
+    def chatui_app(self):
+        if not self.admission_control:
+            return self.chatui_service.app
+
+        return self.admission_control.wrap(self.chatui_service.app)
+
     def start(self):
         logger.info("Start Chat UI")
         super().start()
         self.chatui_service.start()
+        if self.admission_control:
+            self.admission_control.start()
 
     def stop(self):
         logger.info("Stop Chat UI")
+        if self.admission_control:
+            self.admission_control.stop()
         self.chatui_service.stop()
         super().stop()
 
@@ -174,8 +268,13 @@ class ApplicationContainer(AppComponentsContainer, ChatUIContainer, EmissorStora
     def log_writer(self):
         config = self.config_manager.get_config("cltl.event_log")
 
-        # Serialize in a plain JSON format
-        return LogWriter(config.get("log_dir"), emissor_serializer)
+        if "writer" in config and config.get("writer") == "buffered":
+            writer = BufferedLogWriter.from_config(emissor_serializer, self.config_manager)
+        else:
+            # Serialize in a plain JSON format
+            writer = LogWriter(config.get("log_dir"), emissor_serializer)
+
+        return PolicyLogWriter(writer, EventLogPolicy.from_config(emissor_serializer, self.config_manager))
 
     @property
     @singleton
@@ -185,12 +284,18 @@ class ApplicationContainer(AppComponentsContainer, ChatUIContainer, EmissorStora
     def start(self):
         logger.info("Start EventLog")
         super().start()
+        if isinstance(self.log_writer.writer, BufferedLogWriter):
+            self.log_writer.writer.start()
         self.event_log_service.start()
+        self.health_service.set_started()
 
     def stop(self):
+        self.health_service.set_started(False)
         try:
             logger.info("Stop EventLog")
             self.event_log_service.stop()
+            if isinstance(self.log_writer.writer, BufferedLogWriter):
+                self.log_writer.writer.stop()
         finally:
             try:
                 logger.info("Stop EventBus")
@@ -207,18 +312,28 @@ def main():
 
     with application as started_app:
         logger.info("Starting the application")
-        time.sleep(1)
 
-        intention_topic = started_app.config_manager.get_config("cltl.bdi").get("topic_intention")
-        init_event = Event.for_payload(IntentionEvent([Intention("init", None)]))
-        started_app.event_bus.publish(intention_topic, init_event)
+        def init():
+            intention_topic = started_app.config_manager.get_config("cltl.bdi").get("topic_intention")
+            init_event = Event.for_payload(IntentionEvent([Intention("init", None)]))
+            started_app.event_bus.publish(intention_topic, init_event)
+
+            logger.info("Started 'init' intention")
 
-        logger.info("Started 'init' intention")
+        # Publish the init intention once ready, /health serves readiness while waiting
+        started_app.health_service.when_ready(init)
 
         routes = {
             '/emissor': started_app.emissor_data_service.app,
-            '/chatui': started_app.chatui_service.app,
+            '/chatui': started_app.chatui_app,
+            '/health': started_app.health_service.app,
         }
+        if started_app.admin_service:
+            routes['/admin'] = started_app.admin_service.app
+        if started_app.admission_control:
+            routes['/admission'] = started_app.admission_control.app
+        if started_app.metrics_service:
+            routes['/metrics'] = started_app.metrics_service.app
 
         web_app = DispatcherMiddleware(Flask("Chat UI app"), routes)
 
@@ -228,7 +343,7 @@ def main():
         intention_topic = started_app.config_manager.get_config("cltl.bdi").get("topic_intention")
         termination_event = Event.for_payload(IntentionEvent([Intention("terminate", None)]))
         started_app.event_bus.publish(intention_topic, termination_event)
-        time.sleep(1)
+        started_app.health_service.wait_idle()
 
 
 if __name__ == '__main__':
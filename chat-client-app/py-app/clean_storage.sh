@@ -4,6 +4,8 @@
 rm -f *.wav
 
 rm -f storage/event_log/*.json
+rm -f storage/event_log/*.jsonl
+rm -f storage/event_log/*.jsonl.gz
 
 rm -f storage/audio/*.wav
 rm -f storage/audio/*.json
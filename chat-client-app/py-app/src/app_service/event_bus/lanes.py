@@ -0,0 +1,120 @@
+import functools
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from cltl.combot.infra.config import ConfigurationManager
+from cltl.combot.infra.event import Event, EventBus
+
+logger = logging.getLogger(__name__)
+
+
+CONTROL = "control"
+DEFAULT = "default"
+MEDIA = "media"
+
+
+class TopicLanes:
+    """Assigns topics to the *control* and *media* lanes, all other topics are in the *default* lane."""
+    @classmethod
+    def from_config(cls, config_manager: ConfigurationManager):
+        config = config_manager.get_config("cltl.event.lanes")
+
+        return cls({lane: config.get(lane, multi=True) for lane in (CONTROL, MEDIA) if lane in config})
+
+    def __init__(self, topics: Dict[str, Iterable[str]]):
+        self._lanes = {topic: lane for lane, lane_topics in topics.items() for topic in lane_topics if topic}
+
+    def lane(self, topic: str) -> str:
+        return self._lanes.get(topic, DEFAULT)
+
+
+class _LaneDispatcher:
+    """Delivers the events of one lane to their handlers on its own thread."""
+    def __init__(self, lane: str, queue_size: int, observer: Optional[Callable[[str, float], None]]):
+        self._lane = lane
+        self._observer = observer
+        self._events = queue.Queue(queue_size)
+        self._thread = threading.Thread(target=self._dispatch, name=f"PriorityEventBus-{lane}", daemon=True)
+        self._thread.start()
+
+    def put(self, handler: Callable[[Event], None], event: Event):
+        self._events.put((time.monotonic(), handler, event))
+
+    def close(self):
+        self._events.put(None)
+        self._thread.join()
+
+    def _dispatch(self):
+        while True:
+            item = self._events.get()
+            if item is None:
+                return
+
+            enqueued, handler, event = item
+            if self._observer:
+                self._observer(self._lane, time.monotonic() - enqueued)
+            try:
+                handler(event)
+            except Exception:
+                logger.exception("Failed to deliver event %s in lane %s", event.id, self._lane)
+
+
+class PriorityEventBus(EventBus):
+    """Decorates an :class:`EventBus` to deliver events in the lane of their topic.
+
+    Each lane delivers its events to the subscribers on its own thread from a
+    queue of at most *queue_size* events, such that a backlog of media events or
+    a subscriber that blocks on them does not delay the delivery of control
+    events. Events are published in the thread of the caller. The time events
+    wait for delivery is reported to the *observer* per lane.
+    """
+    def __init__(self, event_bus: EventBus, lanes: TopicLanes, queue_size: int = 1000,
+                 observer: Optional[Callable[[str, float], None]] = None):
+        self._event_bus = event_bus
+        self._lanes = lanes
+        self._queue_size = queue_size
+        self._observer = observer
+        self._handlers = dict()
+        self._dispatchers = dict()
+        self._dispatchers_lock = threading.Lock()
+
+    def publish(self, topic: str, event: Event):
+        self._event_bus.publish(topic, event)
+
+    def subscribe(self, topic, handler):
+        dispatcher = self._dispatcher(self._lanes.lane(topic))
+
+        @functools.wraps(handler)
+        def lane_handler(event):
+            dispatcher.put(handler, event)
+
+        self._handlers[(topic, handler)] = lane_handler
+        self._event_bus.subscribe(topic, lane_handler)
+
+    def unsubscribe(self, topic, handler=None):
+        if handler is None:
+            self._event_bus.unsubscribe(topic)
+            return
+
+        self._event_bus.unsubscribe(topic, self._handlers.pop((topic, handler), handler))
+
+    def close(self):
+        with self._dispatchers_lock:
+            dispatchers, self._dispatchers = self._dispatchers, dict()
+        for dispatcher in dispatchers.values():
+            dispatcher.close()
+        if hasattr(self._event_bus, "close"):
+            self._event_bus.close()
+
+    def __getattr__(self, name):
+        return getattr(self._event_bus, name)
+
+    def _dispatcher(self, lane: str) -> _LaneDispatcher:
+        with self._dispatchers_lock:
+            if lane not in self._dispatchers:
+                self._dispatchers[lane] = _LaneDispatcher(lane, self._queue_size, self._observer)
+
+            return self._dispatchers[lane]
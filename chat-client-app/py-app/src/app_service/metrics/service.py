@@ -0,0 +1,31 @@
+import logging
+
+from flask import Flask, Response
+
+from app_service.metrics.collector import MetricsCollector
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsService:
+    """Serves the metrics of a :class:`MetricsCollector` in the Prometheus text exposition format."""
+    def __init__(self, collector: MetricsCollector):
+        self._collector = collector
+        self._app = None
+
+    @property
+    def collector(self) -> MetricsCollector:
+        return self._collector
+
+    @property
+    def app(self):
+        if self._app:
+            return self._app
+
+        self._app = Flask(__name__)
+
+        @self._app.route('/', methods=['GET'])
+        def metrics():
+            return Response(self._collector.exposition(), mimetype="text/plain; version=0.0.4")
+
+        return self._app
@@ -4,9 +4,12 @@
 rm -f *.wav
 
 rm -f storage/event_log/*.json
+rm -f storage/event_log/*.jsonl
+rm -f storage/event_log/*.jsonl.gz
 
 rm -f storage/audio/*.wav
 rm -f storage/audio/*.json
+rm -f storage/audio/*.flac
 
 rm -f storage/image/*.png
 rm -f storage/image/*.json
@@ -2,11 +2,10 @@ import logging.config
 import logging.config
 import os
 import pathlib
-import time
+from typing import TYPE_CHECKING, Callable, Dict, List
 
 from cltl.about.about import AboutImpl
 from cltl.about.api import About
-from cltl.brain.long_term_memory import LongTermMemory
 from cltl.combot.event.emissor import SIG, MEN
 from cltl.combot.infra.config.k8config import K8LocalConfigurationContainer
 from cltl.combot.infra.di_container import singleton
@@ -17,22 +16,40 @@ from cltl.combot.infra.event_log import LogWriter
 from cltl.combot.infra.resource.threaded import ThreadedResourceContainer
 from cltl.emissordata.api import EmissorDataStorage
 from cltl.emissordata.file_storage import EmissorDataFileStorage
-from cltl.reply_generation.thought_selectors.nsp_selector import NSP
-from cltl.reply_generation.thought_selectors.random_selector import RandomSelector
-from cltl.triple_extraction.api import DialogueAct
-from cltl.triple_extraction.chat_analyzer import ChatAnalyzer
 from cltl_service.about.service import AboutService
-from cltl_service.brain.service import BrainService
 from cltl_service.combot.event_log.service import EventLogService
 from cltl_service.emissordata.client import EmissorDataClient
 from cltl_service.emissordata.service import EmissorDataService
-from cltl_service.reply_generation.service import ReplyGenerationService
-from cltl_service.triple_extraction.service import TripleExtractionService
 from emissor.representation.util import serializer as emissor_serializer, register_type_var, marshal, unmarshal
 from flask import Flask
 from werkzeug.middleware.dispatcher import DispatcherMiddleware
 from werkzeug.serving import run_simple
 
+from app_service.admin.service import AdminService
+from app_service.event_bus.lanes import PriorityEventBus, TopicLanes
+from app_service.event_bus.observed import ObservedEventBus, ProcessObserver
+from app_service.event_bus.routed import RoutedKombuEventBus, TenantContext
+from app_service.event_log.policy import EventLogPolicy, PolicyLogWriter
+from app_service.event_log.writer import BufferedLogWriter
+from app_service.health.checks import event_bus_connected, topic_workers_alive, topic_workers_idle, url_reachable
+from app_service.health.service import HealthService
+from app_service.metrics.collector import MetricsCollector, MetricsEventBus
+from app_service.metrics.service import MetricsService
+from app_service.reply.deadline import DeadlineService
+from app_service.routing.router import ComplexityRouter, RoutedModel
+from app_service.startup.report import StartupReport
+from app_service.tracing.service import TracingService
+from app_service.tracing.tracer import TracingEventBus
+from app_service.triple_extraction.cache import CachedAnalyzer, ExtractionCache
+from app_service.triple_extraction.speculation import SpeculationService
+
+if TYPE_CHECKING:
+    from cltl.brain.long_term_memory import LongTermMemory
+    from cltl.triple_extraction.chat_analyzer import ChatAnalyzer
+    from cltl_service.brain.service import BrainService
+    from cltl_service.reply_generation.service import ReplyGenerationService
+    from cltl_service.triple_extraction.service import TripleExtractionService
+
 # from gtts import gTTS
 # from playsound import playsound
 
@@ -68,15 +85,113 @@ class InfraContainer(KombuEventBusContainer, K8LocalConfigurationContainer, Thre
         config = self.config_manager.get_config("cltl.event")
         implementation = config.get("implementation")
         if implementation == "kombu":
-            return super().event_bus
+            event_bus = self.routed_event_bus or super().event_bus
         else:
             raise ValueError("Unknown implementation: " + implementation)
 
+        if self.topic_lanes:
+            lane_latency = self.metrics_service.collector.lane_latency if self.metrics_service else None
+            event_bus = PriorityEventBus(event_bus, self.topic_lanes, observer=lane_latency)
+
+        if self.metrics_service:
+            event_bus = MetricsEventBus(event_bus, self.metrics_service.collector)
+
+        if self.tracing_service:
+            event_bus = TracingEventBus(event_bus, self.tracing_service.tracer)
+
+        # The tenant is entered before the other observers are notified
+        observers = [TenantContext(self.routed_event_bus)] if self.routed_event_bus else []
+
+        return ObservedEventBus(event_bus, observers + self.process_observers())
+
+    def process_observers(self) -> List[ProcessObserver]:
+        observers = []
+        if self.metrics_service:
+            observers.append(self.metrics_service.collector)
+        if self.tracing_service:
+            observers.append(self.tracing_service.tracer)
+
+        return observers
+
+    @property
+    @singleton
+    def routed_event_bus(self) -> RoutedKombuEventBus:
+        if self.config_manager.get_config("cltl.event").get("implementation") != "kombu":
+            return None
+
+        config = self.config_manager.get_config("cltl.event.kombu")
+        if "routing" not in config or config.get("routing") != "tenant":
+            return None
+
+        return RoutedKombuEventBus.from_config(self.event_bus_serializer, self.config_manager, self.topic_lanes)
+
+    @property
+    @singleton
+    def topic_lanes(self) -> TopicLanes:
+        config = self.config_manager.get_config("cltl.event.lanes")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return TopicLanes.from_config(self.config_manager)
+
+    @property
+    @singleton
+    def model_router(self) -> ComplexityRouter:
+        config = self.config_manager.get_config("app.router")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return ComplexityRouter.from_config(self.config_manager)
+
+    @property
+    @singleton
+    def startup_report(self) -> StartupReport:
+        return StartupReport()
+
+    @property
+    @singleton
+    def admin_service(self):
+        config = self.config_manager.get_config("app.admin")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return AdminService.from_config(self.config_manager, self.startup_report)
+
+    @property
+    @singleton
+    def health_service(self) -> HealthService:
+        return HealthService.from_config(self.readiness_checks(), lambda: topic_workers_idle(self.event_bus), self.config_manager)
+
+    @property
+    @singleton
+    def metrics_service(self):
+        config = self.config_manager.get_config("app.metrics")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return MetricsService(MetricsCollector())
+
+    @property
+    @singleton
+    def tracing_service(self):
+        config = self.config_manager.get_config("app.tracing")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return TracingService.from_config(self.config_manager)
+
+    def readiness_checks(self) -> Dict[str, Callable[[], bool]]:
+        return {
+            "event_bus": lambda: event_bus_connected(self.event_bus),
+            "topic_workers": lambda: topic_workers_alive(self),
+        }
+
     def start(self):
         pass
 
     def stop(self):
-        pass
+        if self.admin_service:
+            self.admin_service.stop()
 
 
 class EmissorStorageContainer(InfraContainer):
@@ -94,12 +209,14 @@ class EmissorStorageContainer(InfraContainer):
     @property
     @singleton
     def emissor_data_client(self) -> EmissorDataClient:
-        return EmissorDataClient("http://0.0.0.0:8000/emissor")
+        port = self.config_manager.get_config("app.server").get_int("port")
+        return EmissorDataClient(f"http://0.0.0.0:{port}/emissor")
 
     def start(self):
         logger.info("Start Emissor Data Storage")
         super().start()
-        self.emissor_data_service.start()
+        with self.startup_report.phase("Start Emissor Data Storage"):
+            self.emissor_data_service.start()
 
     def stop(self):
         try:
@@ -112,26 +229,42 @@ class EmissorStorageContainer(InfraContainer):
 class TripleExtractionContainer(InfraContainer):
     @property
     @singleton
-    def triple_extraction_service(self) -> TripleExtractionService:
+    def triple_cache(self) -> ExtractionCache:
+        config = self.config_manager.get_config("cltl.triple_extraction.cache")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return ExtractionCache.from_config(self.config_manager)
+
+    @property
+    @singleton
+    def triple_analyzer(self) -> "ChatAnalyzer":
+        from cltl.triple_extraction.chat_analyzer import ChatAnalyzer
+
         config = self.config_manager.get_config("cltl.triple_extraction")
         implementation = config.get("implementation", multi=True)
         timeout = config.get_float("timeout") if "timeout" in config else 0.0
 
         analyzers = []
         if "CFGAnalyzer" in implementation:
-            from cltl.triple_extraction.cfg_analyzer import CFGAnalyzer
+            with self.startup_report.phase("Import cltl.triple_extraction.cfg_analyzer"):
+                from cltl.triple_extraction.cfg_analyzer import CFGAnalyzer
             analyzers.append(CFGAnalyzer(process_questions=False))
         if "CFGQuestionAnalyzer" in implementation:
-            from cltl.question_extraction.cfg_question_analyzer import CFGQuestionAnalyzer
+            with self.startup_report.phase("Import cltl.question_extraction.cfg_question_analyzer"):
+                from cltl.question_extraction.cfg_question_analyzer import CFGQuestionAnalyzer
             analyzers.append(CFGQuestionAnalyzer())
         if "StanzaQuestionAnalyzer" in implementation:
-            from cltl.question_extraction.stanza_question_analyzer import StanzaQuestionAnalyzer
+            with self.startup_report.phase("Import cltl.question_extraction.stanza_question_analyzer"):
+                from cltl.question_extraction.stanza_question_analyzer import StanzaQuestionAnalyzer
             analyzers.append(StanzaQuestionAnalyzer())
         if "OIEAnalyzer" in implementation:
-            from cltl.triple_extraction.oie_analyzer import OIEAnalyzer
+            with self.startup_report.phase("Import cltl.triple_extraction.oie_analyzer"):
+                from cltl.triple_extraction.oie_analyzer import OIEAnalyzer
             analyzers.append(OIEAnalyzer())
         if "SpacyAnalyzer" in implementation:
-            from cltl.triple_extraction.spacy_analyzer import spacyAnalyzer
+            with self.startup_report.phase("Import cltl.triple_extraction.spacy_analyzer"):
+                from cltl.triple_extraction.spacy_analyzer import spacyAnalyzer
             analyzers.append(spacyAnalyzer())
         if "LLMAnalyzer" in implementation:
             from cltl.triple_extraction.conversational_llm_analyzer import LLMAnalyzer
@@ -143,14 +276,31 @@ class TripleExtractionContainer(InfraContainer):
             context_length = config.get_int('context_length') if 'context_length' in config else 3
             temperature = config.get('temperature') if 'temperature' in config else 0.1
             language = config.get("language") if 'language' in config else 'en'
+            small_model = config.get("small_model") if "small_model" in config else None
             credentials = self.config_manager.get_config("credentials.ollama")
             key = credentials.get("key")
-            analyzers.append(
-                LLMAnalyzer(model_name=model, model_server=server, model_url=url, model_port=port, model_key=key,
-                            temperature=temperature, keep_alive=20,
-                            lang=language, context_length=context_length))
+            analyzer = LLMAnalyzer(model_name=model, model_server=server, model_url=url, model_port=port,
+                                   model_key=key, temperature=temperature, keep_alive=20,
+                                   lang=language, context_length=context_length)
+            if self.triple_cache:
+                analyzer = CachedAnalyzer.from_config(analyzer, self.triple_cache, model, context_length,
+                                                      float(temperature), self.config_manager)
+            if self.model_router and small_model:
+                small_analyzer = LLMAnalyzer(model_name=small_model, model_server=config.get("small_server"),
+                                             model_url=config.get("small_url"), model_port=port, model_key=key,
+                                             temperature=temperature, keep_alive=20,
+                                             lang=language, context_length=context_length)
+                if self.triple_cache:
+                    small_analyzer = CachedAnalyzer.from_config(small_analyzer, self.triple_cache, small_model,
+                                                                context_length, float(temperature),
+                                                                self.config_manager)
+                analyzer = RoutedModel(self.model_router, "triple_extraction", analyzer, small_analyzer,
+                                       methods=("analyze", "analyze_in_context"))
+            analyzers.append(analyzer)
         if "ConversationalAnalyzer" in implementation:
-            from cltl.triple_extraction.conversational_analyzer import ConversationalAnalyzer
+            from cltl.triple_extraction.api import DialogueAct
+            with self.startup_report.phase("Import cltl.triple_extraction.conversational_analyzer"):
+                from cltl.triple_extraction.conversational_analyzer import ConversationalAnalyzer
             config = self.config_manager.get_config('cltl.triple_extraction.conversational')
             model_path = config.get('model_path')
             base_model = config.get('base_model')
@@ -170,18 +320,43 @@ class TripleExtractionContainer(InfraContainer):
 
         logger.info("Using analyzers %s in Triple Extraction", implementation)
 
-        return TripleExtractionService.from_config(ChatAnalyzer(analyzers, timeout=timeout),
-                                                   self.event_bus, self.resource_manager, self.config_manager)
+        return ChatAnalyzer(analyzers, timeout=timeout)
+
+    @property
+    @singleton
+    def triple_extraction_service(self) -> "TripleExtractionService":
+        from cltl_service.triple_extraction.service import TripleExtractionService
+
+        config_manager = self.config_manager
+        if self.speculation_service:
+            config_manager = self.speculation_service.extraction_config(config_manager)
+
+        return TripleExtractionService.from_config(self.triple_analyzer,
+                                                   self.event_bus, self.resource_manager, config_manager)
+
+    @property
+    @singleton
+    def speculation_service(self) -> SpeculationService:
+        config = self.config_manager.get_config("app.speculation")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return SpeculationService.from_config(self.event_bus, self.resource_manager, self.config_manager)
 
     def start(self):
         logger.info("Start Triple Extraction")
         super().start()
-        self.triple_extraction_service.start()
+        with self.startup_report.phase("Start Triple Extraction"):
+            if self.speculation_service:
+                self.speculation_service.start()
+            self.triple_extraction_service.start()
 
     def stop(self):
         try:
             logger.info("Stop Triple Extraction")
             self.triple_extraction_service.stop()
+            if self.speculation_service:
+                self.speculation_service.stop()
         finally:
             super().stop()
 
@@ -189,7 +364,10 @@ class TripleExtractionContainer(InfraContainer):
 class BrainContainer(InfraContainer):
     @property
     @singleton
-    def brain(self) -> LongTermMemory:
+    def brain(self) -> "LongTermMemory":
+        with self.startup_report.phase("Import cltl.brain.long_term_memory"):
+            from cltl.brain.long_term_memory import LongTermMemory
+
         config = self.config_manager.get_config("cltl.brain")
         brain_address = config.get("address")
         brain_log_dir = config.get("log_dir")
@@ -202,13 +380,22 @@ class BrainContainer(InfraContainer):
 
     @property
     @singleton
-    def brain_service(self) -> BrainService:
+    def brain_service(self) -> "BrainService":
+        from cltl_service.brain.service import BrainService
+
         return BrainService.from_config(self.brain, self.event_bus, self.resource_manager, self.config_manager)
 
+    def readiness_checks(self) -> Dict[str, Callable[[], bool]]:
+        checks = super().readiness_checks()
+        checks["brain"] = lambda: url_reachable(self.config_manager.get_config("cltl.brain").get("address"))
+
+        return checks
+
     def start(self):
         logger.info("Start Brain")
         super().start()
-        self.brain_service.start()
+        with self.startup_report.phase("Start Brain"):
+            self.brain_service.start()
 
     def stop(self):
         try:
@@ -221,7 +408,25 @@ class BrainContainer(InfraContainer):
 class ReplierContainer(BrainContainer, EmissorStorageContainer, InfraContainer):
     @property
     @singleton
-    def reply_service(self) -> ReplyGenerationService:
+    def thought_selector(self):
+        config = self.config_manager.get_config("cltl.reply_generation")
+
+        if "selector" in config and config["selector"] == "nsp":
+            with self.startup_report.phase("Import cltl.reply_generation.thought_selectors.nsp_selector"):
+                from cltl.reply_generation.thought_selectors.nsp_selector import NSP
+            return NSP(config.get("selector_model"))
+
+        from cltl.reply_generation.thought_selectors.random_selector import RandomSelector
+        thought_options = config.get("thought_options", multi=True) if "thought_options" in config else []
+        randomness = float(config.get("randomness")) if "randomness" in config else 1.0
+
+        return RandomSelector(randomness=randomness, priority=thought_options)
+
+    @property
+    @singleton
+    def reply_service(self) -> "ReplyGenerationService":
+        from cltl_service.reply_generation.service import ReplyGenerationService
+
         config = self.config_manager.get_config("cltl.reply_generation")
         implementations = config.get("implementations", multi=True)
 
@@ -240,21 +445,29 @@ class ReplierContainer(BrainContainer, EmissorStorageContainer, InfraContainer):
         temperature = config.get("temperature") if "temperature" in config else None
         max_tokens = config.get("max_tokens") if "max_tokens" in config else None
         show_lenka = config.get("show_lenka") if "show_lenka" in config else False
-
-        if "selector" in config and config["selector"] == "nsp":
-            selector = NSP(config.get("selector_model"))
-        else:
-            thought_options = config.get("thought_options", multi=True) if "thought_options" in config else []
-            randomness = float(config.get("randomness")) if "randomness" in config else 1.0
-            selector = RandomSelector(randomness=randomness, priority=thought_options)
+        selector = self.thought_selector
 
         credentials = self.config_manager.get_config("credentials.ollama")
         key = credentials.get("key")
 
-        replier_factory = lambda: [LenkaReplier(model_name=model, model_server=server, model_url=url, model_port=port,
-                                               model_key=key, instruct=instruct, llamalize=llamalize,
-                                               temperature=float(temperature), max_tokens=int(max_tokens),
-                                               show_lenka=show_lenka, thought_selector=selector)]
+        small_model = config.get("small_model") if "small_model" in config else None
+        small_server = config.get("small_server") if "small_server" in config else None
+        small_url = config.get("small_url") if "small_url" in config else None
+
+        def lenka_replier(model_name, model_server, model_url):
+            return LenkaReplier(model_name=model_name, model_server=model_server, model_url=model_url,
+                                model_port=port, model_key=key, instruct=instruct, llamalize=llamalize,
+                                temperature=float(temperature), max_tokens=int(max_tokens),
+                                show_lenka=show_lenka, thought_selector=selector)
+
+        if self.model_router and small_model and llamalize:
+            replier_factory = lambda: [RoutedModel(self.model_router, "reply_generation",
+                                                   lenka_replier(model, server, url),
+                                                   lenka_replier(small_model, small_server, small_url),
+                                                   methods=("reply_to_question", "reply_to_statement",
+                                                            "reply_to_mention"))]
+        else:
+            replier_factory = lambda: [lenka_replier(model, server, url)]
 
         ##################
         # repliers = []
@@ -306,15 +519,25 @@ class ReplierContainer(BrainContainer, EmissorStorageContainer, InfraContainer):
 
         return ReplyGenerationService.from_config(replier_factory, self.event_bus, self.resource_manager, self.config_manager)
 
+    @property
+    @singleton
+    def deadline_service(self) -> DeadlineService:
+        return DeadlineService.from_config(self.event_bus, self.resource_manager, self.config_manager,
+                                           self.config_manager.get_config("cltl.reply_generation").get("model"),
+                                           self.routed_event_bus)
+
     def start(self):
         logger.info("Start Repliers")
         super().start()
-        self.reply_service.start()
+        with self.startup_report.phase("Start Repliers"):
+            self.deadline_service.start()
+            self.reply_service.start()
 
     def stop(self):
         try:
             logger.info("Stop Repliers")
             self.reply_service.stop()
+            self.deadline_service.stop()
         finally:
             super().stop()
 
@@ -333,7 +556,8 @@ class AboutAgentContainer(InfraContainer):
     def start(self):
         logger.info("Start AboutAgent")
         super().start()
-        self.about_agent_service.start()
+        with self.startup_report.phase("Start AboutAgent"):
+            self.about_agent_service.start()
 
     def stop(self):
         try:
@@ -351,7 +575,12 @@ class ApplicationContainer(AboutAgentContainer,
     def log_writer(self):
         config = self.config_manager.get_config("cltl.event_log")
 
-        return LogWriter(config.get("log_dir"), emissor_serializer)
+        if "writer" in config and config.get("writer") == "buffered":
+            writer = BufferedLogWriter.from_config(emissor_serializer, self.config_manager)
+        else:
+            writer = LogWriter(config.get("log_dir"), emissor_serializer)
+
+        return PolicyLogWriter(writer, EventLogPolicy.from_config(emissor_serializer, self.config_manager))
 
     @property
     @singleton
@@ -359,14 +588,34 @@ class ApplicationContainer(AboutAgentContainer,
         return EventLogService.from_config(self.log_writer, self.event_bus, self.config_manager)
 
     def start(self):
+        config = self.config_manager.get_config("app.startup")
+        parallel = config.get_boolean("parallel_loading") if "parallel_loading" in config else True
+        self.startup_report.load({
+            "Load triple extraction analyzers": lambda: self.triple_analyzer,
+            "Load thought selector": lambda: self.thought_selector,
+            "Connect brain": lambda: self.brain,
+        }, parallel, dependencies=[lambda: self.triple_cache, lambda: self.model_router])
+
         logger.info("Start EventLog")
         super().start()
-        self.event_log_service.start()
+        with self.startup_report.phase("Start EventLog"):
+            if self.event_log_service:
+                if isinstance(self.log_writer.writer, BufferedLogWriter):
+                    self.log_writer.writer.start()
+                self.event_log_service.start()
+
+        self.startup_report.ready()
+        self.health_service.set_started()
+        logger.info("Startup report:\n%s", self.startup_report.format())
 
     def stop(self):
+        self.health_service.set_started(False)
         try:
             logger.info("Stop EventLog")
-            self.event_log_service.stop()
+            if self.event_log_service:
+                self.event_log_service.stop()
+                if isinstance(self.log_writer.writer, BufferedLogWriter):
+                    self.log_writer.writer.stop()
         finally:
             super().stop()
 
@@ -378,14 +627,26 @@ def main():
     with application as started_app:
         routes = {
             '/emissor': started_app.emissor_data_service.app,
+            '/deadline': started_app.deadline_service.app,
+            '/health': started_app.health_service.app,
         }
+        if started_app.admin_service:
+            routes['/admin'] = started_app.admin_service.app
+        if started_app.metrics_service:
+            routes['/metrics'] = started_app.metrics_service.app
+        if started_app.model_router:
+            routes['/router'] = started_app.model_router.app
+        if started_app.speculation_service:
+            routes['/speculation'] = started_app.speculation_service.app
+        if started_app.tracing_service:
+            routes['/tracing'] = started_app.tracing_service.app
 
         web_app = DispatcherMiddleware(Flask("EKG server app"), routes)
 
         port = started_app.config_manager.get_config("app.server").get_int("port")
         run_simple('0.0.0.0', port, web_app, threaded=True, use_reloader=False, use_debugger=False, use_evalex=True)
 
-        time.sleep(1)
+        started_app.health_service.wait_idle()
 
 
 if __name__ == '__main__':
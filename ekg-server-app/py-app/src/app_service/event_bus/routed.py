@@ -0,0 +1,305 @@
+import contextlib
+import copy
+import functools
+import logging
+import queue
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+from cltl.combot.infra.config import ConfigurationManager
+from cltl.combot.infra.event import Event, EventBus
+from kombu import Connection, Consumer, Exchange, Producer, Queue
+
+from app_service.event_bus.lanes import DEFAULT, TopicLanes
+from app_service.event_bus.observed import ProcessObserver
+
+logger = logging.getLogger(__name__)
+
+
+NO_TENANT = "_"
+# Attributes of the event metadata beyond the combot EventMetadata, sent as message headers
+METADATA_HEADERS = ("trace_id",)
+
+
+def _routing_tenant(tenant: Optional[str]) -> str:
+    # Tenants are a single word of the routing key
+    return tenant.replace(".", "_") if tenant else NO_TENANT
+
+
+class RoutedKombuEventBus(EventBus):
+    """Kombu event bus with the tenant and topic in the routing key.
+
+    Events are published to a topic exchange with routing key ``<tenant>.<topic>``.
+    The tenant is taken from the event metadata, from the event processed in the
+    current TopicWorker (see :class:`TenantContext`) or from the configured
+    tenant of the bus. Subscribers with a tenant bind their queue to their own
+    tenant (``<tenant>.<topic>``), subscribers without tenant to all tenants
+    (``*.<topic>``), such that the broker only delivers the traffic of a
+    subscriber's own tenant.
+
+    Messages are consumed with a connection and consumer thread per lane (see
+    :class:`TopicLanes`) with at most *prefetch_count* unacknowledged messages per
+    subscription and acknowledged in batches of *ack_batch_size*, or after
+    *ack_interval* seconds. Messages that fail to be handled are requeued once
+    and rejected if they fail again. The metadata attributes in
+    :data:`METADATA_HEADERS` are sent as message headers and restored on a
+    copy of the metadata of the received event.
+    """
+    @classmethod
+    def from_config(cls, serializers: Tuple[Callable, Callable], config_manager: ConfigurationManager,
+                    lanes: Optional[TopicLanes] = None):
+        config = config_manager.get_config("cltl.event.kombu")
+        exchange = config.get("routed_exchange") if "routed_exchange" in config else None
+        exchange = exchange or config.get("exchange") + ".routed"
+        tenant = config.get("tenant") if "tenant" in config else None
+        compression = config.get("compression") if "compression" in config else None
+        prefetch_count = config.get_int("prefetch_count") if "prefetch_count" in config else 32
+        ack_batch_size = config.get_int("ack_batch_size") if "ack_batch_size" in config else 16
+        ack_interval = config.get_float("ack_interval") if "ack_interval" in config else 0.5
+
+        serializer, deserializer = serializers
+
+        return cls(config.get("server"), exchange, serializer, deserializer, tenant, compression,
+                   prefetch_count, ack_batch_size, ack_interval, lanes)
+
+    def __init__(self, server: str, exchange: str, serializer: Callable, deserializer: Callable,
+                 tenant: Optional[str] = None, compression: Optional[str] = None,
+                 prefetch_count: int = 32, ack_batch_size: int = 16, ack_interval: float = 0.5,
+                 lanes: Optional[TopicLanes] = None):
+        if ack_batch_size > prefetch_count:
+            raise ValueError(f"ack_batch_size ({ack_batch_size}) must not exceed prefetch_count ({prefetch_count})")
+
+        self._exchange = Exchange(exchange, type="topic", durable=False)
+        self._serializer = serializer
+        self._deserializer = deserializer
+        self._tenant = tenant or None
+        self._compression = compression or None
+        self._prefetch_count = prefetch_count
+        self._ack_batch_size = ack_batch_size
+        self._ack_interval = ack_interval
+
+        # Publishes events, consumers connect with a clone per lane
+        self._connection = Connection(server)
+        self._connection.ensure_connection(max_retries=3)
+        self._producer = None
+        self._publish_lock = threading.Lock()
+
+        self._local = threading.local()
+        self._event_tenants = OrderedDict()
+        self._tenant_lock = threading.Lock()
+
+        self._lanes = lanes
+        self._consumers = dict()
+        self._consumers_lock = threading.Lock()
+
+    @property
+    def current_tenant(self) -> Optional[str]:
+        return getattr(self._local, "tenant", None)
+
+    def tenant_of(self, event: Event) -> Optional[str]:
+        tenant = getattr(event.metadata, "tenant", None)
+        if tenant:
+            return tenant
+
+        with self._tenant_lock:
+            return self._event_tenants.get(event.id)
+
+    @contextlib.contextmanager
+    def in_tenant(self, tenant: Optional[str]):
+        """Publish the events of the current thread in the *tenant*."""
+        previous, self._local.tenant = self.current_tenant, tenant
+        try:
+            yield
+        finally:
+            self._local.tenant = previous
+
+    def publish(self, topic: str, event: Event):
+        tenant = getattr(event.metadata, "tenant", None) or self.current_tenant or self._tenant
+        routing_key = f"{_routing_tenant(tenant)}.{topic}"
+        body = self._serializer(event)
+        headers = {name: getattr(event.metadata, name) for name in METADATA_HEADERS
+                   if getattr(event.metadata, name, None)}
+
+        with self._publish_lock:
+            if self._producer is None:
+                self._producer = Producer(self._connection.channel(), self._exchange)
+            publish = self._connection.ensure(self._producer, self._producer.publish, max_retries=3)
+            publish(body, routing_key=routing_key, content_type="application/json", content_encoding="utf-8",
+                    compression=self._compression, headers=headers, declare=[self._exchange])
+
+    def subscribe(self, topic, handler):
+        self._consumer(topic).request("subscribe", topic, handler)
+
+    def unsubscribe(self, topic, handler=None):
+        self._consumer(topic).request("unsubscribe", topic, handler)
+
+    def close(self):
+        for consumer in self._consumers.values():
+            consumer.close()
+        with self._publish_lock:
+            self._connection.release()
+
+    def _consumer(self, topic) -> "_LaneConsumer":
+        lane = self._lanes.lane(topic) if self._lanes else DEFAULT
+        with self._consumers_lock:
+            if lane not in self._consumers:
+                self._consumers[lane] = _LaneConsumer(lane, self._connection.clone(), self._subscription_queue,
+                                                      self._on_message, self._prefetch_count,
+                                                      self._ack_batch_size, self._ack_interval)
+
+            return self._consumers[lane]
+
+    def _subscription_queue(self, topic, handler) -> Queue:
+        binding = f"{_routing_tenant(self._tenant) if self._tenant else '*'}.{topic}"
+        name = getattr(getattr(handler, "__self__", None), "name", None) or getattr(handler, "__name__", "handler")
+
+        return Queue(f"{name}.{topic}.{uuid.uuid4().hex[:8]}", self._exchange, routing_key=binding,
+                     durable=False, exclusive=True, auto_delete=True)
+
+    def _on_message(self, handler, message):
+        event = self._deserializer(message.body.decode("utf-8") if isinstance(message.body, bytes)
+                                   else message.body)
+        tenant = message.delivery_info.get("routing_key", "").split(".", 1)[0]
+        if tenant and tenant != NO_TENANT:
+            with self._tenant_lock:
+                self._event_tenants[event.id] = tenant
+                while len(self._event_tenants) > 10000:
+                    self._event_tenants.popitem(last=False)
+        headers = {name: value for name, value in (message.headers or {}).items() if name in METADATA_HEADERS}
+        if headers:
+            metadata = copy.copy(event.metadata)
+            for name, value in headers.items():
+                setattr(metadata, name, value)
+            event = Event(event.id, event.payload, metadata)
+        handler(event)
+
+
+class _LaneConsumer:
+    """Consumes the subscriptions of one lane on its own connection and thread, such
+    that a backlog of messages in one lane does not delay the messages of other lanes."""
+    def __init__(self, lane: str, connection: Connection, subscription_queue: Callable, on_message: Callable,
+                 prefetch_count: int, ack_batch_size: int, ack_interval: float):
+        self._connection = connection
+        self._subscription_queue = subscription_queue
+        self._on_message = on_message
+        self._prefetch_count = prefetch_count
+        self._ack_batch_size = ack_batch_size
+        self._ack_interval = ack_interval
+
+        self._requests = queue.Queue()
+        self._consumers = dict()
+        self._unacked = None
+        self._unacked_count = 0
+        self._last_ack = time.monotonic()
+        self._running = threading.Event()
+        self._running.set()
+        self._thread = threading.Thread(target=self._consume, name=f"RoutedKombuEventBus-{lane}", daemon=True)
+        self._thread.start()
+
+    def request(self, action: str, topic: str, handler: Optional[Callable]):
+        self._requests.put((action, topic, handler))
+
+    def close(self):
+        self._running.clear()
+        self._thread.join()
+        self._connection.release()
+
+    def _consume(self):
+        channel = None
+        while self._running.is_set():
+            try:
+                if channel is None:
+                    channel = self._connection.channel()
+                    self._restore(channel)
+                self._handle_requests(channel)
+                self._connection.drain_events(timeout=0.1)
+            except socket.timeout:
+                pass
+            except Exception:
+                logger.exception("Failed to consume events, reconnecting")
+                channel = None
+                self._unacked, self._unacked_count = None, 0
+                time.sleep(1)
+                self._reconnect()
+                continue
+            self._ack(force=time.monotonic() - self._last_ack > self._ack_interval)
+
+        self._ack(force=True)
+
+    def _reconnect(self):
+        try:
+            self._connection.release()
+        except Exception:
+            logger.debug("Failed to release the connection", exc_info=True)
+        self._connection = self._connection.clone()
+
+    def _handle_requests(self, channel):
+        while not self._requests.empty():
+            action, topic, handler = self._requests.get_nowait()
+            if action == "subscribe":
+                self._consumers[(topic, handler)] = self._create_consumer(channel, topic, handler)
+            else:
+                for key in [key for key in self._consumers
+                            if key[0] == topic and (handler is None or key[1] == handler)]:
+                    self._consumers.pop(key).cancel()
+
+    def _restore(self, channel):
+        for topic, handler in list(self._consumers.keys()):
+            self._consumers[(topic, handler)] = self._create_consumer(channel, topic, handler)
+
+    def _create_consumer(self, channel, topic, handler):
+        subscription = self._subscription_queue(topic, handler)
+        consumer = Consumer(channel, queues=[subscription], no_ack=False,
+                            on_message=functools.partial(self._handle, handler))
+        consumer.qos(prefetch_count=self._prefetch_count)
+        consumer.consume()
+        logger.debug("Subscribed %s to %s", subscription.name, subscription.routing_key)
+
+        return consumer
+
+    def _handle(self, handler, message):
+        try:
+            self._on_message(handler, message)
+        except Exception:
+            requeue = not message.delivery_info.get("redelivered", False)
+            logger.exception("Failed to handle message %s, %s", message.delivery_tag,
+                             "requeue" if requeue else "reject")
+            # Acknowledge the messages handled before, the batch must not include the failed message
+            self._ack(force=True)
+            message.reject(requeue=requeue)
+            return
+
+        self._unacked = message
+        self._unacked_count += 1
+        self._ack()
+
+    def _ack(self, force: bool = False):
+        if self._unacked is None or (not force and self._unacked_count < self._ack_batch_size):
+            return
+
+        self._unacked.ack(multiple=True)
+        self._unacked, self._unacked_count = None, 0
+        self._last_ack = time.monotonic()
+
+
+class TenantContext(ProcessObserver):
+    """Publish events in the tenant of the event processed by the current TopicWorker.
+
+    Observes the TopicWorkers of an :class:`ObservedEventBus` and enters the tenant
+    of the event while it is processed.
+    """
+    def __init__(self, event_bus: RoutedKombuEventBus):
+        self._event_bus = event_bus
+
+    def started(self, worker: str, event: Event):
+        context = self._event_bus.in_tenant(self._event_bus.tenant_of(event))
+        context.__enter__()
+
+        return context
+
+    def finished(self, worker: str, event: Event, state, start: float, end: float, failed: bool):
+        state.__exit__(None, None, None)
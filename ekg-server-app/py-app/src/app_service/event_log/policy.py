@@ -0,0 +1,121 @@
+import itertools
+import json
+import logging
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from cltl.combot.infra.config import ConfigurationManager
+from cltl.combot.infra.event import Event
+
+logger = logging.getLogger(__name__)
+
+
+def _topic_values(values: Iterable[str], cast=int) -> Dict[str, Any]:
+    """Parse a list of ``topic:value`` entries."""
+    parsed = {}
+    for value in filter(None, (value.strip() for value in values)):
+        topic, _, setting = value.rpartition(":")
+        if not topic:
+            raise ValueError(f"Expected <topic>:<value>, was {value}")
+        parsed[topic.strip()] = cast(setting.strip())
+
+    return parsed
+
+
+class EventLogPolicy:
+    """Per topic policy that decides if and in which form an event is logged.
+
+    Topics can be included or excluded, sampled one in N, logged with their
+    payload truncated to a maximum length of its JSON representation, or logged
+    with metadata only. Excluded and sampled out events are counted.
+    """
+    @classmethod
+    def from_config(cls, serializer: Callable[[Any], Any], config_manager: ConfigurationManager):
+        config = config_manager.get_config("cltl.event_log")
+
+        def get_list(key):
+            return [value for value in config.get(key, multi=True) if value] if key in config else []
+
+        return cls(serializer,
+                   include=get_list("include"),
+                   exclude=get_list("exclude"),
+                   sample=_topic_values(get_list("sample")),
+                   truncate=_topic_values(get_list("truncate")),
+                   metadata_only=get_list("metadata_only"))
+
+    def __init__(self, serializer: Callable[[Any], Any], include: Iterable[str] = (), exclude: Iterable[str] = (),
+                 sample: Dict[str, int] = None, truncate: Dict[str, int] = None, metadata_only: Iterable[str] = ()):
+        self._serializer = serializer
+        self._include = set(include)
+        self._exclude = set(exclude)
+        self._sample = dict(sample) if sample else {}
+        if any(rate < 1 for rate in self._sample.values()):
+            raise ValueError(f"Sample rates must be at least 1, was {self._sample}")
+        self._truncate = dict(truncate) if truncate else {}
+        self._metadata_only = set(metadata_only)
+
+        self._counters = defaultdict(itertools.count)
+        self._skipped = defaultdict(int)
+
+    @property
+    def skipped(self) -> Dict[str, int]:
+        return dict(self._skipped)
+
+    def apply(self, event: Event) -> Optional[Any]:
+        """Returns the object to log for the event, or ``None`` if the event should not be logged."""
+        topic = event.metadata.topic if isinstance(event, Event) else None
+        if topic is None:
+            return event
+
+        if (self._include and topic not in self._include) or topic in self._exclude:
+            self._skipped[topic] += 1
+            return None
+
+        if topic in self._sample and next(self._counters[topic]) % self._sample[topic]:
+            self._skipped[topic] += 1
+            return None
+
+        if topic in self._metadata_only:
+            return {"id": event.id, "metadata": event.metadata, "payload_type": type(event.payload).__name__}
+
+        if topic in self._truncate:
+            payload = json.dumps(event.payload, default=self._serializer)
+            max_length = self._truncate[topic]
+            if len(payload) > max_length:
+                return {"id": event.id, "metadata": event.metadata, "payload_type": type(event.payload).__name__,
+                        "payload_truncated": payload[:max_length], "payload_size": len(payload)}
+
+        return event
+
+
+class PolicyLogWriter:
+    """Applies an :class:`EventLogPolicy` to events before they are put to the wrapped log writer,
+    a combot :class:`LogWriter` or a :class:`BufferedLogWriter`."""
+    def __init__(self, writer, policy: EventLogPolicy):
+        self._writer = writer
+        self._policy = policy
+
+    @property
+    def writer(self):
+        return self._writer
+
+    @property
+    def policy(self) -> EventLogPolicy:
+        return self._policy
+
+    def put(self, obj: Any):
+        logged = self._policy.apply(obj)
+        if logged is not None:
+            self._writer.put(logged)
+
+    write = put
+
+    def __enter__(self):
+        self._writer.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self._writer.__exit__(exc_type, exc_val, exc_tb)
+
+    def __getattr__(self, name):
+        return getattr(self._writer, name)
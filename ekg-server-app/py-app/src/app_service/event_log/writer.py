@@ -0,0 +1,175 @@
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable
+
+from cltl.combot.infra.config import ConfigurationManager
+
+logger = logging.getLogger(__name__)
+
+
+_COMPRESSION = {"gzip": ".gz"}
+
+
+class BufferedLogWriter:
+    """Event log writer that keeps serialization and disk access off the event path.
+
+    Written objects are queued in a bounded in-memory buffer and serialized by a
+    background thread in batches to JSONL segment files. Segments are rotated by
+    size and age and compressed on rotation. Objects that don't fit into the
+    buffer are dropped and counted.
+
+    Can be used in place of the :class:`cltl.combot.infra.event_log.LogWriter`,
+    e.g. by the EventLogService, objects are logged with :meth:`put`.
+    """
+    @classmethod
+    def from_config(cls, serializer: Callable[[Any], Any], config_manager: ConfigurationManager):
+        config = config_manager.get_config("cltl.event_log")
+        log_dir = config.get("log_dir")
+        queue_size = config.get_int("queue_size") if "queue_size" in config else 10000
+        batch_size = config.get_int("batch_size") if "batch_size" in config else 256
+        flush_interval = config.get_float("flush_interval") if "flush_interval" in config else 1.0
+        segment_size = config.get_int("segment_size_mb") * 1024 * 1024 if "segment_size_mb" in config else 64 * 1024 * 1024
+        segment_age = config.get_int("segment_age") if "segment_age" in config else 3600
+        compression = config.get("compression") if "compression" in config else None
+
+        return cls(log_dir, serializer, queue_size, batch_size, flush_interval, segment_size, segment_age, compression)
+
+    def __init__(self, log_dir: str, serializer: Callable[[Any], Any] = None, queue_size: int = 10000,
+                 batch_size: int = 256, flush_interval: float = 1.0, segment_size: int = 64 * 1024 * 1024,
+                 segment_age: int = 3600, compression: str = None):
+        if compression and compression not in _COMPRESSION:
+            raise ValueError(f"Unsupported event log compression {compression}, supported: {list(_COMPRESSION)}")
+
+        self._log_dir = log_dir
+        self._serializer = serializer
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._segment_size = segment_size
+        self._segment_age = segment_age
+        self._compression = compression
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer = None
+        self._segment = None
+        self._segment_path = None
+        self._segment_start = None
+
+        self._written = 0
+        self._dropped = 0
+        self._segments = 0
+
+    @property
+    def stats(self):
+        return {"written": self._written, "dropped": self._dropped, "queued": self._queue.qsize(),
+                "segments": self._segments}
+
+    def start(self):
+        if self._writer:
+            return
+
+        os.makedirs(self._log_dir, exist_ok=True)
+        self._writer = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._writer.start()
+
+    def stop(self):
+        if not self._writer:
+            return
+
+        self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+
+        if self._dropped:
+            logger.warning("Event log dropped %s events", self._dropped)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def put(self, obj: Any):
+        try:
+            self._queue.put_nowait(obj)
+        except queue.Full:
+            self._dropped += 1
+            if self._dropped == 1 or self._dropped % 1000 == 0:
+                logger.warning("Event log buffer full, dropped %s events", self._dropped)
+
+    # The interface of the combot LogWriter is put, write is kept for other callers
+    write = put
+
+    def _run(self):
+        running = True
+        while running:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self._flush_interval)
+                while item is not None:
+                    batch.append(item)
+                    if len(batch) >= self._batch_size:
+                        break
+                    item = self._queue.get_nowait()
+                running = item is not None
+            except queue.Empty:
+                pass
+
+            try:
+                self._write_batch(batch)
+                if self._segment and self._should_rotate():
+                    self._rotate()
+            except:
+                logger.exception("Failed to write %s events to the event log", len(batch))
+
+        if self._segment:
+            self._rotate()
+
+    def _write_batch(self, batch):
+        if not batch:
+            if self._segment:
+                self._segment.flush()
+            return
+
+        if not self._segment:
+            self._open_segment()
+
+        lines = []
+        for obj in batch:
+            try:
+                lines.append(json.dumps(obj, default=self._serializer))
+            except (TypeError, ValueError):
+                logger.exception("Failed to serialize %s for the event log", type(obj).__name__)
+        self._segment.write("\n".join(lines) + "\n")
+        self._segment.flush()
+        self._written += len(lines)
+
+    def _should_rotate(self):
+        return (self._segment.tell() >= self._segment_size
+                or time.time() - self._segment_start >= self._segment_age)
+
+    def _open_segment(self):
+        name = datetime.now().strftime("events-%Y%m%d-%H%M%S-%f.jsonl")
+        self._segment_path = os.path.join(self._log_dir, name)
+        self._segment = open(self._segment_path, 'w')
+        self._segment_start = time.time()
+        self._segments += 1
+
+    def _rotate(self):
+        self._segment.close()
+        self._segment = None
+
+        if self._compression == "gzip":
+            compressed_path = self._segment_path + _COMPRESSION[self._compression]
+            with open(self._segment_path, 'rb') as source, gzip.open(compressed_path, 'wb') as target:
+                shutil.copyfileobj(source, target)
+            os.remove(self._segment_path)
+
+        logger.debug("Rotated event log segment %s", self._segment_path)
@@ -0,0 +1,241 @@
+import bisect
+import logging
+import os
+import resource
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Callable, Iterable, List
+
+from cltl.combot.infra.event import Event, EventBus
+
+from app_service.event_bus.observed import ProcessObserver
+
+logger = logging.getLogger(__name__)
+
+
+# Upper bounds of the processing time histogram buckets in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self):
+        return {"count": self.count, "sum": self.sum,
+                "buckets": {str(bound): count for bound, count in zip(self.buckets, self.counts)}}
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield ("+Inf" if bound == float("inf") else str(bound)), total
+
+
+class MetricsCollector(ProcessObserver):
+    """Collects the metrics of the TopicWorkers and the event bus of an application.
+
+    The events delivered to and processed by TopicWorkers are reported by an
+    :class:`ObservedEventBus`, events published on the event bus by a
+    :class:`MetricsEventBus`. Events delivered to a TopicWorker that it did not
+    process are counted as dropped, the queue depth of a TopicWorker is the
+    number of events delivered to it that it neither dropped nor started to
+    process. Caches are registered with :meth:`register_cache`, other queues
+    with :meth:`register_queue`.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._received = Counter()
+        self._dropped = Counter()
+        self._started = Counter()
+        self._processed = Counter()
+        self._failed = Counter()
+        self._processing = defaultdict(Histogram)
+        self._published = Counter()
+        self._lane_latency = defaultdict(Histogram)
+        self._caches = dict()
+        self._queues = dict()
+        self._start = time.time()
+
+    def register_cache(self, name: str, stats: Callable[[], dict]):
+        """Report the *stats* of a cache, i.e. its hits, misses, entries and optionally size in bytes."""
+        with self._lock:
+            self._caches[name] = stats
+
+    def register_queue(self, name: str, stats: Callable[[], dict]):
+        """Report the *stats* of a queue, i.e. its queued items, capacity and dropped items."""
+        with self._lock:
+            self._queues[name] = stats
+
+    def delivered(self, worker: str, event: Event):
+        with self._lock:
+            self._received[worker] += 1
+
+    def skipped(self, worker: str, event_id: str):
+        with self._lock:
+            self._dropped[worker] += 1
+
+    def started(self, worker: str, event: Event) -> Any:
+        with self._lock:
+            self._started[worker] += 1
+
+    def processed(self, name: str, duration: float, failed: bool = False):
+        with self._lock:
+            self._processed[name] += 1
+            if failed:
+                self._failed[name] += 1
+            self._processing[name].observe(duration)
+
+    def finished(self, worker: str, event: Event, state: Any, start: float, end: float, failed: bool):
+        self.processed(worker, end - start, failed)
+
+    def published(self, topic: str):
+        with self._lock:
+            self._published[topic] += 1
+
+    def lane_latency(self, lane: str, seconds: float):
+        with self._lock:
+            self._lane_latency[lane].observe(seconds)
+
+    def exposition(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        with self._lock:
+            lines = []
+            lines += _metric("cltl_topic_worker_queue_depth", "gauge", "Events waiting in the queue of a TopicWorker",
+                             [({"worker": name}, count - self._dropped[name] - self._started[name])
+                              for name, count in sorted(self._received.items())])
+            lines += _counter("cltl_topic_worker_received_total", "Events delivered to a TopicWorker", self._received)
+            lines += _counter("cltl_topic_worker_dropped_total",
+                              "Events delivered to a TopicWorker that it did not process", self._dropped)
+            lines += _counter("cltl_topic_worker_processed_total", "Events processed by a TopicWorker", self._processed)
+            lines += _counter("cltl_topic_worker_failed_total", "Events that failed processing in a TopicWorker",
+                              self._failed)
+            lines += _histogram("cltl_topic_worker_processing_seconds", "Processing time of events by a TopicWorker",
+                                self._processing)
+            lines += _metric("cltl_event_bus_published_total", "counter", "Events published on the event bus",
+                             [({"topic": topic}, count) for topic, count in sorted(self._published.items())])
+            lines += _histogram("cltl_event_lane_latency_seconds", "Time events waited for delivery per lane",
+                                self._lane_latency, label="lane")
+            caches = dict(self._caches)
+            queues = dict(self._queues)
+
+        lines += _caches(caches)
+        lines += _queues(queues)
+
+        lines += _metric("process_resident_memory_bytes", "gauge", "Resident memory size in bytes",
+                         [({}, _resident_memory())])
+        lines += _metric("process_max_resident_memory_bytes", "gauge", "Maximum resident memory size in bytes",
+                         [({}, _max_resident_memory())])
+        lines += _metric("process_threads", "gauge", "Number of threads", [({}, threading.active_count())])
+        lines += _metric("process_start_time_seconds", "gauge", "Start time of the process since the epoch",
+                         [({}, self._start)])
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsEventBus(EventBus):
+    """Decorates an :class:`EventBus` to count published events."""
+    def __init__(self, event_bus: EventBus, collector: MetricsCollector):
+        self._event_bus = event_bus
+        self._collector = collector
+
+    def publish(self, topic: str, event: Event):
+        self._collector.published(topic)
+        self._event_bus.publish(topic, event)
+
+    def subscribe(self, topic, handler):
+        self._event_bus.subscribe(topic, handler)
+
+    def unsubscribe(self, topic, handler=None):
+        self._event_bus.unsubscribe(topic, handler)
+
+    def __getattr__(self, name):
+        return getattr(self._event_bus, name)
+
+
+def _resident_memory():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return _max_resident_memory()
+
+
+def _max_resident_memory():
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return max_rss if os.uname().sysname == "Darwin" else max_rss * 1024
+
+
+def _caches(caches: dict) -> List[str]:
+    return _stats("cache", caches, (
+        ("cltl_cache_hits_total", "counter", "hits", "Lookups answered by a cache"),
+        ("cltl_cache_misses_total", "counter", "misses", "Lookups not answered by a cache"),
+        ("cltl_cache_entries", "gauge", "entries", "Entries in a cache"),
+        ("cltl_cache_size_bytes", "gauge", "size", "Size of a cache in bytes")))
+
+
+def _queues(queues: dict) -> List[str]:
+    return _stats("queue", queues, (
+        ("cltl_queue_depth", "gauge", "queued", "Items waiting in a queue"),
+        ("cltl_queue_capacity", "gauge", "capacity", "Size of a queue"),
+        ("cltl_queue_dropped_total", "counter", "dropped", "Items dropped because a queue was full")))
+
+
+def _stats(label: str, sources: dict, metrics: tuple) -> List[str]:
+    stats = dict()
+    for name, source_stats in sorted(sources.items()):
+        try:
+            stats[name] = source_stats()
+        except Exception:
+            logger.exception("Failed to collect the stats of %s %s", label, name)
+
+    lines = []
+    for metric, metric_type, key, description in metrics:
+        samples = [({label: name}, values[key]) for name, values in stats.items() if key in values]
+        if samples:
+            lines += _metric(metric, metric_type, description, samples)
+
+    return lines
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+
+    values = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+              for value in labels.values())
+
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels.keys(), values)) + "}"
+
+
+def _metric(name: str, metric_type: str, description: str, samples: Iterable) -> List[str]:
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} {metric_type}"]
+    lines += [f"{name}{_labels(labels)} {value}" for labels, value in samples]
+
+    return lines
+
+
+def _counter(name: str, description: str, counts: Counter) -> List[str]:
+    return _metric(name, "counter", description,
+                   [({"worker": worker}, count) for worker, count in sorted(counts.items())])
+
+
+def _histogram(name: str, description: str, histograms: dict, label: str = "worker") -> List[str]:
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+    for value, histogram in sorted(histograms.items()):
+        lines += [f"{name}_bucket{_labels({label: value, 'le': bound})} {count}"
+                  for bound, count in histogram.cumulative()]
+        lines.append(f"{name}_sum{_labels({label: value})} {histogram.sum}")
+        lines.append(f"{name}_count{_labels({label: value})} {histogram.count}")
+
+    return lines
@@ -0,0 +1,131 @@
+import logging
+import math
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from typing import List, Optional
+
+from cltl.combot.infra.event import Event
+
+from app_service.event_bus.observed import ObservedEventBus
+from app_service.replay.log_reader import LoggedEvent
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+
+    return ordered[index]
+
+
+class ReplayBenchmark:
+    """Re-publishes logged events into a running application and measures how it keeps up.
+
+    Events are published at the recorded pace divided by *speed*, a speed of
+    zero publishes as fast as possible. Reports the throughput per topic, the
+    queue depths of the services' TopicWorkers and the latency of turns, i.e.
+    from an event on the input topic to the next event on the output topic.
+    """
+    def __init__(self, event_bus: ObservedEventBus, events: List[LoggedEvent], speed: float,
+                 input_topic: str, output_topic: str, observe_topics: List[str], sample_interval: float = 0.1):
+        self._event_bus = event_bus
+        self._events = events
+        self._speed = speed
+        self._input_topic = input_topic
+        self._output_topic = output_topic
+        self._observe_topics = set(observe_topics) | {input_topic, output_topic}
+        self._sample_interval = sample_interval
+
+        self._counts = Counter()
+        self._pending = deque()
+        self._latencies = []
+        self._depths = defaultdict(list)
+        self._lock = threading.Lock()
+        self._sampling = threading.Event()
+        self._start = None
+        self._end = None
+
+    def run(self, drain_timeout: float = 60.0):
+        for topic in self._observe_topics:
+            self._event_bus.subscribe(topic, self._observe)
+
+        sampler = threading.Thread(target=self._sample, name="ReplayQueueSampler", daemon=True)
+        self._sampling.set()
+        sampler.start()
+
+        try:
+            self._replay()
+            self._drain(drain_timeout)
+        finally:
+            self._end = time.monotonic()
+            self._sampling.clear()
+            sampler.join()
+            for topic in self._observe_topics:
+                self._event_bus.unsubscribe(topic, self._observe)
+
+    def report(self) -> dict:
+        duration = (self._end or time.monotonic()) - self._start
+        return {
+            "events": len(self._events),
+            "duration": duration,
+            "throughput": {topic: count / duration for topic, count in self._counts.items()},
+            "queue_depth": {name: {"max": max(depths), "mean": sum(depths) / len(depths)}
+                            for name, depths in self._depths.items() if depths},
+            "turns": len(self._latencies),
+            "unanswered": len(self._pending),
+            "turn_latency": {f"p{p}": percentile(self._latencies, p) for p in (50, 90, 95, 99)},
+        }
+
+    def _replay(self):
+        self._start = time.monotonic()
+        first = self._events[0].timestamp if self._events else 0
+        for logged in self._events:
+            if self._speed:
+                delay = (logged.timestamp - first) / 1000 / self._speed - (time.monotonic() - self._start)
+                if delay > 0:
+                    time.sleep(delay)
+            self._event_bus.publish(logged.topic, Event.for_payload(logged.payload))
+
+    def _drain(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._pending:
+                    return
+            time.sleep(self._sample_interval)
+
+        logger.warning("%s turns not answered within %ss", len(self._pending), timeout)
+
+    def _observe(self, event: Event):
+        now = time.monotonic()
+        topic = event.metadata.topic
+        with self._lock:
+            self._counts[topic] += 1
+            if topic == self._input_topic:
+                self._pending.append(now)
+            elif topic == self._output_topic and self._pending:
+                self._latencies.append(now - self._pending.popleft())
+
+    def _sample(self):
+        while self._sampling.is_set():
+            for name, depth in self._event_bus.pending().items():
+                self._depths[name].append(depth)
+            time.sleep(self._sample_interval)
+
+
+def format_report(report: dict) -> str:
+    lines = [f"Replayed {report['events']} events in {report['duration']:.2f}s",
+             f"Turns: {report['turns']} answered, {report['unanswered']} unanswered"]
+    lines += [f"  latency {name}: {value * 1000:.1f}ms" for name, value in report["turn_latency"].items()
+              if value is not None]
+    lines.append("Throughput (events/s):")
+    lines += [f"  {topic}: {rate:.2f}" for topic, rate in sorted(report["throughput"].items())]
+    lines.append("Queue depth (max/mean):")
+    lines += [f"  {name}: {depth['max']}/{depth['mean']:.2f}" for name, depth in sorted(report["queue_depth"].items())]
+
+    return "\n".join(lines)
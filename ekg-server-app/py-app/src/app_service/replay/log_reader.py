@@ -0,0 +1,78 @@
+import glob
+import gzip
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Iterable, List, Optional
+
+from emissor.representation.util import unmarshal
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LoggedEvent:
+    topic: str
+    timestamp: int
+    payload: Any
+
+
+def read_event_log(path: str, topics: Optional[Iterable[str]] = None) -> List[LoggedEvent]:
+    """Read the events from an event log file or directory, ordered by their recorded timestamp.
+
+    Supports the JSON files of the LogWriter as well as the (compressed) JSONL
+    segments of the BufferedLogWriter. Events logged without payload (e.g. by a
+    metadata only policy) are skipped, as they cannot be re-published.
+    """
+    files = [path] if os.path.isfile(path) else sorted(
+        file for pattern in ("*.json", "*.jsonl", "*.jsonl.gz") for file in glob.glob(os.path.join(path, pattern)))
+
+    topics = set(topics) if topics else None
+    events = []
+    skipped = 0
+    for file in files:
+        for record in _read_records(file):
+            metadata = record.get("metadata") if isinstance(record, dict) else None
+            if not metadata or (topics and metadata.get("topic") not in topics):
+                continue
+            if "payload" not in record:
+                skipped += 1
+                continue
+            payload = unmarshal(json.dumps(record["payload"]))
+            events.append(LoggedEvent(metadata["topic"], metadata.get("timestamp") or 0, payload))
+
+    if skipped:
+        logger.warning("Skipped %s events without payload", skipped)
+
+    logger.info("Loaded %s events from %s files in %s", len(events), len(files), path)
+
+    return sorted(events, key=lambda event: event.timestamp)
+
+
+def _read_records(file: str) -> Iterable[dict]:
+    """Decode the records of a JSON array or of JSON lines one by one.
+
+    The LogWriter writes every event followed by a comma, including a final
+    ``null`` before the closing bracket, and leaves the bracket open if the
+    application did not stop cleanly, such that its files are no valid JSON.
+    """
+    opener = gzip.open if file.endswith(".gz") else open
+    with opener(file, 'rt') as log:
+        content = log.read()
+
+    decoder = json.JSONDecoder()
+    records = []
+    index = 0
+    while index < len(content):
+        if content[index] in "[], \t\r\n":
+            index += 1
+            continue
+        try:
+            record, index = decoder.raw_decode(content, index)
+        except ValueError:
+            logger.warning("Skipped incomplete record at position %s in %s", index, file)
+            break
+        records.append(record)
+
+    return records
@@ -0,0 +1,163 @@
+import logging
+import re
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+logger = logging.getLogger(__name__)
+
+
+_PROLOGUE = re.compile(r"^\s*(?:(?:#[^\n]*\n|PREFIX\s+[\w-]*:\s*<[^>]*>|BASE\s+<[^>]*>)\s*)*", re.IGNORECASE)
+_AGGREGATE = re.compile(r"\(\s*COUNT\s*\(.*?\)\s+AS\s+\?(\w+)\s*\)", re.IGNORECASE | re.DOTALL)
+
+
+class _StandInServer:
+    """Serves the app of a stand-in backend on localhost in a background thread."""
+    def __init__(self, port: int):
+        self._port = port
+        self._server = None
+        self._thread = None
+        self._requests = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://localhost:{self._port}"
+
+    @property
+    def requests(self) -> int:
+        return self._requests
+
+    def start(self):
+        self._server = make_server("localhost", self._port, self._create_app(), threaded=True)
+        self._thread = threading.Thread(target=self._server.serve_forever, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+        logger.info("Started %s at %s", self.__class__.__name__, self.url)
+
+    def stop(self):
+        if not self._server:
+            return
+
+        self._server.shutdown()
+        self._thread.join()
+        self._server = None
+
+    def _create_app(self) -> Flask:
+        raise NotImplementedError()
+
+
+class StandInLLMServer(_StandInServer):
+    """Local stand-in for an Ollama server.
+
+    Serves the OpenAI compatible chat completion endpoint and the native Ollama
+    chat and generate endpoints with a fixed reply after a configurable delay,
+    such that replays measure the application and not the model backend.
+    """
+    def __init__(self, port: int = 11435, reply: str = "This is a stand-in reply.", delay: float = 0.0):
+        super().__init__(port)
+        self._reply = reply
+        self._delay = delay
+
+    @property
+    def url(self) -> str:
+        return super().url + "/v1"
+
+    def _create_app(self):
+        app = Flask(__name__)
+
+        @app.route('/v1/chat/completions', methods=['POST'])
+        def completions():
+            self._respond()
+            body = request.get_json(silent=True) or {}
+            return jsonify({
+                "id": "chatcmpl-" + str(uuid.uuid4()),
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stand-in"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": self._reply}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+
+        @app.route('/api/chat', methods=['POST'])
+        def chat():
+            self._respond()
+            body = request.get_json(silent=True) or {}
+            return jsonify({
+                "model": body.get("model", "stand-in"),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "message": {"role": "assistant", "content": self._reply},
+                "done": True,
+            })
+
+        @app.route('/api/generate', methods=['POST'])
+        def generate():
+            self._respond()
+            body = request.get_json(silent=True) or {}
+            return jsonify({
+                "model": body.get("model", "stand-in"),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "response": self._reply,
+                "done": True,
+            })
+
+        @app.route('/', methods=['GET'])
+        def health():
+            return "Ollama is running"
+
+        return app
+
+    def _respond(self):
+        self._requests += 1
+        if self._delay:
+            time.sleep(self._delay)
+
+
+class StandInGraphDB(_StandInServer):
+    """Local stand-in for the GraphDB repository at *address*, e.g. ``http://localhost:7201/repositories/sandbox``.
+
+    Behaves like an empty repository: SELECT queries have no results, except
+    for COUNT aggregates that count zero, ASK queries are false and uploads and
+    updates are accepted without storing anything.
+    """
+    def __init__(self, address: str):
+        address = urlparse(address)
+        super().__init__(address.port)
+        self._path = address.path.rstrip("/")
+
+    @property
+    def address(self) -> str:
+        return self.url + self._path
+
+    def _create_app(self):
+        app = Flask(__name__)
+
+        @app.route(self._path, methods=['GET', 'POST'])
+        def query():
+            self._requests += 1
+            sparql = request.values.get("query")
+            if sparql is None and request.mimetype == "application/sparql-query":
+                sparql = request.get_data(as_text=True)
+            if not sparql:
+                return "OK"
+            if sparql[_PROLOGUE.match(sparql).end():][:3].upper() == "ASK":
+                return jsonify({"head": {}, "boolean": False})
+
+            counts = _AGGREGATE.findall(sparql)
+            bindings = [{name: {"type": "literal", "value": "0",
+                                "datatype": "http://www.w3.org/2001/XMLSchema#integer"} for name in counts}]
+
+            return jsonify({"head": {"vars": counts}, "results": {"bindings": bindings if counts else []}})
+
+        @app.route(self._path + '/statements', methods=['GET', 'POST', 'PUT', 'DELETE'])
+        def statements():
+            self._requests += 1
+            if request.method == 'GET':
+                return ""
+
+            return jsonify({})
+
+        return app
@@ -0,0 +1,363 @@
+import contextlib
+import logging
+import random
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import requests
+from cltl.combot.event.emissor import TextSignalEvent
+from cltl.combot.infra.config import ConfigurationManager
+from cltl.combot.infra.event import Event, EventBus
+from cltl.combot.infra.resource import ResourceManager
+from cltl.combot.infra.time_util import timestamp_now
+from cltl.combot.infra.topic_worker import TopicWorker
+from emissor.representation.scenario import TextSignal
+from flask import Flask, jsonify
+
+from app_service.event_bus.routed import RoutedKombuEventBus
+
+logger = logging.getLogger(__name__)
+
+
+MERGE = "merge"
+CANCEL = "cancel"
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def _signal(event: Event):
+    return getattr(event.payload, "signal", None)
+
+
+def _scenario_id(event: Event) -> Optional[str]:
+    return getattr(getattr(_signal(event), "time", None), "container_id", None)
+
+
+def _answer_key(turn: "_Turn") -> tuple:
+    # Replies depend on the conversation, only reuse them within the scenario of the tenant
+    return turn.tenant, turn.scenario_id, normalize(turn.text)
+
+
+class ModelFallback:
+    """Generates a reply with a small model on an OpenAI compatible chat completions endpoint at *url*."""
+    def __init__(self, url: str, model: str, instruction: Optional[str] = None, key: Optional[str] = None,
+                 timeout: float = 2.0, max_tokens: int = 50):
+        self.model = model
+        self._url = url.rstrip("/") + "/chat/completions"
+        self._instruction = instruction
+        self._headers = {"Authorization": f"Bearer {key}"} if key else {}
+        self._timeout = timeout
+        self._max_tokens = max_tokens
+
+    def __call__(self, text: str) -> str:
+        messages = [{"role": "system", "content": self._instruction}] if self._instruction else []
+        messages.append({"role": "user", "content": text})
+        response = requests.post(self._url, headers=self._headers, timeout=self._timeout,
+                                 json={"model": self.model, "messages": messages, "max_tokens": self._max_tokens})
+        response.raise_for_status()
+
+        return response.json()["choices"][0]["message"]["content"].strip()
+
+
+@dataclass
+class _Turn:
+    scenario_id: str
+    text: str
+    start: float
+    deadline: float
+    signal_id: Optional[str] = None
+    tenant: Optional[str] = None
+    expected: bool = True
+    fallback: Optional[str] = None
+
+
+class DeadlineService:
+    """Bounds the time between an input utterance and the reply of the agent.
+
+    The reply generation publishes its replies to the *reply* topic, from where
+    they are forwarded to the *response* topic. If there is no reply to an
+    utterance on the *input* topic within the *budget* in seconds, a fallback
+    reply is published instead: a cached reply to the same utterance earlier in
+    the scenario, a reply of the *fallback_model* or one of the *backchannels*. A reply that arrives
+    after its fallback is forwarded as well if *late* is ``merge`` and dropped
+    if it is ``cancel``. A reply on the response topic from another component,
+    e.g. a direct answer of the agent, completes the turn.
+
+    If an *expect* topic is configured, a reply is only expected for an
+    utterance once it is published on that topic (e.g. forwarded to the reply
+    generation), other utterances don't get a fallback. Replies of the agent,
+    i.e. all replies except the fallbacks, are published to the *agent* topic
+    if configured. Fallbacks are published in the tenant of the utterance on
+    the *routed_event_bus*.
+
+    Deadline misses are counted per backend, the backend of the reply
+    generation is named *backend*.
+    """
+    @classmethod
+    def from_config(cls, event_bus: EventBus, resource_manager: ResourceManager, config_manager: ConfigurationManager,
+                    backend: str, routed_event_bus: Optional[RoutedKombuEventBus] = None):
+        config = config_manager.get_config("app.deadline")
+
+        fallback_model = None
+        if "fallback_url" in config and config.get("fallback_url"):
+            instruction = config.get("fallback_instruction") if "fallback_instruction" in config else None
+            fallback_model = ModelFallback(config.get("fallback_url"), config.get("fallback_model"), instruction,
+                                           timeout=config.get_float("fallback_timeout"))
+        backchannels = config.get("backchannels", multi=True) if "backchannels" in config else []
+        expect_topic = config.get("topic_expect") if "topic_expect" in config else None
+        agent_topic = config.get("topic_agent") if "topic_agent" in config else None
+
+        return cls(config.get("topic_input"), config.get("topic_reply"), config.get("topic_response"),
+                   config.get_float("budget"), backend, fallback_model,
+                   [phrase.strip('"') for phrase in backchannels if phrase], config.get("late"),
+                   config.get_int("max_answers"), config.get_float("max_wait"),
+                   event_bus, resource_manager, expect_topic or None, agent_topic or None, routed_event_bus)
+
+    def __init__(self, input_topic: str, reply_topic: str, response_topic: str, budget: float, backend: str,
+                 fallback_model: Optional[Callable[[str], str]], backchannels: List[str], late: str,
+                 max_answers: int, max_wait: float, event_bus: EventBus, resource_manager: ResourceManager,
+                 expect_topic: Optional[str] = None, agent_topic: Optional[str] = None,
+                 routed_event_bus: Optional[RoutedKombuEventBus] = None):
+        if late not in (MERGE, CANCEL):
+            raise ValueError(f"Unsupported handling of late replies: {late}")
+
+        self._input_topic = input_topic
+        self._reply_topic = reply_topic
+        self._response_topic = response_topic
+        self._budget = budget
+        self._backend = backend
+        self._fallback_model = fallback_model
+        self._backchannels = backchannels
+        self._late = late
+        self._max_answers = max_answers
+        self._max_wait = max_wait
+        self._event_bus = event_bus
+        self._resource_manager = resource_manager
+        self._expect_topic = expect_topic
+        self._agent_topic = agent_topic
+        self._routed_event_bus = routed_event_bus
+
+        self._lock = threading.Lock()
+        self._turns: Dict[str, deque] = defaultdict(deque)
+        self._answers = OrderedDict()
+        self._published = deque(maxlen=256)
+        self._early_expected = deque(maxlen=256)
+        self._turn_counts = Counter()
+        self._misses = Counter()
+        self._fallbacks = Counter()
+        self._late_counts = Counter()
+        self._unanswered = 0
+
+        self._topic_worker = None
+        self._executor = None
+        self._thread = None
+        self._running = threading.Event()
+        self._wakeup = threading.Event()
+        self._app = None
+
+    def start(self, timeout=30):
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix=self.__class__.__name__)
+        topics = [self._input_topic, self._reply_topic, self._response_topic]
+        topics += [self._expect_topic] if self._expect_topic else []
+        provides = [self._response_topic] + ([self._agent_topic] if self._agent_topic else [])
+        self._topic_worker = TopicWorker(topics, self._event_bus, provides=provides, buffer_size=64,
+                                         processor=self._process, resource_manager=self._resource_manager,
+                                         name=self.__class__.__name__)
+        self._topic_worker.start().wait()
+
+        if self._budget > 0:
+            self._running.set()
+            self._wakeup.clear()
+            self._thread = threading.Thread(target=self._run, name=f"{self.__class__.__name__}-deadline", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if not self._topic_worker:
+            return
+
+        if self._thread:
+            self._running.clear()
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+        self._topic_worker.stop()
+        self._topic_worker.await_stop()
+        self._topic_worker = None
+        self._executor.shutdown(wait=False)
+
+    def status(self) -> dict:
+        with self._lock:
+            backends = {backend: {"turns": turns, "misses": self._misses[backend],
+                                  "miss_rate": round(self._misses[backend] / turns, 4) if turns else 0.0}
+                        for backend, turns in self._turn_counts.items()}
+
+            return {"budget": self._budget, "pending": sum(len(turns) for turns in self._turns.values()),
+                    "backends": backends, "fallbacks": dict(self._fallbacks), "late": dict(self._late_counts),
+                    "unanswered": self._unanswered}
+
+    @property
+    def app(self):
+        if self._app:
+            return self._app
+
+        self._app = Flask(__name__)
+
+        @self._app.route('/', methods=['GET'])
+        def status():
+            return jsonify(self.status())
+
+        return self._app
+
+    def check(self, now: Optional[float] = None) -> float:
+        """Publish fallbacks for turns that missed their deadline and return the time until the next deadline."""
+        now = now if now is not None else time.monotonic()
+        missed = []
+        next_deadline = now + self._budget
+        with self._lock:
+            for scenario_id, turns in list(self._turns.items()):
+                while turns and now - turns[0].start > self._max_wait:
+                    turns.popleft()
+                    self._late_counts["expired"] += 1
+                for turn in turns:
+                    if turn.fallback is None and turn.expected and turn.deadline <= now:
+                        turn.fallback = "pending"
+                        self._misses[self._backend] += 1
+                        missed.append(turn)
+                    elif turn.fallback is None and turn.expected:
+                        next_deadline = min(next_deadline, turn.deadline)
+                if not turns:
+                    del self._turns[scenario_id]
+
+        for turn in missed:
+            logger.info("Reply to %r in scenario %s missed its deadline of %.1fs",
+                        turn.text, turn.scenario_id, self._budget)
+            self._executor.submit(self._fallback, turn)
+
+        return max(0.0, next_deadline - now)
+
+    def _process(self, event: Event):
+        if event.metadata.topic == self._expect_topic:
+            self._expected(event)
+            return
+
+        scenario_id = _scenario_id(event)
+        text = getattr(_signal(event), "text", None)
+        if not scenario_id:
+            if event.metadata.topic == self._reply_topic:
+                self._forward(event)
+            return
+
+        if event.metadata.topic == self._input_topic:
+            if text and self._budget > 0:
+                now = time.monotonic()
+                turn = _Turn(scenario_id, text, now, now + self._budget, _signal(event).id,
+                             self._routed_event_bus.tenant_of(event) if self._routed_event_bus else None,
+                             expected=self._expect_topic is None or _signal(event).id in self._early_expected)
+                with self._lock:
+                    self._turns[scenario_id].append(turn)
+                    self._turn_counts[self._backend] += 1
+                self._wakeup.set()
+        elif event.metadata.topic == self._reply_topic:
+            self._reply(scenario_id, text, event)
+        elif _signal(event).id not in self._published:
+            # Reply of another component
+            with self._lock:
+                self._pop_turn(scenario_id, expected=False)
+            if self._agent_topic:
+                self._event_bus.publish(self._agent_topic, Event.for_payload(event.payload))
+
+    def _expected(self, event: Event):
+        signal_id = getattr(_signal(event), "id", None)
+        with self._lock:
+            turns = self._turns.get(_scenario_id(event), ())
+            turn = next((turn for turn in turns if turn.signal_id == signal_id), None)
+            if turn:
+                turn.expected = True
+            else:
+                # Arrived before its utterance
+                self._early_expected.append(signal_id)
+        self._wakeup.set()
+
+    def _pop_turn(self, scenario_id: str, expected: bool) -> Optional[_Turn]:
+        """The oldest turn of the scenario, if *expected* the oldest turn that expects a reply."""
+        turns = self._turns.get(scenario_id)
+        while turns:
+            turn = turns.popleft()
+            if turn.expected or not expected:
+                return turn
+            self._unanswered += 1
+
+        return None
+
+    def _reply(self, scenario_id: str, text: Optional[str], event: Event):
+        with self._lock:
+            turn = self._pop_turn(scenario_id, expected=True)
+            if turn and text and turn.fallback is None:
+                self._answers[_answer_key(turn)] = text
+                self._answers.move_to_end(_answer_key(turn))
+                while len(self._answers) > self._max_answers:
+                    self._answers.popitem(last=False)
+            if turn and turn.fallback not in (None, "pending", "none"):
+                self._late_counts["merged" if self._late == MERGE else "cancelled"] += 1
+                if self._late == CANCEL:
+                    logger.debug("Dropped late reply in scenario %s", scenario_id)
+                    return
+
+        self._forward(event)
+
+    def _forward(self, event: Event):
+        self._published.append(_signal(event).id if _signal(event) else None)
+        self._event_bus.publish(self._response_topic, Event.for_payload(event.payload))
+        if self._agent_topic:
+            self._event_bus.publish(self._agent_topic, Event.for_payload(event.payload))
+
+    def _fallback(self, turn: _Turn):
+        with self._lock:
+            reply, kind = self._answers.get(_answer_key(turn)), "cache"
+
+        if reply is None and self._fallback_model:
+            kind = "model"
+            backend = getattr(self._fallback_model, "model", "fallback")
+            with self._lock:
+                self._turn_counts[backend] += 1
+            try:
+                reply = self._fallback_model(turn.text)
+            except Exception as e:
+                logger.warning("Fallback model failed for %r: %s", turn.text, e)
+                with self._lock:
+                    self._misses[backend] += 1
+
+        if reply is None and self._backchannels:
+            reply, kind = random.choice(self._backchannels), "backchannel"
+
+        with self._lock:
+            if not any(pending is turn for pending in self._turns.get(turn.scenario_id, ())):
+                # The reply arrived while the fallback was generated
+                return
+            turn.fallback = kind if reply else "none"
+            self._fallbacks[turn.fallback] += 1
+
+        if reply:
+            signal = TextSignal.for_scenario(turn.scenario_id, timestamp_now(), timestamp_now(), None, reply)
+            self._published.append(signal.id)
+            with self._in_tenant(turn.tenant):
+                self._event_bus.publish(self._response_topic, Event.for_payload(TextSignalEvent.for_agent(signal)))
+
+    def _in_tenant(self, tenant: Optional[str]):
+        return self._routed_event_bus.in_tenant(tenant) if self._routed_event_bus else contextlib.nullcontext()
+
+    def _run(self):
+        while self._running.is_set():
+            self._wakeup.clear()
+            try:
+                wait = self.check()
+            except Exception:
+                logger.exception("Failed to check reply deadlines")
+                wait = self._budget
+            self._wakeup.wait(wait)
@@ -0,0 +1,184 @@
+import functools
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Iterable, Optional, Tuple
+
+from cltl.combot.infra.config import ConfigurationManager
+from flask import Flask, jsonify
+
+logger = logging.getLogger(__name__)
+
+
+SMALL = "small"
+LARGE = "large"
+
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def _text(value: Any, depth: int = 2) -> Optional[str]:
+    """The utterance in the arguments of a model call: a string, the transcript of
+    the last utterance of a chat, a text signal or a brain response with an utterance."""
+    if isinstance(value, str):
+        return value
+    if depth < 0 or value is None:
+        return None
+    if isinstance(value, dict):
+        candidates = [value.get("utterance"), value.get("text")] + list(value.values())
+    elif isinstance(value, (list, tuple)):
+        candidates = list(value)
+    else:
+        candidates = [getattr(value, "last_utterance", None), getattr(value, "transcript", None),
+                      getattr(value, "text", None)]
+    for candidate in candidates:
+        text = _text(candidate, depth - 1)
+        if text:
+            return text
+
+    return None
+
+
+class ComplexityRouter:
+    """Routes model calls to a small or a large model by the complexity of the input utterance.
+
+    Utterances of at most *max_tokens* tokens go to the small model if they start
+    with one of the *small_phrases* (greetings, acknowledgements) or contain none
+    of the *complex_markers* (conjunctions, subordinate clauses, questions), all
+    other utterances and calls without an utterance go to the large model.
+
+    Calls, failures, escalations, empty results and latency are counted per
+    client and route.
+    """
+    @classmethod
+    def from_config(cls, config_manager: ConfigurationManager):
+        config = config_manager.get_config("app.router")
+        small_phrases = config.get("small_phrases", multi=True) if "small_phrases" in config else []
+        complex_markers = config.get("complex_markers", multi=True) if "complex_markers" in config else []
+
+        return cls(config.get_int("max_tokens"), small_phrases, complex_markers)
+
+    def __init__(self, max_tokens: int, small_phrases: Iterable[str] = (), complex_markers: Iterable[str] = ()):
+        self._max_tokens = max_tokens
+        self._small_phrases = [tuple(_tokens(phrase)) for phrase in small_phrases if phrase]
+        self._complex_markers = {marker.strip().casefold() for marker in complex_markers if marker}
+
+        self._lock = threading.Lock()
+        self._counts = defaultdict(Counter)
+        self._latency = defaultdict(float)
+        self._app = None
+
+    def route(self, text: Optional[str]) -> Tuple[str, str]:
+        """The route and the rule that selected it for the *text*."""
+        if not text:
+            return LARGE, "no_utterance"
+
+        tokens = _tokens(text)
+        if len(tokens) > self._max_tokens:
+            return LARGE, "length"
+        if any(tuple(tokens[:len(phrase)]) == phrase for phrase in self._small_phrases):
+            return SMALL, "phrase"
+        if self._complex_markers.intersection(tokens):
+            return LARGE, "complex"
+
+        return SMALL, "short"
+
+    def record(self, client: str, route: str, rule: str, duration: float,
+               failed: bool = False, empty: bool = False, escalated: bool = False):
+        with self._lock:
+            counts = self._counts[(client, route)]
+            counts["calls"] += 1
+            counts["rule_" + rule] += 1
+            counts["failed"] += failed
+            counts["empty"] += empty
+            counts["escalated"] += escalated
+            self._latency[(client, route)] += duration
+
+    def status(self) -> dict:
+        with self._lock:
+            status = defaultdict(dict)
+            for (client, route), counts in self._counts.items():
+                status[client][route] = dict(counts,
+                                             avg_latency=round(self._latency[(client, route)] / counts["calls"], 3))
+
+            return {"max_tokens": self._max_tokens, "clients": status}
+
+    @property
+    def app(self):
+        if self._app:
+            return self._app
+
+        self._app = Flask(__name__)
+
+        @self._app.route('/', methods=['GET'])
+        def status():
+            return jsonify(self.status())
+
+        return self._app
+
+
+class RoutedModel:
+    """Delegates the *methods* of a model client to its *small* or *large* instance as routed by the *router*.
+
+    The methods are routed by the utterance in their arguments. Calls to the
+    small model that fail are retried with the large model, as are calls with
+    an empty result, i.e. no reply or no triples added to the last utterance of
+    the chat, unless they were routed by a small phrase: greetings and
+    acknowledgements are expected to have no result. All other attributes are
+    read from the large model.
+    """
+    def __init__(self, router: ComplexityRouter, client: str, large: Any, small: Any, methods: Iterable[str]):
+        self._router = router
+        self._client = client
+        self._models = {LARGE: large, SMALL: small}
+        self._methods = frozenset(methods)
+
+    def __getattr__(self, name):
+        if name not in self._methods:
+            return getattr(self._models[LARGE], name)
+
+        @functools.wraps(getattr(self._models[LARGE], name))
+        def routed(*args, **kwargs):
+            route, rule = self._router.route(_text(list(args) + list(kwargs.values()), depth=3))
+            if route == SMALL:
+                try:
+                    result, empty = self._call(SMALL, rule, name, args, kwargs)
+                    if not empty or rule == "phrase":
+                        return result
+                    logger.debug("Small model of %s returned no result, use the large model", self._client)
+                except Exception as e:
+                    logger.warning("Small model of %s failed, use the large model: %s", self._client, e)
+                rule = "escalated"
+
+            return self._call(LARGE, rule, name, args, kwargs)[0]
+
+        return routed
+
+    def _call(self, route: str, rule: str, name: str, args, kwargs) -> Tuple[Any, bool]:
+        triples = _triples(args)
+        start = time.monotonic()
+        try:
+            result = getattr(self._models[route], name)(*args, **kwargs)
+        except Exception:
+            self._router.record(self._client, route, rule, time.monotonic() - start, failed=True)
+            raise
+
+        empty = not result and (triples is None or _triples(args) == triples)
+        self._router.record(self._client, route, rule, time.monotonic() - start, empty=empty,
+                            escalated=rule == "escalated")
+
+        return result, empty
+
+
+def _triples(args) -> Optional[int]:
+    """The number of triples of the last utterance of the chat in the arguments of an analyzer."""
+    chat = next((arg for arg in args if hasattr(arg, "last_utterance")), None)
+    triples = getattr(getattr(chat, "last_utterance", None), "triples", None)
+
+    return len(triples) if triples is not None else None
+
+
+def _tokens(text: str):
+    return [token.casefold() for token in _TOKEN.findall(text)]
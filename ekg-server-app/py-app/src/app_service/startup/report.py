@@ -0,0 +1,114 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Phase:
+    name: str
+    start: float
+    duration: float
+    thread: str
+
+    def to_dict(self):
+        return {"name": self.name, "start": self.start, "duration": self.duration, "thread": self.thread}
+
+
+def process_age() -> Optional[float]:
+    """Seconds since the start of the process, if available from /proc."""
+    try:
+        with open("/proc/self/stat") as stat:
+            # The process name may contain spaces, the start time is the 22nd field
+            start_ticks = int(stat.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as uptime:
+            uptime = float(uptime.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+    return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+
+
+class StartupReport:
+    """Records the duration of the phases of the application start.
+
+    Phase start times are relative to the creation of the report, the time
+    before, i.e. interpreter start and module imports, is reported as a
+    separate phase when the age of the process is available. Modules imported
+    on demand are timed in their own phase where they are imported.
+    """
+    def __init__(self):
+        self._created = time.monotonic()
+        self._lock = threading.Lock()
+        self._phases = []
+        self._ready = None
+
+        age = process_age()
+        if age is not None:
+            self._phases.append(Phase("Interpreter start and imports", -age, age, threading.current_thread().name))
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            phase = Phase(name, start - self._created, time.monotonic() - start, threading.current_thread().name)
+            with self._lock:
+                self._phases.append(phase)
+
+    def load(self, loaders: Dict[str, Callable[[], object]], parallel: bool = True,
+             dependencies: Iterable[Callable[[], object]] = ()):
+        """Run the *loaders*, each in its own phase, in parallel threads if *parallel*.
+
+        The *dependencies*, i.e. the singletons shared by the loaders, are created
+        sequentially before, such that only the singletons of the loaders
+        themselves are created in parallel. A singleton that is created by
+        two threads at a time has to be awaited by one of them, which fails
+        if it takes longer than the timeout of the container.
+
+        Raises the first error of the loaders after all of them have finished.
+        """
+        if dependencies:
+            with self.phase("Create shared components"):
+                for dependency in dependencies:
+                    dependency()
+
+        if not parallel or len(loaders) < 2:
+            for name, loader in loaders.items():
+                with self.phase(name):
+                    loader()
+            return
+
+        def run(name, loader):
+            with self.phase(name):
+                return loader()
+
+        with ThreadPoolExecutor(max_workers=len(loaders), thread_name_prefix="Startup") as executor:
+            futures = [executor.submit(run, name, loader) for name, loader in loaders.items()]
+        for future in futures:
+            future.result()
+
+    def ready(self):
+        self._ready = time.monotonic() - self._created
+
+    @property
+    def phases(self) -> List[Phase]:
+        with self._lock:
+            return sorted(self._phases, key=lambda phase: phase.start)
+
+    def to_dict(self) -> dict:
+        return {"ready": self._ready, "phases": [phase.to_dict() for phase in self.phases]}
+
+    def format(self) -> str:
+        lines = [f"Ready after {self._ready:.2f}s" if self._ready is not None else "Not ready"]
+        lines += [f"  {phase.start:8.2f}s {phase.duration:8.2f}s  {phase.name} [{phase.thread}]"
+                  for phase in self.phases]
+
+        return "\n".join(lines)
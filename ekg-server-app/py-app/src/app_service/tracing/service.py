@@ -0,0 +1,54 @@
+import logging
+
+from cltl.combot.infra.config import ConfigurationManager
+from flask import Flask, jsonify, request
+
+from app_service.tracing.tracer import Tracer
+
+logger = logging.getLogger(__name__)
+
+
+class TracingService:
+    """Exposes the turns recorded by a :class:`Tracer`.
+
+    ``/turns`` lists the most recent trace ids, ``/chrome`` exports the spans of
+    the requested (``?trace=<id>``, repeatable) or all turns in the Chrome trace
+    event format (load in chrome://tracing or Perfetto) and ``/stages`` returns
+    the queue and processing time histograms per TopicWorker.
+    """
+    @classmethod
+    def from_config(cls, config_manager: ConfigurationManager):
+        config = config_manager.get_config("app.tracing")
+        max_traces = config.get_int("max_traces") if "max_traces" in config else 1000
+
+        return cls(Tracer(max_traces))
+
+    def __init__(self, tracer: Tracer):
+        self._tracer = tracer
+        self._app = None
+
+    @property
+    def tracer(self) -> Tracer:
+        return self._tracer
+
+    @property
+    def app(self):
+        if self._app:
+            return self._app
+
+        self._app = Flask(__name__)
+
+        @self._app.route('/turns', methods=['GET'])
+        def turns():
+            limit = request.args.get("limit", default=100, type=int)
+            return jsonify(self._tracer.traces()[-limit:])
+
+        @self._app.route('/chrome', methods=['GET'])
+        def chrome():
+            return jsonify(self._tracer.chrome_trace(request.args.getlist("trace")))
+
+        @self._app.route('/stages', methods=['GET'])
+        def stages():
+            return jsonify(self._tracer.stages())
+
+        return self._app
@@ -0,0 +1,234 @@
+import functools
+import hashlib
+import importlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, List, Optional
+
+from cltl.combot.infra.config import ConfigurationManager
+
+logger = logging.getLogger(__name__)
+
+
+_ENUM = "__enum__"
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+class ExtractionCache:
+    """Disk backed cache of extracted triples.
+
+    Entries are stored as JSON files keyed on a hash of the input. The cache
+    is bounded in the number of entries, the least recently used entries are
+    evicted first, and entries expire *ttl* seconds after they were written.
+    """
+    @classmethod
+    def from_config(cls, config_manager: ConfigurationManager):
+        config = config_manager.get_config("cltl.triple_extraction.cache")
+
+        return cls(config.get("path"), config.get_int("max_entries"), config.get_float("ttl"))
+
+    def __init__(self, path: str, max_entries: int, ttl: float):
+        self._path = path
+        self._max_entries = max_entries
+        self._ttl = ttl
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+        self._load_index()
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses, "entries": len(self._entries)}
+
+    def key(self, *parts) -> str:
+        return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Any]]:
+        with self._lock:
+            created = self._entries.get(key)
+            if created is not None and time.time() - created <= self._ttl:
+                self._entries.move_to_end(key)
+
+        if created is not None and time.time() - created > self._ttl:
+            self._remove(key)
+            created = None
+
+        triples = None
+        if created is not None:
+            try:
+                with open(self._file(key)) as cache_file:
+                    triples = json.load(cache_file)["triples"]
+            except (OSError, ValueError, KeyError):
+                logger.warning("Invalid triple cache entry %s", key)
+                self._remove(key)
+
+        with self._lock:
+            if triples is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+
+        return triples
+
+    def put(self, key: str, triples: List[Any]):
+        try:
+            content = json.dumps({"triples": triples})
+        except (TypeError, ValueError):
+            logger.debug("Triples for %s are not cached, they are not JSON serializable", key)
+            return
+
+        file = self._file(key)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        with open(file + ".tmp", 'w') as cache_file:
+            cache_file.write(content)
+        os.replace(file + ".tmp", file)
+
+        with self._lock:
+            self._entries[key] = time.time()
+            self._entries.move_to_end(key)
+            evicted = []
+            while len(self._entries) > self._max_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                evicted.append(evicted_key)
+
+        for evicted_key in evicted:
+            self._unlink(evicted_key)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self._path, key[:2], key + ".json")
+
+    def _remove(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+        self._unlink(key)
+
+    def _unlink(self, key: str):
+        try:
+            os.remove(self._file(key))
+        except FileNotFoundError:
+            pass
+
+    def _load_index(self):
+        if not os.path.isdir(self._path):
+            return
+
+        entries = []
+        for directory, _, files in os.walk(self._path):
+            for file in files:
+                if file.endswith(".json"):
+                    entries.append((os.stat(os.path.join(directory, file)).st_mtime, file[:-len(".json")]))
+
+        now = time.time()
+        for created, key in sorted(entries):
+            if now - created > self._ttl:
+                self._unlink(key)
+            else:
+                self._entries[key] = created
+        while len(self._entries) > self._max_entries:
+            self._unlink(self._entries.popitem(last=False)[0])
+
+        logger.info("Loaded triple cache with %s entries from %s", len(self._entries), self._path)
+
+
+class CachedAnalyzer:
+    """Serves the triples of an analyzer from an :class:`ExtractionCache`.
+
+    The analyzer adds the triples it extracts to the last utterance of the
+    chat, these triples are cached by the normalized transcripts and speakers
+    of the utterance and the *context_length* preceding utterances of the chat
+    and the *model* of the analyzer. On a cache hit the cached triples are
+    added to the last utterance instead of calling the analyzer. Analyzers with
+    a *temperature* above *max_temperature* are not deterministic enough to be
+    cached and are always called.
+    """
+    @classmethod
+    def from_config(cls, analyzer, cache: ExtractionCache, model: str, context_length: int, temperature: float,
+                    config_manager: ConfigurationManager):
+        config = config_manager.get_config("cltl.triple_extraction.cache")
+
+        return cls(analyzer, cache, model, context_length, temperature, config.get_float("max_temperature"))
+
+    def __init__(self, analyzer, cache: ExtractionCache, model: str, context_length: int,
+                 temperature: float, max_temperature: float):
+        self._analyzer = analyzer
+        self._cache = cache
+        self._model = model
+        self._context_length = context_length
+        self._bypass = temperature > max_temperature
+
+        if self._bypass:
+            logger.info("Triple cache disabled for %s with temperature %s", model, temperature)
+
+    def analyze(self, utterance):
+        """Deprecated, use `analyze_in_context` instead!"""
+        self._analyze("analyze", [utterance], utterance, utterance)
+
+    def analyze_in_context(self, chat):
+        utterances = list(getattr(chat, "utterances", None) or [chat.last_utterance])
+
+        self._analyze("analyze_in_context", utterances[-(self._context_length + 1):], chat.last_utterance, chat)
+
+    def __getattr__(self, name):
+        return getattr(self._analyzer, name)
+
+    def _analyze(self, method: str, utterances: list, utterance, argument):
+        key = None if self._bypass else self._cache.key(self._model, method, [_signature(item) for item in utterances])
+
+        cached = self._cache.get(key) if key else None
+        if cached is not None:
+            logger.debug("Triple cache hit for %r", _transcript(utterance))
+            for triple in cached:
+                utterance.add_json_triple(_decode(triple))
+            return
+
+        extracted = len(utterance.triples)
+        getattr(self._analyzer, method)(argument)
+        if key:
+            self._cache.put(key, [_encode(triple) for triple in utterance.triples[extracted:]])
+
+
+def _encode(value):
+    """JSON compatible copy of a triple, enums (e.g. the utterance type) are stored by class and name."""
+    if isinstance(value, Enum):
+        return {_ENUM: f"{type(value).__module__}:{type(value).__qualname__}", "name": value.name}
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict) and _ENUM in value:
+        module, name = value[_ENUM].split(":")
+        return getattr(functools.reduce(getattr, name.split("."), importlib.import_module(module)), value["name"])
+    if isinstance(value, dict):
+        return {key: _decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+
+    return value
+
+
+def _transcript(utterance) -> str:
+    return utterance if isinstance(utterance, str) else getattr(utterance, "transcript", "") or ""
+
+
+def _signature(utterance):
+    speaker = getattr(utterance, "utterance_speaker", None)
+    speaker = speaker if isinstance(speaker, str) else getattr(speaker, "name", None)
+
+    return [normalize(_transcript(utterance)), speaker]
@@ -0,0 +1,267 @@
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+from cltl.combot.infra.config import Configuration, ConfigurationManager
+from cltl.combot.infra.event import Event, EventBus
+from cltl.combot.infra.resource import ResourceManager
+from cltl.combot.infra.topic_worker import TopicWorker
+from flask import Flask, jsonify
+
+logger = logging.getLogger(__name__)
+
+
+COMMIT = "commit"
+DISCARD = "discard"
+
+
+@dataclass
+class _Utterance:
+    text: Optional[str]
+    received: float
+    forwarded: Optional[float] = None
+    decision: Optional[str] = None
+    results: List[Any] = field(default_factory=list)
+    extracted: bool = False
+
+
+def _signal_id(event: Event) -> Optional[str]:
+    return getattr(getattr(event.payload, "signal", None), "id", None)
+
+
+def _turn_ids(payload) -> List[str]:
+    """The utterances of the capsules in the payload of the triple extraction."""
+    capsules = payload if isinstance(payload, (list, tuple)) else getattr(payload, "capsules", None) or []
+
+    return list(OrderedDict.fromkeys(capsule["turn"] for capsule in capsules
+                                     if isinstance(capsule, dict) and capsule.get("turn")))
+
+
+class _TopicConfiguration(Configuration):
+    """Configuration with the values of *topics* replacing the configured topics."""
+    def __init__(self, config: Configuration, topics: dict):
+        self._config = config
+        self._topics = topics
+
+    def get(self, key, multi=False):
+        if key in self._topics:
+            return [self._topics[key]] if multi else self._topics[key]
+
+        return self._config.get(key, multi)
+
+    def get_int(self, key):
+        return self._config.get_int(key)
+
+    def get_float(self, key):
+        return self._config.get_float(key)
+
+    def get_boolean(self, key):
+        return self._config.get_boolean(key)
+
+    def get_enum(self, key, type, multi=False):
+        return self._config.get_enum(key, type, multi)
+
+    def __contains__(self, key):
+        return key in self._topics or key in self._config
+
+    def __iter__(self):
+        return iter([(key, value) for key, value in self._config if key not in self._topics]
+                    + list(self._topics.items()))
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+
+class _ExtractionConfigurationManager(ConfigurationManager):
+    def __init__(self, config_manager: ConfigurationManager, section: str, topics: dict):
+        self._config_manager = config_manager
+        self._section = section
+        self._topics = topics
+
+    def get_config(self, name, callback=None):
+        config = self._config_manager.get_config(name, callback)
+
+        return _TopicConfiguration(config, self._topics) if name == self._section else config
+
+    def has_config(self, name):
+        return self._config_manager.has_config(name)
+
+
+class SpeculationService:
+    """Commits or discards the results of speculative triple extraction.
+
+    The triple extraction consumes the utterances on the *input* topic at the
+    same time as the About agent and publishes its results to the *speculative*
+    topic. The results of an utterance are published to the *output* topic once
+    the About agent forwards the utterance on the *forward* topic, and discarded
+    if the About agent answered it itself, i.e. a later utterance is forwarded
+    first or the utterance is not forwarded within *timeout* seconds.
+
+    Results are matched to their utterance by the turn of the capsules or the
+    signal of the result, results that match no pending utterance are dropped
+    and counted as unmatched. A forward that arrives before its utterance is
+    kept until the utterance arrives or for *timeout* seconds.
+
+    The triple extraction is configured with :meth:`extraction_config`.
+    """
+    @classmethod
+    def from_config(cls, event_bus: EventBus, resource_manager: ResourceManager,
+                    config_manager: ConfigurationManager):
+        config = config_manager.get_config("app.speculation")
+
+        return cls(config.get("topic_input"), config.get("topic_forward"), config.get("topic_speculative"),
+                   config.get("topic_output"), config.get_float("timeout"), event_bus, resource_manager)
+
+    def __init__(self, input_topic: str, forward_topic: str, speculative_topic: str, output_topic: str,
+                 timeout: float, event_bus: EventBus, resource_manager: ResourceManager):
+        self._input_topic = input_topic
+        self._forward_topic = forward_topic
+        self._speculative_topic = speculative_topic
+        self._output_topic = output_topic
+        self._timeout = timeout
+        self._event_bus = event_bus
+        self._resource_manager = resource_manager
+
+        self._lock = threading.Lock()
+        self._utterances = OrderedDict()
+        self._early_forwards = OrderedDict()
+        self._counts = Counter()
+        self._head_start = 0.0
+
+        self._topic_worker = None
+        self._app = None
+
+    def extraction_config(self, config_manager: ConfigurationManager,
+                          section: str = "cltl.triple_extraction") -> ConfigurationManager:
+        """The *config_manager* with the input and output topics of the triple extraction in *section* replaced
+        by the input and speculative topics."""
+        return _ExtractionConfigurationManager(config_manager, section, {"topic_input": self._input_topic,
+                                                                         "topic_output": self._speculative_topic})
+
+    def start(self, timeout=30):
+        self._topic_worker = TopicWorker([self._input_topic, self._forward_topic, self._speculative_topic],
+                                         self._event_bus, provides=[self._output_topic], buffer_size=64,
+                                         processor=self._process, resource_manager=self._resource_manager,
+                                         name=self.__class__.__name__)
+        self._topic_worker.start().wait()
+
+    def stop(self):
+        if not self._topic_worker:
+            return
+
+        self._topic_worker.stop()
+        self._topic_worker.await_stop()
+        self._topic_worker = None
+
+    def status(self) -> dict:
+        with self._lock:
+            committed = self._counts["committed"]
+
+            return {"pending": len(self._utterances), "early_forwards": len(self._early_forwards), **self._counts,
+                    "avg_head_start": round(self._head_start / committed, 3) if committed else 0.0}
+
+    @property
+    def app(self):
+        if self._app:
+            return self._app
+
+        self._app = Flask(__name__)
+
+        @self._app.route('/', methods=['GET'])
+        def status():
+            return jsonify(self.status())
+
+        return self._app
+
+    def _process(self, event: Event):
+        with self._lock:
+            self._expire(time.monotonic())
+
+            if event.metadata.topic == self._input_topic:
+                self._received(event)
+            elif event.metadata.topic == self._forward_topic:
+                self._forwarded(event)
+            else:
+                self._extracted(event)
+
+    def _received(self, event: Event):
+        signal_id = _signal_id(event)
+        if signal_id:
+            text = getattr(event.payload.signal, "text", None)
+            self._utterances[signal_id] = _Utterance(text, time.monotonic())
+            if self._early_forwards.pop(signal_id, None) is not None:
+                self._forward(signal_id)
+
+    def _forwarded(self, event: Event):
+        signal_id = _signal_id(event)
+        if signal_id in self._utterances:
+            self._forward(signal_id)
+        elif signal_id:
+            # The forward overtook its utterance
+            self._early_forwards[signal_id] = time.monotonic()
+
+    def _forward(self, signal_id: str):
+        utterance = self._utterances[signal_id]
+
+        # Utterances received before the forwarded one were answered by the About agent
+        for earlier_id, earlier in list(self._utterances.items()):
+            if earlier_id == signal_id:
+                break
+            if earlier.decision is None:
+                self._decide(earlier_id, DISCARD)
+
+        utterance.forwarded = time.monotonic()
+        self._head_start += utterance.forwarded - utterance.received
+        self._decide(signal_id, COMMIT)
+
+    def _extracted(self, event: Event):
+        turn_ids = _turn_ids(event.payload) + [_signal_id(event)]
+        signal_id = next((turn_id for turn_id in turn_ids if turn_id in self._utterances), None)
+        if signal_id is None:
+            # Guessing by order would attach the triples to the wrong utterance
+            logger.debug("Dropped triple extraction result without pending utterance")
+            self._counts["unmatched"] += 1
+            return
+
+        utterance = self._utterances[signal_id]
+        utterance.extracted = True
+        utterance.results.append(event.payload)
+        self._decide(signal_id, utterance.decision)
+
+    def _decide(self, signal_id: str, decision: Optional[str]):
+        utterance = self._utterances[signal_id]
+        if decision and utterance.decision is None:
+            utterance.decision = decision
+            self._counts["committed" if decision == COMMIT else "discarded"] += 1
+
+        if decision is None:
+            return
+
+        if decision == COMMIT:
+            for result in utterance.results:
+                self._event_bus.publish(self._output_topic, Event.for_payload(result))
+        elif utterance.results:
+            logger.debug("Discarded speculative triple extraction of %r", utterance.text)
+        utterance.results = []
+
+        if utterance.extracted:
+            del self._utterances[signal_id]
+
+    def _expire(self, now: float):
+        for signal_id, forwarded in list(self._early_forwards.items()):
+            if now - forwarded <= self._timeout:
+                break
+            del self._early_forwards[signal_id]
+            self._counts["unknown"] += 1
+
+        for signal_id, utterance in list(self._utterances.items()):
+            if now - utterance.received <= self._timeout:
+                break
+            if utterance.decision is None:
+                self._decide(signal_id, DISCARD)
+            else:
+                self._counts["expired"] += 1
+            self._utterances.pop(signal_id, None)
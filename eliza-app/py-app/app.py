@@ -1,9 +1,23 @@
 import json
 import logging.config
 import os
-import time
+from typing import TYPE_CHECKING, Callable, Dict, List
 
+from app_service.admin.service import AdminService
+from app_service.audio.storage import AsyncAudioStorage
+from app_service.chatui.admission import AdmissionControl
 from app_service.context.service import ContextService
+from app_service.emissordata.client import LocalEmissorDataClient
+from app_service.event_bus.lanes import PriorityEventBus, TopicLanes
+from app_service.event_bus.observed import ObservedEventBus, ProcessObserver
+from app_service.event_bus.routed import RoutedKombuEventBus, TenantContext
+from app_service.event_log.policy import EventLogPolicy, PolicyLogWriter
+from app_service.event_log.writer import BufferedLogWriter
+from app_service.health.checks import event_bus_connected, topic_workers_alive, topic_workers_idle
+from app_service.health.service import HealthService
+from app_service.metrics.collector import MetricsCollector, MetricsEventBus
+from app_service.metrics.service import MetricsService
+from app_service.tts.phrases import PhraseCache, SpeechTextOutput
 from cltl.backend.api.backend import Backend
 from cltl.backend.api.camera import CameraResolution, Camera
 from cltl.backend.api.microphone import Microphone
@@ -34,8 +48,6 @@ from cltl.eliza.api import Eliza
 from cltl.eliza.eliza import ElizaImpl
 from cltl.emissordata.api import EmissorDataStorage
 from cltl.emissordata.file_storage import EmissorDataFileStorage
-from cltl.vad.webrtc_vad import WebRtcVAD
-from cltl_service.asr.service import AsrService
 from cltl_service.backend.backend import BackendService
 from cltl_service.backend.storage import StorageService
 from cltl_service.bdi.service import BDIService
@@ -46,12 +58,15 @@ from cltl_service.emissordata.client import EmissorDataClient
 from cltl_service.emissordata.service import EmissorDataService
 from cltl_service.intentions.init import InitService
 from cltl_service.keyword.service import KeywordService
-from cltl_service.vad.service import VadService
 from emissor.representation.util import serializer as emissor_serializer, marshal, unmarshal, register_type_var
 from flask import Flask
 from werkzeug.middleware.dispatcher import DispatcherMiddleware
 from werkzeug.serving import run_simple
 
+if TYPE_CHECKING:
+    from cltl_service.asr.service import AsrService
+    from cltl_service.vad.service import VadService
+
 logging.config.fileConfig(os.environ.get('CLTL_LOGGING_CONFIG', default='config/logging.config'),
                           disable_existing_loggers=False)
 logger = logging.getLogger(__name__)
@@ -84,24 +99,93 @@ class InfraContainer(KombuEventBusContainer, K8LocalConfigurationContainer, Thre
     def event_bus(self):
         config = self.config_manager.get_config("cltl.event")
         implementation = config.get("implementation")
+        routed_event_bus = None
         if implementation == "internal":
-            return SynchronousEventBus()
+            event_bus = SynchronousEventBus()
         elif implementation == "kombu":
-            return super().event_bus
+            kombu_config = self.config_manager.get_config("cltl.event.kombu")
+            if "routing" in kombu_config and kombu_config.get("routing") == "tenant":
+                routed_event_bus = RoutedKombuEventBus.from_config(self.event_bus_serializer, self.config_manager,
+                                                                    self.topic_lanes)
+                event_bus = routed_event_bus
+            else:
+                event_bus = super().event_bus
         else:
             raise ValueError("Unknown implementation: " + implementation)
 
+        if self.topic_lanes:
+            lane_latency = self.metrics_service.collector.lane_latency if self.metrics_service else None
+            event_bus = PriorityEventBus(event_bus, self.topic_lanes, observer=lane_latency)
+
+        if self.metrics_service:
+            event_bus = MetricsEventBus(event_bus, self.metrics_service.collector)
+
+        # The tenant is entered before the other observers are notified
+        observers = [TenantContext(routed_event_bus)] if routed_event_bus else []
+
+        return ObservedEventBus(event_bus, observers + self.process_observers())
+
+    def process_observers(self) -> List[ProcessObserver]:
+        return [self.metrics_service.collector] if self.metrics_service else []
+
+    @property
+    @singleton
+    def topic_lanes(self) -> TopicLanes:
+        config = self.config_manager.get_config("cltl.event.lanes")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return TopicLanes.from_config(self.config_manager)
+
+    @property
+    @singleton
+    def admin_service(self):
+        config = self.config_manager.get_config("app.admin")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return AdminService.from_config(self.config_manager)
+
+    @property
+    @singleton
+    def health_service(self) -> HealthService:
+        return HealthService.from_config(self.readiness_checks(), lambda: topic_workers_idle(self.event_bus), self.config_manager)
+
+    @property
+    @singleton
+    def metrics_service(self):
+        config = self.config_manager.get_config("app.metrics")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return MetricsService(MetricsCollector())
+
+    def readiness_checks(self) -> Dict[str, Callable[[], bool]]:
+        return {
+            "event_bus": lambda: event_bus_connected(self.event_bus),
+            "topic_workers": lambda: topic_workers_alive(self),
+        }
+
     def start(self):
         pass
 
     def stop(self):
-        pass
+        if self.admin_service:
+            self.admin_service.stop()
 
 
 class BackendContainer(InfraContainer):
     @property
     @singleton
     def audio_storage(self) -> AudioStorage:
+        config = self.config_manager.get_config("cltl.backend")
+        if "audio_storage_async" in config and config.get_boolean("audio_storage_async"):
+            storage = AsyncAudioStorage.from_config(self.config_manager)
+            if self.metrics_service:
+                self.metrics_service.collector.register_queue("audio_storage", lambda: storage.stats)
+
+            return storage
+
         return CachedAudioStorage.from_config(self.config_manager)
 
     @property
@@ -119,6 +203,15 @@ class BackendContainer(InfraContainer):
     def image_source(self) -> ImageSource:
         return []
 
+    @property
+    @singleton
+    def phrase_cache(self) -> PhraseCache:
+        config = self.config_manager.get_config("cltl.backend.phrase_cache")
+        if not config.get("render_url"):
+            return None
+
+        return PhraseCache.from_config(self.config_manager)
+
     @property
     @singleton
     def text_output(self) -> TextOutput:
@@ -127,6 +220,8 @@ class BackendContainer(InfraContainer):
         gestures = config.get("gestures", multi=True) if "gestures" in config else None
         if remote_url:
             return AnimatedRemoteTextOutput(remote_url, gestures)
+        elif self.phrase_cache:
+            return SpeechTextOutput(self.phrase_cache)
         else:
             return ConsoleOutput()
 
@@ -181,13 +276,19 @@ class BackendContainer(InfraContainer):
         super().start()
         if self.server:
             self.server.start()
+        if isinstance(self.audio_storage, AsyncAudioStorage):
+            self.audio_storage.start()
         self.storage_service.start()
+        if self.phrase_cache:
+            self.phrase_cache.prerender()
         self.backend_service.start()
 
     def stop(self):
         logger.info("Stop Backend")
         self.storage_service.stop()
         self.backend_service.stop()
+        if isinstance(self.audio_storage, AsyncAudioStorage):
+            self.audio_storage.stop()
         if self.server:
             self.server.stop()
         super().stop()
@@ -196,7 +297,10 @@ class BackendContainer(InfraContainer):
 class VADContainer(InfraContainer):
     @property
     @singleton
-    def vad_service(self) -> VadService:
+    def vad_service(self) -> "VadService":
+        from cltl.vad.webrtc_vad import WebRtcVAD
+        from cltl_service.vad.service import VadService
+
         config = self.config_manager.get_config("cltl.vad.webrtc")
         activity_window = config.get_int("activity_window")
         activity_threshold = config.get_float("activity_threshold")
@@ -236,7 +340,7 @@ class EmissorStorageContainer(InfraContainer):
     @property
     @singleton
     def emissor_data_client(self) -> EmissorDataClient:
-        return EmissorDataClient("http://0.0.0.0:8000/emissor")
+        return LocalEmissorDataClient.from_config(self.emissor_storage, self.config_manager)
 
     def start(self):
         logger.info("Start Emissor Data Storage")
@@ -252,7 +356,7 @@ class EmissorStorageContainer(InfraContainer):
 class ASRContainer(EmissorStorageContainer, InfraContainer):
     @property
     @singleton
-    def asr_service(self) -> AsrService:
+    def asr_service(self) -> "AsrService":
         config = self.config_manager.get_config("cltl.asr")
         sampling_rate = config.get_int("sampling_rate")
         implementation = config.get("implementation")
@@ -286,6 +390,8 @@ class ASRContainer(EmissorStorageContainer, InfraContainer):
             raise ValueError("Unsupported implementation " + implementation)
 
         if asr:
+            from cltl_service.asr.service import AsrService
+
             return AsrService.from_config(asr, self.emissor_data_client,
                                           self.event_bus, self.resource_manager, self.config_manager)
         else:
@@ -356,13 +462,34 @@ class ChatUIContainer(InfraContainer):
     def chatui_service(self) -> ChatUiService:
         return ChatUiService.from_config(MemoryChats(), self.event_bus, self.resource_manager, self.config_manager)
 
+    @property
+    @singleton
+    def admission_control(self) -> AdmissionControl:
+        config = self.config_manager.get_config("app.admission")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return AdmissionControl.from_config(self.event_bus, self.config_manager)
+
+    @property
+    @singleton
+    def chatui_app(self):
+        if not self.admission_control:
+            return self.chatui_service.app
+
+        return self.admission_control.wrap(self.chatui_service.app)
+
     def start(self):
         logger.info("Start Chat UI")
         super().start()
         self.chatui_service.start()
+        if self.admission_control:
+            self.admission_control.start()
 
     def stop(self):
         logger.info("Stop Chat UI")
+        if self.admission_control:
+            self.admission_control.stop()
         self.chatui_service.stop()
         super().stop()
 
@@ -398,8 +525,13 @@ class ApplicationContainer(ElizaContainer, ElizaComponentsContainer,
     def log_writer(self):
         config = self.config_manager.get_config("cltl.event_log")
 
-        # Serialize in a plain JSON format
-        return LogWriter(config.get("log_dir"), emissor_serializer)
+        if "writer" in config and config.get("writer") == "buffered":
+            writer = BufferedLogWriter.from_config(emissor_serializer, self.config_manager)
+        else:
+            # Serialize in a plain JSON format
+            writer = LogWriter(config.get("log_dir"), emissor_serializer)
+
+        return PolicyLogWriter(writer, EventLogPolicy.from_config(emissor_serializer, self.config_manager))
 
     @property
     @singleton
@@ -409,12 +541,18 @@ class ApplicationContainer(ElizaContainer, ElizaComponentsContainer,
     def start(self):
         logger.info("Start EventLog")
         super().start()
+        if isinstance(self.log_writer.writer, BufferedLogWriter):
+            self.log_writer.writer.start()
         self.event_log_service.start()
+        self.health_service.set_started()
 
     def stop(self):
+        self.health_service.set_started(False)
         try:
             logger.info("Stop EventLog")
             self.event_log_service.stop()
+            if isinstance(self.log_writer.writer, BufferedLogWriter):
+                self.log_writer.writer.stop()
         finally:
             try:
                 logger.info("Stop EventBus")
@@ -431,29 +569,40 @@ def main():
 
     with application as started_app:
         logger.info("Starting the application")
-        time.sleep(1)
 
-        intention_topic = started_app.config_manager.get_config("cltl.bdi").get("topic_intention")
-        init_event = Event.for_payload(IntentionEvent([Intention("init", None)]))
-        started_app.event_bus.publish(intention_topic, init_event)
+        def init():
+            intention_topic = started_app.config_manager.get_config("cltl.bdi").get("topic_intention")
+            init_event = Event.for_payload(IntentionEvent([Intention("init", None)]))
+            started_app.event_bus.publish(intention_topic, init_event)
+
+            logger.info("Started 'init' intention")
 
-        logger.info("Started 'init' intention")
+        # Publish the init intention once ready, /health serves readiness while waiting
+        started_app.health_service.when_ready(init)
 
         routes = {
             '/storage': started_app.storage_service.app,
             '/emissor': started_app.emissor_data_service.app,
-            '/chatui': started_app.chatui_service.app,
+            '/chatui': started_app.chatui_app,
+            '/health': started_app.health_service.app,
         }
+        if started_app.admin_service:
+            routes['/admin'] = started_app.admin_service.app
+        if started_app.admission_control:
+            routes['/admission'] = started_app.admission_control.app
+        if started_app.metrics_service:
+            routes['/metrics'] = started_app.metrics_service.app
         if started_app.server:
             routes['/host'] = started_app.server.app
 
         web_app = DispatcherMiddleware(Flask("Eliza app"), routes)
 
-        run_simple('0.0.0.0', 8000, web_app, threaded=True, use_reloader=False, use_debugger=False, use_evalex=True)
+        port = started_app.config_manager.get_config("app.server").get_int("port")
+        run_simple('0.0.0.0', port, web_app, threaded=True, use_reloader=False, use_debugger=False, use_evalex=True)
 
         intention_topic = started_app.config_manager.get_config("cltl.bdi").get("topic_intention")
         started_app.event_bus.publish(intention_topic, Event.for_payload(IntentionEvent([Intention("terminate", None)])))
-        time.sleep(1)
+        started_app.health_service.wait_idle()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,328 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from types import SimpleNamespace
+from typing import Iterable, List, Optional, Union
+
+import numpy as np
+import soundfile
+from cltl.backend.api.microphone import AudioParameters
+from cltl.backend.api.storage import AudioStorage
+from cltl.combot.infra.config import ConfigurationManager
+from cltl.combot.infra.time_util import timestamp_now
+
+logger = logging.getLogger(__name__)
+
+
+_COMPRESSION_FORMATS = {"flac": ("FLAC", "PCM_16")}
+
+_FRAME = "frame"
+_FINISH = "finish"
+
+
+class _Signal:
+    """The frames of a signal while it is stored."""
+    def __init__(self, signal_id: str, sampling_rate: int):
+        self.signal_id = signal_id
+        self.sampling_rate = sampling_rate
+        self.condition = threading.Condition()
+        self.frames: List[np.ndarray] = []
+        self.parameters: Optional[AudioParameters] = None
+        self.finished = False
+        self.dropped = 0
+        # Only used by the writer
+        self.file = None
+        self.written = 0
+
+
+class AsyncAudioStorage(AudioStorage):
+    """Audio storage that persists audio off the capture path, with the file layout of the
+    CachedAudioStorage of the backend.
+
+    The frames of a signal are kept in memory while it is stored, such that they
+    can be read while the signal is recorded, and are written to a WAV file by a
+    background thread as they arrive. Storing does not block when the writer falls
+    behind: queued frames are dropped and counted, the writer catches up from the
+    frames in memory and the signal is written completely. Finished signals are optionally converted to
+    a lossless compressed format, which is decoded in memory when the signal is
+    read. Written files are synced to disk in batches. Finished signals are served
+    from a bounded read cache.
+    """
+    @classmethod
+    def from_config(cls, config_manager: ConfigurationManager):
+        config = config_manager.get_config("cltl.backend")
+        path = config.get("audio_storage_path")
+        compression = config.get("audio_storage_compression") if "audio_storage_compression" in config else None
+        queue_size = config.get_int("audio_storage_queue") if "audio_storage_queue" in config else 64
+        fsync_batch = config.get_int("audio_storage_fsync_batch") if "audio_storage_fsync_batch" in config else 16
+        fsync_interval = config.get_float("audio_storage_fsync_interval") if "audio_storage_fsync_interval" in config else 5.0
+        read_cache = config.get_int("audio_storage_read_cache") if "audio_storage_read_cache" in config else 32
+
+        return cls(path, compression, queue_size, fsync_batch, fsync_interval, read_cache)
+
+    def __init__(self, storage_path: str, compression: str = None, queue_size: int = 64,
+                 fsync_batch: int = 16, fsync_interval: float = 5.0, read_cache: int = 32):
+        if compression and compression.lower() not in _COMPRESSION_FORMATS:
+            raise ValueError(f"Unsupported audio compression {compression}, "
+                             f"supported: {list(_COMPRESSION_FORMATS.keys())}")
+
+        self._storage_path = os.path.abspath(storage_path)
+        self._compression = compression.lower() if compression else None
+        os.makedirs(self._storage_path, exist_ok=True)
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._overflow = deque()
+        self._dropped = 0
+        self._fsync_batch = fsync_batch
+        self._fsync_interval = fsync_interval
+        self._unsynced = []
+        self._last_sync = time.time()
+
+        self._signals = dict()
+        self._read_cache = OrderedDict()
+        self._read_cache_size = read_cache
+        self._lock = threading.Lock()
+
+        self._writer = None
+
+    @property
+    def stats(self) -> dict:
+        return {"queued": self._queue.qsize(), "capacity": self._queue.maxsize, "dropped": self._dropped}
+
+    def start(self):
+        self._writer = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._writer.start()
+
+    def stop(self):
+        if not self._writer:
+            return
+
+        self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+        self._sync()
+
+    def store(self, signal_id: str, audio: Union[np.array, Iterable[np.array]], sampling_rate: int):
+        if isinstance(audio, np.ndarray):
+            audio = [audio]
+
+        signal = _Signal(signal_id, sampling_rate)
+        with self._lock:
+            self._signals[signal_id] = signal
+            self._read_cache.pop(signal_id, None)
+
+        try:
+            for frame in audio:
+                with signal.condition:
+                    if signal.parameters is None:
+                        signal.parameters = _audio_parameters(frame, sampling_rate)
+                    signal.frames.append(frame)
+                    signal.condition.notify_all()
+                self._enqueue(_FRAME, signal)
+        finally:
+            with signal.condition:
+                signal.finished = True
+                signal.condition.notify_all()
+            self._enqueue(_FINISH, signal)
+
+    def get(self, signal_id: str, offset: int = 0, length: int = -1):
+        with self._lock:
+            signal = self._signals.get(signal_id)
+            cached = self._read_cache.get(signal_id) if signal is None else None
+            if cached is not None:
+                self._read_cache.move_to_end(signal_id)
+
+        if signal is not None:
+            with signal.condition:
+                signal.condition.wait_for(lambda: signal.parameters is not None or signal.finished)
+            if signal.parameters is None:
+                raise KeyError(f"No audio with id {signal_id} found in the storage")
+
+            return self._live_frames(signal, offset, length), signal.parameters
+
+        if cached is None:
+            cached = self._read(signal_id)
+            self._cache(signal_id, *cached)
+
+        data, parameters = cached
+
+        return _chunks(data, parameters.frame_size, offset, length), parameters
+
+    def _enqueue(self, kind: str, signal: _Signal):
+        if not self._writer:
+            self._handle(kind, signal)
+            return
+
+        try:
+            self._queue.put_nowait((kind, signal))
+        except queue.Full:
+            if kind == _FINISH:
+                # Never dropped, the writer picks it up after the queued frames
+                self._overflow.append(signal)
+                return
+
+            self._dropped += 1
+            if not signal.dropped:
+                logger.warning("Audio storage queue full, the writer catches up with signal %s", signal.signal_id)
+            signal.dropped += 1
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self._fsync_interval)
+            except queue.Empty:
+                self._finish_overflow()
+                self._sync()
+                continue
+
+            if item is None:
+                break
+
+            self._handle(*item)
+            self._finish_overflow()
+
+        self._finish_overflow()
+
+    def _finish_overflow(self):
+        while self._overflow:
+            self._handle(_FINISH, self._overflow.popleft())
+
+    def _handle(self, kind: str, signal: _Signal):
+        try:
+            if kind == _FRAME:
+                self._write(signal)
+            else:
+                self._finish(signal)
+        except Exception:
+            logger.exception("Failed to store audio signal %s", signal.signal_id)
+            if kind == _FINISH:
+                with self._lock:
+                    self._signals.pop(signal.signal_id, None)
+
+    def _write(self, signal: _Signal):
+        with signal.condition:
+            frames = signal.frames[signal.written:]
+        if not frames:
+            return
+
+        if signal.file is None:
+            signal.file = soundfile.SoundFile(self._path(signal.signal_id, "wav"), 'w',
+                                              samplerate=signal.sampling_rate,
+                                              channels=signal.parameters.channels,
+                                              format="WAV", subtype="PCM_16")
+        for frame in frames:
+            signal.file.write(frame)
+        signal.written += len(frames)
+
+    def _finish(self, signal: _Signal):
+        self._write(signal)
+        if signal.file is None:
+            with self._lock:
+                self._signals.pop(signal.signal_id, None)
+            return
+
+        signal.file.close()
+        signal.file = None
+
+        data = np.concatenate(signal.frames)
+        audio_file = self._path(signal.signal_id, "wav")
+        if self._compression:
+            audio_file = self._compress(signal, data)
+
+        meta_file = self._path(signal.signal_id, "json", "_meta")
+        with open(meta_file, 'w') as f:
+            json.dump({"timestamp": timestamp_now(), "parameters": signal.parameters}, f, default=vars)
+
+        self._cache(signal.signal_id, data, signal.parameters)
+        with self._lock:
+            self._signals.pop(signal.signal_id, None)
+
+        self._unsynced.extend([audio_file, meta_file])
+        if len(self._unsynced) >= 2 * self._fsync_batch or time.time() - self._last_sync > self._fsync_interval:
+            self._sync()
+
+    def _compress(self, signal: _Signal, data: np.ndarray) -> str:
+        compressed_file = self._path(signal.signal_id, self._compression)
+        fmt, subtype = _COMPRESSION_FORMATS[self._compression]
+        soundfile.write(compressed_file, data, signal.sampling_rate, format=fmt, subtype=subtype)
+        os.remove(self._path(signal.signal_id, "wav"))
+
+        logger.debug("Compressed audio signal %s to %s", signal.signal_id, compressed_file)
+
+        return compressed_file
+
+    def _read(self, signal_id: str):
+        audio_file = self._path(signal_id, "wav")
+        if self._compression and not os.path.isfile(audio_file):
+            audio_file = self._path(signal_id, self._compression)
+
+        try:
+            with open(self._path(signal_id, "json", "_meta")) as f:
+                meta = json.load(f, object_hook=lambda d: SimpleNamespace(**d))
+            data, _ = soundfile.read(audio_file, dtype='int16')
+        except (FileNotFoundError, RuntimeError):
+            raise KeyError(f"No audio with id {signal_id} found in the storage")
+
+        return data, AudioParameters(**vars(meta.parameters))
+
+    def _cache(self, signal_id: str, data: np.ndarray, parameters: AudioParameters):
+        with self._lock:
+            self._read_cache[signal_id] = (data, parameters)
+            self._read_cache.move_to_end(signal_id)
+            while len(self._read_cache) > self._read_cache_size:
+                self._read_cache.popitem(last=False)
+
+    @staticmethod
+    def _live_frames(signal: _Signal, offset: int, length: int):
+        frame_size = signal.parameters.frame_size
+        if offset % frame_size:
+            raise ValueError(f"Offsets not matching frame borders are not supported (frame_size: {frame_size})")
+
+        index, count = offset // frame_size, 0
+        while length < 0 or count < length:
+            with signal.condition:
+                signal.condition.wait_for(lambda: index < len(signal.frames) or signal.finished)
+                if index >= len(signal.frames):
+                    return
+                frame = signal.frames[index]
+            index += 1
+            count += frame_size
+            yield frame
+
+    def _sync(self):
+        unsynced, self._unsynced = self._unsynced, []
+        for file in unsynced:
+            try:
+                with open(file, 'rb') as f:
+                    os.fsync(f.fileno())
+            except FileNotFoundError:
+                pass
+
+        if unsynced and hasattr(os, 'O_DIRECTORY'):
+            directory = os.open(self._storage_path, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+
+        self._last_sync = time.time()
+
+    def _path(self, signal_id: str, extension: str, suffix: str = ""):
+        return os.path.join(self._storage_path, f"{signal_id}{suffix}.{extension}")
+
+
+def _audio_parameters(frame: np.ndarray, sampling_rate: int) -> AudioParameters:
+    if frame.dtype != np.int16:
+        raise ValueError(f"Only np.int16 is supported, was: {frame.dtype}")
+
+    return AudioParameters(sampling_rate, 1 if frame.ndim == 1 else frame.shape[1], frame.shape[0], 2)
+
+
+def _chunks(data: np.ndarray, frame_size: int, offset: int, length: int):
+    stop = len(data) if length < 0 else min(len(data), offset + length)
+
+    return (data[start:min(start + frame_size, stop)] for start in range(offset, stop, frame_size))
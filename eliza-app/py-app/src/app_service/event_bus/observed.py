@@ -0,0 +1,178 @@
+import functools
+import inspect
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, List
+
+from cltl.combot.infra.event import Event, EventBus
+from cltl.combot.infra.topic_worker import TopicWorker
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessObserver:
+    """Observes the delivery and processing of events by TopicWorkers, see :class:`ObservedEventBus`.
+
+    :meth:`started` is called before an event is processed, its result is passed
+    to :meth:`finished` together with the start and end time of the processing.
+    Events delivered to a TopicWorker that it did not process, e.g. because its
+    queue was full, are reported by :meth:`skipped`.
+    """
+    def delivered(self, worker: str, event: Event):
+        pass
+
+    def skipped(self, worker: str, event_id: str):
+        pass
+
+    def started(self, worker: str, event: Event) -> Any:
+        return None
+
+    def finished(self, worker: str, event: Event, state: Any, start: float, end: float, failed: bool):
+        pass
+
+
+class _Worker:
+    """The ids of the events delivered to a TopicWorker that it did not start to process yet."""
+    def __init__(self, name: str):
+        self.name = name
+        self.queued = OrderedDict()
+        self.processing = False
+
+
+class ObservedEventBus(EventBus):
+    """Decorates an :class:`EventBus` to report the events delivered to and processed by the
+    TopicWorkers subscribed to it to :class:`ProcessObserver` instances.
+
+    A TopicWorker subscribes to the event bus when it is started, the
+    :meth:`TopicWorker.process` method of that worker instance is then wrapped
+    to report the processing of its events. The TopicWorker class and workers
+    subscribed to other event buses are not affected. The processing time is
+    measured once for all observers.
+
+    A TopicWorker processes its events in the order they were delivered, such
+    that events delivered before the event that is processed were skipped by
+    the worker and events delivered after it are pending. Events a worker does
+    not accept, e.g. while its intention is inactive, are pending until it
+    processes the next event, at most *max_pending* events per worker.
+    """
+    def __init__(self, event_bus: EventBus, observers: Iterable[ProcessObserver] = (), max_pending: int = 10000):
+        self._event_bus = event_bus
+        self._observers = list(observers)
+        self._max_pending = max_pending
+        self._workers = dict()
+        self._lock = threading.Lock()
+        self._handlers = dict()
+
+    def add_observer(self, observer: ProcessObserver):
+        with self._lock:
+            if not any(added is observer for added in self._observers):
+                self._observers.append(observer)
+
+    def pending(self) -> Dict[str, int]:
+        """The number of events delivered to and not yet processed by the TopicWorkers, by worker name."""
+        pending = Counter()
+        with self._lock:
+            for worker in self._workers.values():
+                pending[worker.name] += len(worker.queued) + worker.processing
+
+        return dict(pending)
+
+    def publish(self, topic: str, event: Event):
+        self._event_bus.publish(topic, event)
+
+    def subscribe(self, topic, handler):
+        topic_worker = getattr(inspect.unwrap(handler), "__self__", None)
+        if not isinstance(topic_worker, TopicWorker):
+            self._event_bus.subscribe(topic, handler)
+            return
+
+        worker = self._observe(topic_worker)
+
+        @functools.wraps(handler)
+        def delivering_handler(event):
+            self._delivered(worker, event)
+            return handler(event)
+
+        self._handlers[(topic, handler)] = delivering_handler
+        self._event_bus.subscribe(topic, delivering_handler)
+
+    def unsubscribe(self, topic, handler=None):
+        if handler is None:
+            self._event_bus.unsubscribe(topic)
+            return
+
+        self._event_bus.unsubscribe(topic, self._handlers.pop((topic, handler), handler))
+
+    def __getattr__(self, name):
+        return getattr(self._event_bus, name)
+
+    def _observe(self, topic_worker: TopicWorker) -> _Worker:
+        with self._lock:
+            if topic_worker in self._workers:
+                return self._workers[topic_worker]
+            worker = self._workers[topic_worker] = _Worker(topic_worker.name)
+
+        process = topic_worker.process
+
+        def observed_process(event):
+            if event is None:
+                return process(event)
+
+            observers = self._started(worker, event)
+            states = [self._notify(observer.started, worker, event) for observer in observers]
+            start = time.time()
+            failed = True
+            try:
+                result = process(event)
+                failed = False
+                return result
+            finally:
+                end = time.time()
+                with self._lock:
+                    worker.processing = False
+                for observer, state in zip(reversed(observers), reversed(states)):
+                    self._notify(observer.finished, worker, event, state, start, end, failed)
+
+        # Set on the instance, TopicWorker.process stays unchanged
+        topic_worker.process = observed_process
+
+        return worker
+
+    def _delivered(self, worker: _Worker, event: Event):
+        with self._lock:
+            worker.queued[event.id] = None
+            skipped = [worker.queued.popitem(last=False)[0]
+                       for _ in range(len(worker.queued) - self._max_pending)]
+            observers = list(self._observers)
+
+        for observer in observers:
+            self._notify(observer.delivered, worker, event)
+            for event_id in skipped:
+                self._notify(observer.skipped, worker, event_id)
+
+    def _started(self, worker: _Worker, event: Event) -> List[ProcessObserver]:
+        skipped = []
+        with self._lock:
+            if event.id in worker.queued:
+                while True:
+                    event_id, _ = worker.queued.popitem(last=False)
+                    if event_id == event.id:
+                        break
+                    skipped.append(event_id)
+            worker.processing = True
+            observers = list(self._observers)
+
+        for observer in observers:
+            for event_id in skipped:
+                self._notify(observer.skipped, worker, event_id)
+
+        return observers
+
+    @staticmethod
+    def _notify(callback, worker: _Worker, *args):
+        try:
+            return callback(worker.name, *args)
+        except Exception:
+            logger.exception("Failed to observe %s of %s", callback.__name__, worker.name)
@@ -0,0 +1,102 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Tuple
+
+from cltl.combot.infra.config import ConfigurationManager
+from flask import Flask, jsonify
+
+logger = logging.getLogger(__name__)
+
+
+class HealthService:
+    """Liveness and readiness of the application.
+
+    ``/live`` responds as long as the HTTP server runs. ``/ready`` responds
+    with status 200 only if the application is started and all readiness
+    checks pass, and with 503 otherwise. The result of each check is included
+    in the response.
+    """
+    @classmethod
+    def from_config(cls, checks: Dict[str, Callable[[], bool]], idle: Callable[[], bool],
+                    config_manager: ConfigurationManager):
+        config = config_manager.get_config("app.health")
+        ready_timeout = config.get_float("ready_timeout") if "ready_timeout" in config else 60.0
+        drain_timeout = config.get_float("drain_timeout") if "drain_timeout" in config else 10.0
+        interval = config.get_float("check_interval") if "check_interval" in config else 0.5
+
+        return cls(checks, idle, ready_timeout, drain_timeout, interval)
+
+    def __init__(self, checks: Dict[str, Callable[[], bool]], idle: Callable[[], bool],
+                 ready_timeout: float = 60.0, drain_timeout: float = 10.0, interval: float = 0.5):
+        self._checks = checks
+        self._idle = idle
+        self._ready_timeout = ready_timeout
+        self._drain_timeout = drain_timeout
+        self._interval = interval
+        self._started = False
+        self._app = None
+
+    def set_started(self, started: bool = True):
+        self._started = started
+
+    def ready(self) -> Tuple[bool, Dict[str, bool]]:
+        results = {"started": self._started}
+        for name, check in self._checks.items():
+            try:
+                results[name] = bool(check())
+            except Exception as e:
+                logger.debug("Readiness check %s failed: %s", name, e)
+                results[name] = False
+
+        return all(results.values()), results
+
+    def wait_ready(self) -> bool:
+        """Wait until the application is ready, at most *ready_timeout* seconds."""
+        return self._wait(lambda: self.ready()[0], self._ready_timeout,
+                          lambda: "Application not ready after %ss: %s" % (self._ready_timeout, self.ready()[1]))
+
+    def when_ready(self, callback: Callable[[], None]) -> threading.Thread:
+        """Call *callback* in a background thread once the application is ready, at the latest after *ready_timeout*
+        seconds, such that readiness can be probed on ``/ready`` while the HTTP server is started."""
+        def wait_and_call():
+            self.wait_ready()
+            callback()
+
+        thread = threading.Thread(target=wait_and_call, name=self.__class__.__name__ + "-ready", daemon=True)
+        thread.start()
+
+        return thread
+
+    def wait_idle(self) -> bool:
+        """Wait until no events are queued for processing, at most *drain_timeout* seconds."""
+        return self._wait(self._idle, self._drain_timeout,
+                          lambda: "Events still queued after %ss" % self._drain_timeout)
+
+    def _wait(self, condition: Callable[[], bool], timeout: float, message: Callable[[], str]) -> bool:
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                logger.warning(message())
+                return False
+            time.sleep(self._interval)
+
+        return True
+
+    @property
+    def app(self):
+        if self._app:
+            return self._app
+
+        self._app = Flask(__name__)
+
+        @self._app.route('/live', methods=['GET'])
+        def live():
+            return jsonify({"live": True})
+
+        @self._app.route('/ready', methods=['GET'])
+        def ready():
+            is_ready, results = self.ready()
+            return jsonify({"ready": is_ready, "checks": results}), 200 if is_ready else 503
+
+        return self._app
@@ -0,0 +1,171 @@
+import io
+import logging
+import threading
+import wave
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+import requests
+from cltl.backend.spi.text import TextOutput
+from cltl.combot.infra.config import ConfigurationManager
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.strip().strip('"').split()).casefold()
+
+
+def configured_phrases(config_manager: ConfigurationManager) -> Iterable[str]:
+    """The fixed phrases of the application: the LLM intro and stop phrases, the
+    greeting of the init intention and the phrases configured for the cache."""
+    phrases = []
+    for section, key in (("cltl.llm", "intro"), ("cltl.llm", "stop"), ("cltl.intentions.init", "greeting")):
+        try:
+            config = config_manager.get_config(section)
+        except Exception:
+            continue
+        if key in config:
+            phrases.append(config.get(key))
+
+    config = config_manager.get_config("cltl.backend.phrase_cache")
+    if "phrases" in config:
+        phrases += config.get("phrases", multi=True)
+
+    # Phrases with placeholders are only known at runtime
+    return [phrase.strip('"') for phrase in phrases if phrase and "{" not in phrase]
+
+
+class HttpSpeechRenderer:
+    """Renders text to WAV audio with a TTS server that returns the audio for the text posted to *url*."""
+    def __init__(self, url: str, timeout: float = 30.0):
+        self._url = url
+        self._timeout = timeout
+
+    def __call__(self, text: str) -> bytes:
+        response = requests.post(self._url, data=text.encode("utf-8"),
+                                 headers={"Content-Type": "text/plain; charset=utf-8"}, timeout=self._timeout)
+        response.raise_for_status()
+
+        return response.content
+
+
+def play_wav(audio: bytes):
+    import numpy as np
+    import sounddevice
+
+    with wave.open(io.BytesIO(audio)) as wav:
+        dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[wav.getsampwidth()]
+        frames = np.frombuffer(wav.readframes(wav.getnframes()), dtype=dtype).reshape(-1, wav.getnchannels())
+        rate = wav.getframerate()
+
+    sounddevice.play(frames, rate)
+    sounddevice.wait()
+
+
+class PhraseCache:
+    """Rendered speech of frequent phrases.
+
+    The fixed phrases of the application are rendered by :meth:`prerender` and
+    never evicted. Other phrases are kept once they were spoken *min_count*
+    times in an LRU cache of *max_phrases* phrases. Occurrences are counted for
+    the ten times *max_phrases* most recently spoken phrases that are not cached.
+    """
+    @classmethod
+    def from_config(cls, config_manager: ConfigurationManager):
+        config = config_manager.get_config("cltl.backend.phrase_cache")
+        renderer = HttpSpeechRenderer(config.get("render_url"))
+
+        return cls(renderer, configured_phrases(config_manager),
+                   config.get_int("max_phrases"), config.get_int("min_count"))
+
+    def __init__(self, renderer: Callable[[str], bytes], phrases: Iterable[str] = (),
+                 max_phrases: int = 100, min_count: int = 3):
+        self._renderer = renderer
+        self._phrases = list(phrases)
+        self._max_phrases = max_phrases
+        self._min_count = min_count
+
+        self._lock = threading.Lock()
+        self._pinned = dict()
+        self._cache = OrderedDict()
+        self._counts = OrderedDict()
+        self._max_counts = 10 * max_phrases
+        self._hits = 0
+        self._misses = 0
+
+    def prerender(self):
+        for phrase in self._phrases:
+            try:
+                audio = self._renderer(phrase)
+            except Exception:
+                logger.exception("Failed to render phrase %r", phrase)
+                continue
+            with self._lock:
+                self._pinned[normalize(phrase)] = audio
+        logger.info("Rendered %s of %s phrases", len(self._pinned), len(self._phrases))
+
+    def get(self, text: str) -> Optional[bytes]:
+        key = normalize(text)
+        with self._lock:
+            audio = self._pinned.get(key)
+            if audio is None and key in self._cache:
+                self._cache.move_to_end(key)
+                audio = self._cache[key]
+            if audio is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+
+        return audio
+
+    def render(self, text: str) -> bytes:
+        """The rendered speech of the *text*, from the cache if possible."""
+        audio = self.get(text)
+        if audio is not None:
+            return audio
+
+        audio = self._renderer(text)
+        key = normalize(text)
+        with self._lock:
+            self._count(key)
+            if self._counts.get(key, 0) >= self._min_count:
+                self._add(key, audio)
+
+        return audio
+
+    def status(self) -> dict:
+        with self._lock:
+            return {"pinned": len(self._pinned), "cached": len(self._cache), "hits": self._hits,
+                    "misses": self._misses}
+
+    def _count(self, key: str):
+        self._counts[key] = self._counts.pop(key, 0) + 1
+        while len(self._counts) > self._max_counts:
+            self._counts.popitem(last=False)
+
+    def _add(self, key: str, audio: bytes):
+        self._counts.pop(key, None)
+        if key in self._pinned:
+            return
+
+        self._cache[key] = audio
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._max_phrases:
+            self._cache.popitem(last=False)
+
+
+class SpeechTextOutput(TextOutput):
+    """Speaks text on the local audio device, with the speech rendered by the *phrase_cache*."""
+    def __init__(self, phrase_cache: PhraseCache, player: Callable[[bytes], None] = play_wav):
+        self._phrase_cache = phrase_cache
+        self._player = player
+
+    def consume(self, text: str, language=None):
+        try:
+            audio = self._phrase_cache.render(text)
+        except Exception:
+            logger.exception("Failed to render %r", text)
+            return
+
+        self._player(audio)
@@ -1,7 +1,7 @@
 import json
 import logging.config
 import os
-import time
+from typing import TYPE_CHECKING, Callable, Dict, List
 
 from cltl.backend.api.backend import Backend
 from cltl.backend.api.camera import CameraResolution, Camera
@@ -30,10 +30,6 @@ from cltl.combot.infra.event_log import LogWriter
 from cltl.combot.infra.resource.threaded import ThreadedResourceContainer
 from cltl.emissordata.api import EmissorDataStorage
 from cltl.emissordata.file_storage import EmissorDataFileStorage
-from cltl.llm.api import LLM
-from cltl.llm.llm import LLMImpl
-from cltl.vad.webrtc_vad import WebRtcVAD
-from cltl_service.asr.service import AsrService
 from cltl_service.backend.backend import BackendService
 from cltl_service.backend.storage import StorageService
 from cltl_service.bdi.service import BDIService
@@ -43,14 +39,44 @@ from cltl_service.emissordata.client import EmissorDataClient
 from cltl_service.emissordata.service import EmissorDataService
 from cltl_service.intentions.init import InitService
 from cltl_service.keyword.service import KeywordService
-from cltl_service.llm.service import LLMService
-from cltl_service.vad.service import VadService
 from emissor.representation.util import serializer as emissor_serializer, marshal, unmarshal, register_type_var
 from flask import Flask
 from werkzeug.middleware.dispatcher import DispatcherMiddleware
 from werkzeug.serving import run_simple
 
+from app_service.admin.service import AdminService
+from app_service.asr.cache import CachedASR
+from app_service.audio.shm import SharedMemoryAudioSource
+from app_service.audio.storage import AsyncAudioStorage
+from app_service.chatui.admission import AdmissionControl
 from app_service.context.service import ContextService
+from app_service.emissordata.append_storage import AppendOnlyEmissorDataStorage
+from app_service.emissordata.client import LocalEmissorDataClient
+from app_service.emissordata.query import EmissorQueryService
+from app_service.event_bus.lanes import PriorityEventBus, TopicLanes
+from app_service.event_bus.observed import ObservedEventBus, ProcessObserver
+from app_service.event_bus.routed import RoutedKombuEventBus, TenantContext
+from app_service.event_log.policy import EventLogPolicy, PolicyLogWriter
+from app_service.event_log.writer import BufferedLogWriter
+from app_service.health.checks import event_bus_connected, topic_workers_alive, topic_workers_idle, url_reachable
+from app_service.health.service import HealthService
+from app_service.metrics.collector import MetricsCollector, MetricsEventBus
+from app_service.metrics.service import MetricsService
+from app_service.reply.deadline import DeadlineService
+from app_service.session.reaper import SessionReaper
+from app_service.session.service import SessionStateService, restore_llm_history
+from app_service.session.store import SessionState, SessionStore
+from app_service.startup.report import StartupReport
+from app_service.tracing.service import TracingService
+from app_service.tracing.tracer import TracingEventBus
+from app_service.tts.phrases import PhraseCache, SpeechTextOutput
+
+if TYPE_CHECKING:
+    from cltl.asr.api import ASR
+    from cltl.llm.api import LLM
+    from cltl_service.asr.service import AsrService
+    from cltl_service.llm.service import LLMService
+    from cltl_service.vad.service import VadService
 
 logging.config.fileConfig(os.environ.get('CLTL_LOGGING_CONFIG', default='config/logging.config'),
                           disable_existing_loggers=False)
@@ -85,23 +111,120 @@ class InfraContainer(KombuEventBusContainer, K8LocalConfigurationContainer, Thre
         config = self.config_manager.get_config("cltl.event")
         implementation = config.get("implementation")
         if implementation == "internal":
-            return SynchronousEventBus()
+            event_bus = SynchronousEventBus()
         elif implementation == "kombu":
-            return super().event_bus
+            event_bus = self.routed_event_bus or super().event_bus
         else:
             raise ValueError("Unknown implementation: " + implementation)
 
+        if self.topic_lanes:
+            lane_latency = self.metrics_service.collector.lane_latency if self.metrics_service else None
+            event_bus = PriorityEventBus(event_bus, self.topic_lanes, observer=lane_latency)
+
+        if self.metrics_service:
+            event_bus = MetricsEventBus(event_bus, self.metrics_service.collector)
+
+        if self.tracing_service:
+            event_bus = TracingEventBus(event_bus, self.tracing_service.tracer)
+
+        # The tenant is entered before the other observers are notified
+        observers = [TenantContext(self.routed_event_bus)] if self.routed_event_bus else []
+
+        return ObservedEventBus(event_bus, observers + self.process_observers())
+
+    def process_observers(self) -> List[ProcessObserver]:
+        observers = []
+        if self.metrics_service:
+            observers.append(self.metrics_service.collector)
+        if self.tracing_service:
+            observers.append(self.tracing_service.tracer)
+
+        return observers
+
+    @property
+    @singleton
+    def routed_event_bus(self) -> RoutedKombuEventBus:
+        if self.config_manager.get_config("cltl.event").get("implementation") != "kombu":
+            return None
+
+        config = self.config_manager.get_config("cltl.event.kombu")
+        if "routing" not in config or config.get("routing") != "tenant":
+            return None
+
+        return RoutedKombuEventBus.from_config(self.event_bus_serializer, self.config_manager, self.topic_lanes)
+
+    @property
+    @singleton
+    def topic_lanes(self) -> TopicLanes:
+        config = self.config_manager.get_config("cltl.event.lanes")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return TopicLanes.from_config(self.config_manager)
+
+    @property
+    @singleton
+    def startup_report(self) -> StartupReport:
+        return StartupReport()
+
+    @property
+    @singleton
+    def admin_service(self):
+        config = self.config_manager.get_config("app.admin")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return AdminService.from_config(self.config_manager, self.startup_report)
+
+    @property
+    @singleton
+    def health_service(self) -> HealthService:
+        return HealthService.from_config(self.readiness_checks(), lambda: topic_workers_idle(self.event_bus), self.config_manager)
+
+    @property
+    @singleton
+    def metrics_service(self):
+        config = self.config_manager.get_config("app.metrics")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return MetricsService(MetricsCollector())
+
+    @property
+    @singleton
+    def tracing_service(self):
+        config = self.config_manager.get_config("app.tracing")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return TracingService.from_config(self.config_manager)
+
+    def readiness_checks(self) -> Dict[str, Callable[[], bool]]:
+        return {
+            "event_bus": lambda: event_bus_connected(self.event_bus),
+            "topic_workers": lambda: topic_workers_alive(self),
+        }
+
     def start(self):
         pass
 
     def stop(self):
-        pass
+        if self.admin_service:
+            self.admin_service.stop()
 
 
 class BackendContainer(InfraContainer):
     @property
     @singleton
     def audio_storage(self) -> AudioStorage:
+        config = self.config_manager.get_config("cltl.backend")
+        if "audio_storage_async" in config and config.get_boolean("audio_storage_async"):
+            storage = AsyncAudioStorage.from_config(self.config_manager)
+            if self.metrics_service:
+                self.metrics_service.collector.register_queue("audio_storage", lambda: storage.stats)
+
+            return storage
+
         return CachedAudioStorage.from_config(self.config_manager)
 
     @property
@@ -112,13 +235,31 @@ class BackendContainer(InfraContainer):
     @property
     @singleton
     def audio_source(self) -> AudioSource:
-        return ClientAudioSource.from_config(self.config_manager)
+        source = ClientAudioSource.from_config(self.config_manager)
+
+        config = self.config_manager.get_config("cltl.backend")
+        transport = config.get("audio_transport") if "audio_transport" in config else None
+        if transport == "shm":
+            return SharedMemoryAudioSource.from_config(source, self.config_manager)
+        elif transport:
+            raise ValueError("Unsupported audio transport: " + transport)
+
+        return source
 
     @property
     @singleton
     def image_source(self) -> ImageSource:
         return []
 
+    @property
+    @singleton
+    def phrase_cache(self) -> PhraseCache:
+        config = self.config_manager.get_config("cltl.backend.phrase_cache")
+        if not config.get("render_url"):
+            return None
+
+        return PhraseCache.from_config(self.config_manager)
+
     @property
     @singleton
     def text_output(self) -> TextOutput:
@@ -127,6 +268,8 @@ class BackendContainer(InfraContainer):
         gestures = config.get("gestures", multi=True) if "gestures" in config else None
         if remote_url:
             return AnimatedRemoteTextOutput(remote_url, gestures)
+        elif self.phrase_cache:
+            return SpeechTextOutput(self.phrase_cache)
         else:
             return ConsoleOutput()
 
@@ -179,15 +322,22 @@ class BackendContainer(InfraContainer):
     def start(self):
         logger.info("Start Backend")
         super().start()
-        if self.server:
-            self.server.start()
-        self.storage_service.start()
-        self.backend_service.start()
+        with self.startup_report.phase("Start Backend"):
+            if self.server:
+                self.server.start()
+            if isinstance(self.audio_storage, AsyncAudioStorage):
+                self.audio_storage.start()
+            self.storage_service.start()
+            self.backend_service.start()
 
     def stop(self):
         logger.info("Stop Backend")
         self.storage_service.stop()
         self.backend_service.stop()
+        if isinstance(self.audio_source, SharedMemoryAudioSource):
+            self.audio_source.close()
+        if isinstance(self.audio_storage, AsyncAudioStorage):
+            self.audio_storage.stop()
         if self.server:
             self.server.stop()
         super().stop()
@@ -196,7 +346,15 @@ class BackendContainer(InfraContainer):
 class VADContainer(InfraContainer):
     @property
     @singleton
-    def vad_service(self) -> VadService:
+    def vad_service(self) -> "VadService":
+        implementation = self.config_manager.get_config("cltl.vad").get("implementation")
+        if implementation and implementation != "webrtc":
+            raise ValueError("Unsupported implementation " + implementation)
+
+        with self.startup_report.phase("Import cltl.vad.webrtc_vad"):
+            from cltl.vad.webrtc_vad import WebRtcVAD
+        from cltl_service.vad.service import VadService
+
         config = self.config_manager.get_config("cltl.vad.webrtc")
         activity_window = config.get_int("activity_window")
         activity_threshold = config.get_float("activity_threshold")
@@ -213,7 +371,8 @@ class VADContainer(InfraContainer):
     def start(self):
         logger.info("Start VAD")
         super().start()
-        self.vad_service.start()
+        with self.startup_report.phase("Start VAD"):
+            self.vad_service.start()
 
     def stop(self):
         logger.info("Stop VAD")
@@ -221,11 +380,68 @@ class VADContainer(InfraContainer):
         super().stop()
 
 
+class SessionContainer(InfraContainer):
+    @property
+    @singleton
+    def session_service(self) -> SessionStateService:
+        config = self.config_manager.get_config("app.session")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return SessionStateService.from_config(SessionStore.from_config(self.config_manager),
+                                               self.event_bus_serializer, self.event_bus, self.resource_manager,
+                                               self.config_manager, self.session_restorers())
+
+    @property
+    @singleton
+    def session_reaper(self) -> SessionReaper:
+        config = self.config_manager.get_config("app.reaper")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return SessionReaper.from_config(self.event_bus, self.resource_manager, self.config_manager,
+                                         self.session_releasers(), self.routed_event_bus)
+
+    def session_restorers(self) -> List[Callable[[SessionState], None]]:
+        return []
+
+    def session_releasers(self) -> List[Callable[[str], None]]:
+        return [self.session_service.release] if self.session_service else []
+
+    def start(self):
+        super().start()
+        if self.session_service:
+            logger.info("Start Session State")
+            self.event_bus.add_observer(self.session_service)
+            self.session_service.start()
+        if self.session_reaper:
+            logger.info("Start Session Reaper")
+            self.session_reaper.start()
+
+    def stop(self):
+        if self.session_reaper:
+            logger.info("Stop Session Reaper")
+            self.session_reaper.stop()
+        if self.session_service:
+            logger.info("Stop Session State")
+            self.session_service.stop()
+        super().stop()
+
+
 class EmissorStorageContainer(InfraContainer):
     @property
     @singleton
     def emissor_storage(self) -> EmissorDataStorage:
-        return EmissorDataFileStorage.from_config(self.config_manager)
+        storage = EmissorDataFileStorage.from_config(self.config_manager)
+
+        config = self.config_manager.get_config("cltl.emissor-data")
+        mode = config.get("mode") if "mode" in config else None
+        if mode == "append":
+            return AppendOnlyEmissorDataStorage.from_config(storage, self.config_manager)
+        elif mode:
+            raise ValueError("Unsupported EMISSOR storage mode: " + mode)
+
+        return storage
 
     @property
     @singleton
@@ -236,23 +452,35 @@ class EmissorStorageContainer(InfraContainer):
     @property
     @singleton
     def emissor_data_client(self) -> EmissorDataClient:
-        return EmissorDataClient("http://0.0.0.0:8000/emissor")
+        return LocalEmissorDataClient.from_config(self.emissor_storage, self.config_manager)
+
+    @property
+    @singleton
+    def emissor_query_service(self) -> EmissorQueryService:
+        return EmissorQueryService.from_config(self.event_bus, self.resource_manager, self.config_manager)
 
     def start(self):
         logger.info("Start Emissor Data Storage")
         super().start()
-        self.emissor_data_service.start()
+        with self.startup_report.phase("Start Emissor Data Storage"):
+            if isinstance(self.emissor_storage, AppendOnlyEmissorDataStorage):
+                self.emissor_storage.start()
+            self.emissor_data_service.start()
+            self.emissor_query_service.start()
 
     def stop(self):
         logger.info("Stop Emissor Data Storage")
+        self.emissor_query_service.stop()
         self.emissor_data_service.stop()
+        if isinstance(self.emissor_storage, AppendOnlyEmissorDataStorage):
+            self.emissor_storage.stop()
         super().stop()
 
 
 class ASRContainer(EmissorStorageContainer, InfraContainer):
     @property
     @singleton
-    def asr_service(self) -> AsrService:
+    def asr(self) -> "ASR":
         config = self.config_manager.get_config("cltl.asr")
         sampling_rate = config.get_int("sampling_rate")
         implementation = config.get("implementation")
@@ -261,42 +489,66 @@ class ASRContainer(EmissorStorageContainer, InfraContainer):
         # DEBUG
         # storage = "/Users/tkb/automatic/workspaces/robo/eliza-parent/cltl-eliza-app/py-app/storage/audio/debug/asr"
 
+        model = None
+        language = None
+
         if implementation == "google":
-            from cltl.asr.google_asr import GoogleASR
+            with self.startup_report.phase("Import cltl.asr.google_asr"):
+                from cltl.asr.google_asr import GoogleASR
             impl_config = self.config_manager.get_config("cltl.asr.google")
-            asr = GoogleASR(impl_config.get("language"), impl_config.get_int("sampling_rate"),
+            language = impl_config.get("language")
+            asr = GoogleASR(language, impl_config.get_int("sampling_rate"),
                             hints=impl_config.get("hints", multi=True))
         elif implementation == "whisper":
-            from cltl.asr.whisper_asr import WhisperASR
+            with self.startup_report.phase("Import cltl.asr.whisper_asr"):
+                from cltl.asr.whisper_asr import WhisperASR
             impl_config = self.config_manager.get_config("cltl.asr.whisper")
-            asr = WhisperASR(impl_config.get("model"), impl_config.get("language"), storage=storage)
+            model = impl_config.get("model")
+            language = impl_config.get("language")
+            asr = WhisperASR(model, language, storage=storage)
         elif implementation == "speechbrain":
-            from cltl.asr.speechbrain_asr import SpeechbrainASR
+            with self.startup_report.phase("Import cltl.asr.speechbrain_asr"):
+                from cltl.asr.speechbrain_asr import SpeechbrainASR
             impl_config = self.config_manager.get_config("cltl.asr.speechbrain")
             model = impl_config.get("model")
             asr = SpeechbrainASR(model, storage=storage)
         elif implementation == "wav2vec":
-            from cltl.asr.wav2vec_asr import Wav2Vec2ASR
+            with self.startup_report.phase("Import cltl.asr.wav2vec_asr"):
+                from cltl.asr.wav2vec_asr import Wav2Vec2ASR
             impl_config = self.config_manager.get_config("cltl.asr.wav2vec")
             model = impl_config.get("model")
             asr = Wav2Vec2ASR(model, sampling_rate=sampling_rate, storage=storage)
         elif not implementation:
-            asr = False
+            return False
         else:
             raise ValueError("Unsupported implementation " + implementation)
 
-        if asr:
-            return AsrService.from_config(asr, self.emissor_data_client,
-                                          self.event_bus, self.resource_manager, self.config_manager)
-        else:
+        cache_config = self.config_manager.get_config("cltl.asr.cache")
+        if "enabled" in cache_config and cache_config.get_boolean("enabled"):
+            asr = CachedASR.from_config(asr, implementation, model, language, self.config_manager)
+            if self.metrics_service:
+                self.metrics_service.collector.register_cache("asr", lambda: asr.stats)
+
+        return asr
+
+    @property
+    @singleton
+    def asr_service(self) -> "AsrService":
+        if not self.asr:
             logger.warning("No ASR implementation configured")
             return False
 
+        from cltl_service.asr.service import AsrService
+
+        return AsrService.from_config(self.asr, self.emissor_data_client,
+                                      self.event_bus, self.resource_manager, self.config_manager)
+
     def start(self):
         super().start()
         if self.asr_service:
             logger.info("Start ASR")
-            self.asr_service.start()
+            with self.startup_report.phase("Start ASR"):
+                self.asr_service.start()
 
     def stop(self):
         if self.asr_service:
@@ -305,7 +557,7 @@ class ASRContainer(EmissorStorageContainer, InfraContainer):
         super().stop()
 
 
-class AppComponentsContainer(InfraContainer):
+class AppComponentsContainer(SessionContainer):
     @property
     @singleton
     def keyword_service(self) -> KeywordService:
@@ -314,7 +566,8 @@ class AppComponentsContainer(InfraContainer):
     @property
     @singleton
     def context_service(self) -> ContextService:
-        return ContextService.from_config(self.event_bus, self.resource_manager, self.config_manager)
+        return ContextService.from_config(self.event_bus, self.resource_manager, self.config_manager,
+                                          self.session_service)
 
     @property
     @singleton
@@ -328,13 +581,17 @@ class AppComponentsContainer(InfraContainer):
     def init_intention(self) -> InitService:
         return InitService.from_config(self.event_bus, self.resource_manager, self.config_manager)
 
+    def session_releasers(self) -> List[Callable[[str], None]]:
+        return super().session_releasers() + [self.context_service.release]
+
     def start(self):
         logger.info("Start App components services")
         super().start()
-        self.bdi_service.start()
-        self.keyword_service.start()
-        self.context_service.start()
-        self.init_intention.start()
+        with self.startup_report.phase("Start App components services"):
+            self.bdi_service.start()
+            self.keyword_service.start()
+            self.context_service.start()
+            self.init_intention.start()
 
     def stop(self):
         logger.info("Stop App components services")
@@ -356,25 +613,54 @@ class ChatUIContainer(InfraContainer):
     def chatui_service(self) -> ChatUiService:
         return ChatUiService.from_config(MemoryChats(), self.event_bus, self.resource_manager, self.config_manager)
 
+    @property
+    @singleton
+    def admission_control(self) -> AdmissionControl:
+        config = self.config_manager.get_config("app.admission")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return AdmissionControl.from_config(self.event_bus, self.config_manager)
+
+    @property
+    @singleton
+    def chatui_app(self):
+        if not self.admission_control:
+            return self.chatui_service.app
+
+        return self.admission_control.wrap(self.chatui_service.app)
+
     def start(self):
         logger.info("Start Chat UI")
         super().start()
-        self.chatui_service.start()
+        with self.startup_report.phase("Start Chat UI"):
+            self.chatui_service.start()
+            if self.admission_control:
+                self.admission_control.start()
 
     def stop(self):
         logger.info("Stop Chat UI")
+        if self.admission_control:
+            self.admission_control.stop()
         self.chatui_service.stop()
         super().stop()
 
 
-class LLMContainer(EmissorStorageContainer, InfraContainer):
+class LLMContainer(EmissorStorageContainer, SessionContainer):
+    @property
+    def llm_url(self) -> str:
+        return self.config_manager.get_config("cltl.llm").get("url")
+
     @property
     @singleton
-    def llm(self) -> LLM:
+    def llm(self) -> "LLM":
+        with self.startup_report.phase("Import cltl.llm.llm"):
+            from cltl.llm.llm import LLMImpl
+
         config = self.config_manager.get_config("cltl.llm")
 
         model = config.get("model") if "model" in config else None
-        url = config.get("url")
+        url = self.llm_url
         instruction ={"role": "system", "content": config.get("instruction")}
         temperature = config.get("temperature")
         max_history = config.get("max_history")
@@ -389,18 +675,39 @@ class LLMContainer(EmissorStorageContainer, InfraContainer):
 
     @property
     @singleton
-    def llm_service(self) -> LLMService:
+    def llm_service(self) -> "LLMService":
+        from cltl_service.llm.service import LLMService
+
         return LLMService.from_config(self.llm, self.emissor_data_client,
                                         self.event_bus, self.resource_manager, self.config_manager, self.emissor_storage)
 
+    @property
+    @singleton
+    def deadline_service(self) -> DeadlineService:
+        return DeadlineService.from_config(self.event_bus, self.resource_manager, self.config_manager,
+                                           self.config_manager.get_config("cltl.llm").get("model"),
+                                           self.routed_event_bus)
+
+    def session_restorers(self) -> List[Callable[[SessionState], None]]:
+        return super().session_restorers() + [restore_llm_history(self.llm)]
+
+    def readiness_checks(self) -> Dict[str, Callable[[], bool]]:
+        checks = super().readiness_checks()
+        checks["llm"] = lambda: url_reachable(self.llm_url)
+
+        return checks
+
     def start(self):
         logger.info("Start LLM")
         super().start()
-        self.llm_service.start()
+        with self.startup_report.phase("Start LLM"):
+            self.deadline_service.start()
+            self.llm_service.start()
 
     def stop(self):
         logger.info("Stop LLM")
         self.llm_service.stop()
+        self.deadline_service.stop()
         super().stop()
 
 
@@ -413,8 +720,13 @@ class ApplicationContainer(LLMContainer, AppComponentsContainer,
     def log_writer(self):
         config = self.config_manager.get_config("cltl.event_log")
 
-        # Serialize in a plain JSON format
-        return LogWriter(config.get("log_dir"), emissor_serializer)
+        if "writer" in config and config.get("writer") == "buffered":
+            writer = BufferedLogWriter.from_config(emissor_serializer, self.config_manager)
+        else:
+            # Serialize in a plain JSON format
+            writer = LogWriter(config.get("log_dir"), emissor_serializer)
+
+        return PolicyLogWriter(writer, EventLogPolicy.from_config(emissor_serializer, self.config_manager))
 
     @property
     @singleton
@@ -422,14 +734,33 @@ class ApplicationContainer(LLMContainer, AppComponentsContainer,
         return EventLogService.from_config(self.log_writer, self.event_bus, self.config_manager)
 
     def start(self):
+        config = self.config_manager.get_config("app.startup")
+        parallel = config.get_boolean("parallel_loading") if "parallel_loading" in config else True
+        loaders = {"Load ASR": lambda: self.asr, "Load LLM": lambda: self.llm}
+        if self.phrase_cache:
+            loaders["Render phrases"] = self.phrase_cache.prerender
+        self.startup_report.load(loaders, parallel, dependencies=[lambda: self.config_manager])
+
         logger.info("Start EventLog")
         super().start()
-        self.event_log_service.start()
+        with self.startup_report.phase("Start EventLog"):
+            if self.event_log_service:
+                if isinstance(self.log_writer.writer, BufferedLogWriter):
+                    self.log_writer.writer.start()
+                self.event_log_service.start()
+
+        self.startup_report.ready()
+        self.health_service.set_started()
+        logger.info("Startup report:\n%s", self.startup_report.format())
 
     def stop(self):
+        self.health_service.set_started(False)
         try:
             logger.info("Stop EventLog")
-            self.event_log_service.stop()
+            if self.event_log_service:
+                self.event_log_service.stop()
+                if isinstance(self.log_writer.writer, BufferedLogWriter):
+                    self.log_writer.writer.stop()
         finally:
             try:
                 logger.info("Stop EventBus")
@@ -446,29 +777,46 @@ def main():
 
     with application as started_app:
         logger.info("Starting the application")
-        time.sleep(1)
 
-        intention_topic = started_app.config_manager.get_config("cltl.bdi").get("topic_intention")
-        init_event = Event.for_payload(IntentionEvent([Intention("init", None)]))
-        started_app.event_bus.publish(intention_topic, init_event)
+        def init():
+            intention_topic = started_app.config_manager.get_config("cltl.bdi").get("topic_intention")
+            init_event = Event.for_payload(IntentionEvent([Intention("init", None)]))
+            started_app.event_bus.publish(intention_topic, init_event)
+
+            logger.info("Started 'init' intention")
 
-        logger.info("Started 'init' intention")
+        # Publish the init intention once ready, /health serves readiness while waiting
+        started_app.health_service.when_ready(init)
 
         routes = {
             '/storage': started_app.storage_service.app,
             '/emissor': started_app.emissor_data_service.app,
-            '/chatui': started_app.chatui_service.app,
+            '/emissor/query': started_app.emissor_query_service.app,
+            '/chatui': started_app.chatui_app,
+            '/deadline': started_app.deadline_service.app,
+            '/health': started_app.health_service.app,
         }
+        if started_app.admin_service:
+            routes['/admin'] = started_app.admin_service.app
+        if started_app.admission_control:
+            routes['/admission'] = started_app.admission_control.app
+        if started_app.metrics_service:
+            routes['/metrics'] = started_app.metrics_service.app
+        if started_app.session_reaper:
+            routes['/sessions'] = started_app.session_reaper.app
         if started_app.server:
             routes['/host'] = started_app.server.app
+        if started_app.tracing_service:
+            routes['/tracing'] = started_app.tracing_service.app
 
         web_app = DispatcherMiddleware(Flask("LLM app"), routes)
 
-        run_simple('0.0.0.0', 8000, web_app, threaded=True, use_reloader=False, use_debugger=False, use_evalex=True)
+        port = started_app.config_manager.get_config("app.server").get_int("port")
+        run_simple('0.0.0.0', port, web_app, threaded=True, use_reloader=False, use_debugger=False, use_evalex=True)
 
         intention_topic = started_app.config_manager.get_config("cltl.bdi").get("topic_intention")
         started_app.event_bus.publish(intention_topic, Event.for_payload(IntentionEvent([Intention("terminate", None)])))
-        time.sleep(1)
+        started_app.health_service.wait_idle()
 
 
 if __name__ == '__main__':
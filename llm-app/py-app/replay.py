@@ -0,0 +1,97 @@
+import argparse
+import json
+import logging
+
+from cltl.combot.infra.di_container import singleton
+from cltl.combot.infra.event.memory import SynchronousEventBus
+
+from app import ApplicationContainer
+from app_service.event_bus.observed import ObservedEventBus
+from app_service.replay.benchmark import ReplayBenchmark, format_report
+from app_service.replay.log_reader import read_event_log
+from app_service.replay.stand_in import StandInLLMServer
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayContainer(ApplicationContainer):
+    """Application with an in-memory event bus and a local stand-in for the LLM backend.
+
+    Sessions are neither resumed nor reaped and the replayed events are not logged again.
+    """
+    @property
+    @singleton
+    def event_bus(self):
+        return ObservedEventBus(SynchronousEventBus(), self.process_observers())
+
+    @property
+    def session_service(self):
+        return None
+
+    @property
+    def session_reaper(self):
+        return None
+
+    @property
+    def event_log_service(self):
+        return None
+
+    @property
+    @singleton
+    def stand_in_llm(self) -> StandInLLMServer:
+        config = self.config_manager.get_config("app.replay")
+
+        return StandInLLMServer(config.get_int("stand_in_port"), config.get("stand_in_reply"),
+                                config.get_float("stand_in_delay"))
+
+    @property
+    def llm_url(self) -> str:
+        return self.stand_in_llm.url
+
+    def start(self):
+        self.stand_in_llm.start()
+        super().start()
+
+    def stop(self):
+        try:
+            super().stop()
+        finally:
+            self.stand_in_llm.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay an event log into the application and report its performance")
+    parser.add_argument("log", help="Event log file or directory, e.g. storage/event_log")
+    parser.add_argument("--speed", default="recorded",
+                        help="'recorded', 'max' or a speed-up factor relative to the recorded pace")
+    parser.add_argument("--drain-timeout", type=float, default=60.0,
+                        help="Seconds to wait for outstanding turns after the last event")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    speed = {"recorded": 1.0, "max": 0.0}.get(args.speed)
+    speed = float(args.speed) if speed is None else speed
+
+    ReplayContainer.load_configuration()
+    application = ReplayContainer()
+    config = application.config_manager.get_config("app.replay")
+
+    events = read_event_log(args.log, config.get("topics", multi=True))
+    if not events:
+        raise ValueError("No events to replay in " + args.log)
+
+    with application as started_app:
+        benchmark = ReplayBenchmark(started_app.event_bus, events, speed,
+                                    config.get("input_topic"), config.get("output_topic"),
+                                    config.get("observe_topics", multi=True))
+        benchmark.run(args.drain_timeout)
+
+    report = benchmark.report()
+    print(format_report(report))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from typing import List, Optional
+
+from cltl.combot.infra.topic_worker import TopicWorker
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """Samples the stacks of running threads at a fixed interval.
+
+    By default only TopicWorker threads are sampled. The samples are aggregated
+    as collapsed stacks (``thread;frame;...;frame count``), the input format of
+    flamegraph.pl and speedscope. Sampling runs in a separate daemon thread and
+    stops after *duration* seconds or on :meth:`stop`.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stacks = Counter()
+        self._samples = 0
+        self._thread = None
+        self._running = threading.Event()
+        self._started = None
+        self._stopped = None
+
+    @property
+    def running(self) -> bool:
+        return self._running.is_set()
+
+    def start(self, interval: float = 0.01, duration: Optional[float] = 60.0, all_threads: bool = False):
+        if self.running:
+            raise ValueError("Profiler is already running")
+
+        with self._lock:
+            self._stacks = Counter()
+            self._samples = 0
+            self._started, self._stopped = time.time(), None
+
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, args=(interval, duration, all_threads),
+                                        name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+        logger.info("Started sampling profiler (interval %ss, duration %ss)", interval, duration)
+
+    def stop(self):
+        self._running.clear()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def status(self) -> dict:
+        with self._lock:
+            return {"running": self.running, "samples": self._samples, "stacks": len(self._stacks),
+                    "started": self._started, "stopped": self._stopped}
+
+    def collapsed(self) -> str:
+        with self._lock:
+            return "\n".join(f"{stack} {count}" for stack, count in self._stacks.most_common()) + "\n"
+
+    def _run(self, interval: float, duration: Optional[float], all_threads: bool):
+        end = time.monotonic() + duration if duration else None
+        own = threading.get_ident()
+        try:
+            while self._running.is_set() and (end is None or time.monotonic() < end):
+                threads = {thread.ident: thread for thread in threading.enumerate()
+                           if all_threads or isinstance(thread, TopicWorker)}
+                stacks = [self._stack(threads[ident].name, frame)
+                          for ident, frame in sys._current_frames().items()
+                          if ident in threads and ident != own]
+                with self._lock:
+                    self._stacks.update(stacks)
+                    self._samples += 1
+                time.sleep(interval)
+        finally:
+            with self._lock:
+                self._stopped = time.time()
+            self._running.clear()
+            logger.info("Stopped sampling profiler after %s samples", self._samples)
+
+    @staticmethod
+    def _stack(thread_name: str, frame) -> str:
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        frames.append(thread_name)
+
+        return ";".join(name.replace(";", ":") for name in reversed(frames))
+
+
+class AllocationTracker:
+    """Takes and compares :mod:`tracemalloc` snapshots.
+
+    Tracing allocations slows down the application, it is only active between
+    :meth:`start` and :meth:`stop`. The most recent *max_snapshots* snapshots are kept.
+    """
+    def __init__(self, max_snapshots: int = 10):
+        self._max_snapshots = max_snapshots
+        self._lock = threading.Lock()
+        self._snapshots = OrderedDict()
+        self._next_id = 1
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            logger.info("Started tracing allocations with %s frames", frames)
+
+    def stop(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("Stopped tracing allocations")
+        with self._lock:
+            self._snapshots.clear()
+
+    def status(self) -> dict:
+        current, peak = tracemalloc.get_traced_memory() if self.tracing else (0, 0)
+        with self._lock:
+            snapshots = list(self._snapshots.keys())
+
+        return {"tracing": self.tracing, "current": current, "peak": peak, "snapshots": snapshots}
+
+    def snapshot(self) -> int:
+        if not self.tracing:
+            raise ValueError("Allocations are not traced")
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+        with self._lock:
+            snapshot_id = self._next_id
+            self._next_id += 1
+            self._snapshots[snapshot_id] = snapshot
+            while len(self._snapshots) > self._max_snapshots:
+                self._snapshots.popitem(last=False)
+
+        return snapshot_id
+
+    def top(self, snapshot_id: int, key_type: str = "lineno", limit: int = 20) -> List[dict]:
+        stats = self._get(snapshot_id).statistics(key_type)
+
+        return [{"location": self._location(stat.traceback), "size": stat.size, "count": stat.count}
+                for stat in stats[:limit]]
+
+    def diff(self, from_id: int, to_id: int, key_type: str = "lineno", limit: int = 20) -> List[dict]:
+        stats = self._get(to_id).compare_to(self._get(from_id), key_type)
+
+        return [{"location": self._location(stat.traceback), "size": stat.size, "size_diff": stat.size_diff,
+                 "count": stat.count, "count_diff": stat.count_diff}
+                for stat in stats[:limit]]
+
+    def _get(self, snapshot_id: int) -> tracemalloc.Snapshot:
+        with self._lock:
+            if snapshot_id not in self._snapshots:
+                raise KeyError(f"No snapshot {snapshot_id}")
+
+            return self._snapshots[snapshot_id]
+
+    @staticmethod
+    def _location(traceback: tracemalloc.Traceback) -> List[str]:
+        return [f"{frame.filename}:{frame.lineno}" for frame in traceback]
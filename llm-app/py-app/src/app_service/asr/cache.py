@@ -0,0 +1,148 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from cltl.asr.api import ASR
+from cltl.combot.infra.config import ConfigurationManager
+
+logger = logging.getLogger(__name__)
+
+
+class CachedASR(ASR):
+    """Content addressed transcript cache in front of an :class:`ASR` implementation.
+
+    Transcripts are stored on disk keyed on a hash of the PCM payload and the
+    ASR implementation, model and language. The cache is bounded in size, the
+    least recently used entries are evicted first, also after a restart, as
+    the modification time of an entry is updated when it is used.
+    """
+    @classmethod
+    def from_config(cls, asr: ASR, implementation: str, model: Optional[str], language: Optional[str],
+                    config_manager: ConfigurationManager):
+        config = config_manager.get_config("cltl.asr.cache")
+        path = config.get("path")
+        max_size = config.get_int("max_size_mb") * 1024 * 1024
+
+        return cls(asr, path, max_size, implementation, model, language)
+
+    def __init__(self, asr: ASR, path: str, max_size: int, implementation: str,
+                 model: Optional[str] = None, language: Optional[str] = None):
+        self._asr = asr
+        self._path = path
+        self._max_size = max_size
+        self._context = f"{implementation}|{model or ''}|{language or ''}".encode("utf-8")
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+
+        self._load_index()
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses,
+                    "entries": len(self._entries), "size": self._size}
+
+    def speech_to_text(self, audio: np.array, sampling_rate: int, *args, **kwargs) -> str:
+        key = self._key(audio, sampling_rate)
+
+        transcript = self._read(key)
+        if transcript is not None:
+            with self._lock:
+                self._hits += 1
+            logger.debug("ASR cache hit for %s (%s)", key, self.stats)
+            return transcript
+
+        with self._lock:
+            self._misses += 1
+
+        transcript = self._asr.speech_to_text(audio, sampling_rate, *args, **kwargs)
+        self._write(key, transcript)
+
+        return transcript
+
+    def _key(self, audio: np.array, sampling_rate: int) -> str:
+        audio = np.ascontiguousarray(audio)
+        digest = hashlib.sha256(self._context)
+        digest.update(f"|{sampling_rate}|{audio.dtype.str}|{audio.shape}|".encode("utf-8"))
+        digest.update(audio.data)
+
+        return digest.hexdigest()
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self._path, key[:2], key + ".json")
+
+    def _read(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+
+        try:
+            with open(self._file(key)) as cache_file:
+                transcript = json.load(cache_file)["transcript"]
+        except (OSError, ValueError, KeyError):
+            logger.warning("Invalid ASR cache entry %s", key)
+            self._remove(key)
+            return None
+
+        try:
+            os.utime(self._file(key))
+        except OSError:
+            logger.debug("Failed to update the modification time of ASR cache entry %s", key)
+
+        return transcript
+
+    def _write(self, key: str, transcript: str):
+        file = self._file(key)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        with open(file, 'w') as cache_file:
+            json.dump({"transcript": transcript}, cache_file)
+
+        with self._lock:
+            self._size += os.path.getsize(file) - self._entries.get(key, 0)
+            self._entries[key] = os.path.getsize(file)
+            evicted = []
+            while self._size > self._max_size and len(self._entries) > 1:
+                evicted_key, size = self._entries.popitem(last=False)
+                self._size -= size
+                evicted.append(evicted_key)
+
+        for evicted_key in evicted:
+            self._unlink(evicted_key)
+
+    def _remove(self, key: str):
+        with self._lock:
+            self._size -= self._entries.pop(key, 0)
+        self._unlink(key)
+
+    def _unlink(self, key: str):
+        try:
+            os.remove(self._file(key))
+        except FileNotFoundError:
+            pass
+
+    def _load_index(self):
+        if not os.path.isdir(self._path):
+            return
+
+        entries = []
+        for directory, _, files in os.walk(self._path):
+            for file in files:
+                if file.endswith(".json"):
+                    stat = os.stat(os.path.join(directory, file))
+                    entries.append((stat.st_mtime, file[:-len(".json")], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._size += size
+
+        logger.info("Loaded ASR cache with %s entries (%s bytes) from %s", len(self._entries), self._size, self._path)
@@ -0,0 +1,222 @@
+import logging
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Iterable, Optional
+
+import numpy as np
+from cltl.backend.spi.audio import AudioSource
+from cltl.combot.infra.config import ConfigurationManager
+
+logger = logging.getLogger(__name__)
+
+
+# Header: write sequence (number of frames written so far), capacity, frame size, channels
+_HEADER = struct.Struct("<QQQQ")
+# Marks a slot while its frame is written
+_WRITING = np.iinfo(np.uint64).max
+
+
+class SharedAudioRing:
+    """Ring buffer of fixed size int16 audio frames in shared memory.
+
+    Frames are written once by the producer and can be read by consumers in
+    the same process or, attached to the ring by its name, on the same host,
+    without encoding them. Consumers follow the :attr:`head` of the ring and
+    get a copy of each frame, such that they can keep it after it is
+    overwritten in the ring.
+
+    Each slot holds the sequence number of its frame, which the producer
+    replaces by a marker while it writes the slot. A consumer only accepts a
+    copy if the slot held the requested sequence number before and after
+    copying it, such that it never sees a partially overwritten frame.
+    """
+    def __init__(self, name: str, capacity: int = 0, frame_size: int = 0, channels: int = 1, create: bool = False):
+        self._frame_bytes = frame_size * channels * 2
+        if create:
+            size = _HEADER.size + capacity * (8 + self._frame_bytes)
+            try:
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            except FileExistsError:
+                logger.warning("Replace stale shared audio ring %s", name)
+                stale = shared_memory.SharedMemory(name=name)
+                stale.close()
+                stale.unlink()
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            _HEADER.pack_into(self._shm.buf, 0, 0, capacity, frame_size, channels)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            _, capacity, frame_size, channels = _HEADER.unpack_from(self._shm.buf, 0)
+            self._frame_bytes = frame_size * channels * 2
+
+        self._name = name
+        self._owner = create
+        self._capacity = capacity
+        self._frame_size = frame_size
+        self._channels = channels
+        self._slots = np.ndarray((capacity,), dtype=np.uint64, buffer=self._shm.buf, offset=_HEADER.size)
+        self._frames = np.ndarray((capacity, frame_size, channels), dtype=np.int16,
+                                  buffer=self._shm.buf, offset=_HEADER.size + capacity * 8)
+        if create:
+            self._slots[:] = _WRITING
+        self._written = threading.Condition()
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def frame_size(self) -> int:
+        return self._frame_size
+
+    @property
+    def channels(self) -> int:
+        return self._channels
+
+    @property
+    def head(self) -> int:
+        """Sequence number of the next frame to be written."""
+        return _HEADER.unpack_from(self._shm.buf, 0)[0]
+
+    def write(self, frame: np.ndarray) -> int:
+        seq = self.head
+        slot = seq % self._capacity
+        self._slots[slot] = _WRITING
+        self._frames[slot] = frame.reshape(self._frame_size, self._channels)
+        self._slots[slot] = seq
+        struct.pack_into("<Q", self._shm.buf, 0, seq + 1)
+        with self._written:
+            self._written.notify_all()
+
+        return seq
+
+    def read(self, seq: int) -> np.ndarray:
+        """Return a copy of the frame with sequence number *seq*.
+
+        Raises an IndexError if the frame is not written yet or was overwritten,
+        also while it was copied.
+        """
+        head = self.head
+        slot = seq % self._capacity
+        if seq >= head or self._slots[slot] != seq:
+            raise IndexError(f"Frame {seq} not available in ring {self._name} (head {head})")
+
+        frame = self._frames[slot].copy()
+        # The producer may have lapped the reader while copying
+        if self._slots[slot] != seq:
+            raise IndexError(f"Frame {seq} was overwritten in ring {self._name} while reading")
+
+        return frame
+
+    def frames(self, start: int, end: Optional[int] = None, timeout: float = 1.0) -> Iterable[np.ndarray]:
+        """Iterate the frames from *start* on, waiting for new frames until *end* or *timeout*."""
+        seq = start
+        while end is None or seq < end:
+            if seq >= self.head and not self._await(seq, timeout):
+                return
+            # The oldest frame in the ring is the next one to be overwritten
+            if seq <= self.head - self._capacity:
+                seq = self.head - self._capacity + 1
+                logger.warning("Consumer of ring %s lagged behind, skipped to %s", self._name, seq)
+            try:
+                frame = self.read(seq)
+            except IndexError:
+                continue
+            yield frame
+            seq += 1
+
+    def _await(self, seq: int, timeout: float) -> bool:
+        # Readers in other processes don't share the condition, fall back to polling
+        deadline = time.time() + timeout
+        with self._written:
+            while seq >= self.head:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._written.wait(min(remaining, 0.01))
+
+        return True
+
+    def close(self):
+        self._slots = None
+        self._frames = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+class SharedMemoryAudioSource(AudioSource):
+    """Decorates an :class:`AudioSource` (typically the backend's ClientAudioSource)
+    to write each frame once into a :class:`SharedAudioRing`.
+
+    The frames of the source are passed on unchanged, the ring is read by
+    consumers on the same host.
+    """
+    @classmethod
+    def from_config(cls, source: AudioSource, config_manager: ConfigurationManager):
+        config = config_manager.get_config("cltl.backend")
+        name = config.get("shm_name")
+        capacity = config.get_int("shm_frames")
+
+        return cls(source, name, capacity)
+
+    def __init__(self, source: AudioSource, name: str, capacity: int):
+        self._source = source
+        self._ring = SharedAudioRing(name, capacity, source.frame_size, source.channels, create=True)
+        self._stream_start = None
+
+    @property
+    def ring(self) -> SharedAudioRing:
+        return self._ring
+
+    @property
+    def stream_start(self) -> Optional[int]:
+        """Sequence number of the first frame of the currently active stream."""
+        return self._stream_start
+
+    @property
+    def rate(self):
+        return self._source.rate
+
+    @property
+    def channels(self):
+        return self._source.channels
+
+    @property
+    def frame_size(self):
+        return self._source.frame_size
+
+    @property
+    def depth(self):
+        return self._source.depth
+
+    @property
+    def audio(self) -> Iterable[np.ndarray]:
+        self._stream_start = self._ring.head
+        for frame in self._source.audio:
+            if frame is None:
+                yield None
+                continue
+            self._ring.write(frame)
+            yield frame
+
+    def start(self):
+        self._source.start()
+
+    def stop(self):
+        self._source.stop()
+
+    def __enter__(self):
+        self._source.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._source.__exit__(exc_type, exc_val, exc_tb)
+
+    def close(self):
+        self._ring.close()
@@ -0,0 +1,269 @@
+import io
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from cltl.combot.infra.config import ConfigurationManager
+from cltl.combot.infra.event import Event, EventBus
+from flask import Flask, jsonify
+
+logger = logging.getLogger(__name__)
+
+
+_CHAT_PATH = re.compile(r"^/chat/(?P<chat_id>[^/]+)/?$")
+
+
+class TokenBucket:
+    """Allows *rate* turns per second on average and bursts of up to *burst* turns."""
+    def __init__(self, rate: float, burst: float):
+        self._rate = rate
+        self._burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+
+    def take(self) -> bool:
+        self._refill()
+        if self._tokens < 1:
+            return False
+
+        self._tokens -= 1
+
+        return True
+
+    def retry_after(self) -> float:
+        self._refill()
+
+        return max(0.0, (1 - self._tokens) / self._rate) if self._rate > 0 else float("inf")
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+
+@dataclass
+class _Session:
+    in_flight: Optional[float] = None
+    pending: List[str] = field(default_factory=list)
+    environ: Optional[dict] = None
+
+
+class AdmissionControl:
+    """Admission control for the chat turns posted to the chat UI.
+
+    Each tenant may post *rate* turns per second with bursts of *burst* turns,
+    the tenant is the configured *tenant*, else the authenticated user or the
+    address of the client. The rate limits of the *max_tenants* most recent
+    tenants are kept. At most *max_in_flight* turns are forwarded to the chat UI without a
+    response on the response topic. Turns posted to a chat while one of its
+    turns is in flight are held and forwarded as a single turn when the
+    response arrives. Turns that are not admitted are rejected with a *busy*
+    response, status 429 if the tenant exceeds its rate and 503 otherwise.
+
+    Responses are matched to the in-flight turn of their chat by the scenario
+    of the response signal, the chat of the chat UI. Responses without a
+    scenario complete the in-flight turn only if there is a single one,
+    turns without a response within *turn_timeout* seconds are considered
+    complete.
+    """
+    @classmethod
+    def from_config(cls, event_bus: EventBus, config_manager: ConfigurationManager):
+        config = config_manager.get_config("app.admission")
+        response_topic = config_manager.get_config("cltl.chat-ui.events").get("topic_response")
+        tenant = config.get("tenant") if "tenant" in config else None
+
+        return cls(event_bus, response_topic, config.get_float("rate"), config.get_float("burst"),
+                   config.get_int("max_in_flight"), config.get_int("max_pending"),
+                   config.get_float("turn_timeout"), tenant)
+
+    def __init__(self, event_bus: EventBus, response_topic: str, rate: float = 1.0, burst: float = 5.0,
+                 max_in_flight: int = 8, max_pending: int = 5, turn_timeout: float = 60.0,
+                 tenant: Optional[str] = None, max_sessions: int = 10000, max_tenants: int = 10000):
+        self._event_bus = event_bus
+        self._response_topic = response_topic
+        self._rate = rate
+        self._burst = burst
+        self._max_in_flight = max_in_flight
+        self._max_pending = max_pending
+        self._turn_timeout = turn_timeout
+        self._tenant = tenant or None
+        self._max_sessions = max_sessions
+        self._max_tenants = max_tenants
+
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, TokenBucket] = OrderedDict()
+        self._sessions: Dict[str, _Session] = OrderedDict()
+        self._in_flight = deque()
+        self._counts = Counter()
+        self._executor = None
+        self._chatui_app = None
+        self._app = None
+
+    def start(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.__class__.__name__)
+        self._event_bus.subscribe(self._response_topic, self._on_response)
+
+    def stop(self):
+        self._event_bus.unsubscribe(self._response_topic, self._on_response)
+        self._executor.shutdown(wait=False)
+
+    def wrap(self, app):
+        """Wrap the WSGI *app* of the chat UI with admission control."""
+        self._chatui_app = app
+
+        def admission_app(environ, start_response):
+            match = _CHAT_PATH.match(environ.get("PATH_INFO", ""))
+            if environ.get("REQUEST_METHOD") != "POST" or not match:
+                return app(environ, start_response)
+
+            return self._admit(app, match.group("chat_id"), environ, start_response)
+
+        return admission_app
+
+    def status(self) -> dict:
+        with self._lock:
+            return {"in_flight": len(self._in_flight), "max_in_flight": self._max_in_flight,
+                    "pending": sum(len(session.pending) for session in self._sessions.values()),
+                    "tenants": len(self._buckets), **self._counts}
+
+    @property
+    def app(self):
+        if self._app:
+            return self._app
+
+        self._app = Flask(__name__)
+
+        @self._app.route('/', methods=['GET'])
+        def status():
+            return jsonify(self.status())
+
+        return self._app
+
+    def _admit(self, app, chat_id: str, environ, start_response):
+        # Not a client header, clients could pick a fresh tenant for every request
+        tenant = self._tenant or environ.get("REMOTE_USER") or environ.get("REMOTE_ADDR") or "default"
+        with self._lock:
+            self._expire()
+
+            bucket = self._bucket(tenant)
+            if not bucket.take():
+                self._counts["rejected_rate"] += 1
+                return _busy(start_response, "429 Too Many Requests", bucket.retry_after())
+
+            session = self._session(chat_id)
+            if session.in_flight is not None:
+                if len(session.pending) >= self._max_pending:
+                    self._counts["rejected_pending"] += 1
+                    return _busy(start_response, "429 Too Many Requests", self._turn_timeout)
+
+                session.pending.append(_read_body(environ))
+                session.environ = {key: value for key, value in environ.items() if not key.startswith("werkzeug.")}
+                self._counts["coalesced"] += 1
+                return _respond(start_response, "202 Accepted", {"status": "queued"})
+
+            if len(self._in_flight) >= self._max_in_flight:
+                self._counts["rejected_capacity"] += 1
+                return _busy(start_response, "503 Service Unavailable", 1.0)
+
+            self._forwarded(chat_id, session)
+
+        return app(environ, start_response)
+
+    def _on_response(self, event: Event):
+        chat_id = _scenario_id(event)
+        with self._lock:
+            turn = next((turn for turn in self._in_flight if turn[1] == chat_id), None)
+            if turn is None and chat_id is None and len(self._in_flight) == 1:
+                turn = self._in_flight[0]
+            if turn is None:
+                self._counts["unmatched"] += 1
+                return
+
+            self._in_flight.remove(turn)
+            self._complete(turn[1])
+
+    def _expire(self):
+        deadline = time.monotonic() - self._turn_timeout
+        while self._in_flight and self._in_flight[0][0] < deadline:
+            _, chat_id = self._in_flight.popleft()
+            self._counts["expired"] += 1
+            self._complete(chat_id)
+
+    def _complete(self, chat_id: str):
+        session = self._sessions.get(chat_id)
+        if session is None:
+            return
+
+        session.in_flight = None
+        if not session.pending:
+            return
+
+        utterance = " ".join(session.pending)
+        environ = session.environ
+        session.pending, session.environ = [], None
+        self._forwarded(chat_id, session)
+        self._executor.submit(self._forward, chat_id, utterance, environ)
+
+    def _forwarded(self, chat_id: str, session: _Session):
+        session.in_flight = time.monotonic()
+        self._in_flight.append((session.in_flight, chat_id))
+        self._counts["admitted"] += 1
+
+    def _forward(self, chat_id: str, utterance: str, environ: dict):
+        body = utterance.encode("utf-8")
+        environ = dict(environ, **{"wsgi.input": io.BytesIO(body), "CONTENT_LENGTH": str(len(body))})
+        try:
+            response = self._chatui_app(environ, lambda status, headers, exc_info=None: None)
+            for _ in response:
+                pass
+            if hasattr(response, "close"):
+                response.close()
+            logger.debug("Forwarded coalesced turn of chat %s", chat_id)
+        except Exception:
+            logger.exception("Failed to forward coalesced turn of chat %s", chat_id)
+
+    def _bucket(self, tenant: str) -> TokenBucket:
+        bucket = self._buckets.setdefault(tenant, TokenBucket(self._rate, self._burst))
+        self._buckets.move_to_end(tenant)
+        while len(self._buckets) > self._max_tenants:
+            self._buckets.popitem(last=False)
+
+        return bucket
+
+    def _session(self, chat_id: str) -> _Session:
+        session = self._sessions.setdefault(chat_id, _Session())
+        self._sessions.move_to_end(chat_id)
+        while len(self._sessions) > self._max_sessions:
+            self._sessions.popitem(last=False)
+
+        return session
+
+
+def _scenario_id(event: Event) -> Optional[str]:
+    signal = getattr(event.payload, "signal", None)
+
+    return getattr(getattr(signal, "time", None), "container_id", None)
+
+
+def _read_body(environ) -> str:
+    length = int(environ.get("CONTENT_LENGTH") or 0)
+
+    return environ["wsgi.input"].read(length).decode("utf-8") if length else ""
+
+
+def _respond(start_response, status: str, payload: dict, headers=()):
+    body = json.dumps(payload).encode("utf-8")
+    start_response(status, [("Content-Type", "application/json"), ("Content-Length", str(len(body)))] + list(headers))
+
+    return [body]
+
+
+def _busy(start_response, status: str, retry_after: float):
+    return _respond(start_response, status, {"status": "busy", "retry_after": round(retry_after, 1)},
+                    [("Retry-After", str(max(1, int(retry_after + 0.5))))])
@@ -1,6 +1,7 @@
 import logging
 import uuid
 from datetime import datetime
+from typing import Optional
 
 import requests
 from cltl.combot.event.emissor import LeolaniContext, Agent, ScenarioStarted, ScenarioStopped, ScenarioEvent
@@ -11,6 +12,8 @@ from cltl.combot.infra.time_util import timestamp_now
 from cltl.combot.infra.topic_worker import TopicWorker
 from emissor.representation.scenario import Modality, Scenario
 
+from app_service.session.service import SessionStateService
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,19 +23,22 @@ SPEAKER = Agent("Human", "http://cltl.nl/leolani/world/human_speaker")
 
 class ContextService:
     @classmethod
-    def from_config(cls, event_bus: EventBus, resource_manager: ResourceManager, config_manager: ConfigurationManager):
+    def from_config(cls, event_bus: EventBus, resource_manager: ResourceManager, config_manager: ConfigurationManager,
+                    session_service: Optional[SessionStateService] = None):
         config = config_manager.get_config("app.context")
         scenario_topic = config.get("topic_scenario")
         intention_topic = config.get("topic_intention")
         desire_topic = config.get("topic_desire")
 
         return cls(scenario_topic, intention_topic, desire_topic,
-                   event_bus, resource_manager)
+                   event_bus, resource_manager, session_service)
 
     def __init__(self, scenario_topic: str, intention_topic: str, desire_topic: str,
-                 event_bus: EventBus, resource_manager: ResourceManager):
+                 event_bus: EventBus, resource_manager: ResourceManager,
+                 session_service: Optional[SessionStateService] = None):
         self._event_bus = event_bus
         self._resource_manager = resource_manager
+        self._session_service = session_service
 
         self._scenario_topic = scenario_topic
         self._intention_topic = intention_topic
@@ -77,8 +83,15 @@ class ContextService:
         else:
             logger.warning("Unhandled event: %s", event)
 
+    def release(self, scenario_id: str):
+        """Forget the scenario if it was stopped by someone else, e.g. after it was idle."""
+        if self._scenario and self._scenario.id == scenario_id:
+            self._scenario = None
+
     def _start_scenario(self):
-        scenario, capsule = self._create_scenario()
+        scenario = self._session_service.resume() if self._session_service else None
+        if scenario is None:
+            scenario, capsule = self._create_scenario()
         self._event_bus.publish(self._scenario_topic, Event.for_payload(ScenarioStarted.create(scenario)))
         self._scenario = scenario
         logger.info("Started scenario %s", scenario)
@@ -95,10 +108,14 @@ class ContextService:
         logger.info("Updated scenario %s", self._scenario)
 
     def _stop_scenario(self):
+        if not self._scenario:
+            return
+
         self._scenario.ruler.end = timestamp_now()
         self._event_bus.publish(self._scenario_topic,
                                 Event.for_payload(ScenarioStopped.create(self._scenario)))
         logger.info("Stopped scenario %s", self._scenario)
+        self._scenario = None
 
     def _create_scenario(self):
         signals = {
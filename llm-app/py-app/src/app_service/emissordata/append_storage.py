@@ -0,0 +1,217 @@
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import defaultdict
+from typing import List, Optional
+
+from cltl.combot.infra.config import ConfigurationManager
+from cltl.emissordata.api import EmissorDataStorage
+from emissor.representation.scenario import Mention, Modality, Scenario, Signal
+from emissor.representation.util import marshal
+
+logger = logging.getLogger(__name__)
+
+
+_SEGMENTS_DIR = "segments"
+
+
+class AppendOnlyEmissorDataStorage(EmissorDataStorage):
+    """Decorates an :class:`EmissorDataStorage` (typically the EmissorDataFileStorage)
+    with an append-only write path for signals and mentions.
+
+    Updates are buffered in memory and appended by a background flusher to one
+    JSONL segment file per modality in the scenario folder, such that the cost of
+    a write does not grow with the length of the scenario. When the scenario is
+    stopped the segments are compacted into the standard EMISSOR layout, as are
+    the segments left by a crash when the storage is started.
+    Scenario lifecycle and all other requests are handled by the wrapped storage.
+    Reads never compact the segments: signals of the current scenario are
+    served from memory, all other signals from the compacted files of the
+    wrapped storage.
+    """
+    @classmethod
+    def from_config(cls, storage: EmissorDataStorage, config_manager: ConfigurationManager):
+        config = config_manager.get_config("cltl.emissor-data")
+        path = config.get("path")
+        flush_interval = config.get_float("flush_interval") if "flush_interval" in config else 1.0
+
+        return cls(storage, path, flush_interval)
+
+    def __init__(self, storage: EmissorDataStorage, path: str, flush_interval: float = 1.0):
+        self._storage = storage
+        self._path = path
+        self._flush_interval = flush_interval
+
+        self._scenario_id = None
+        self._signals = dict()
+        self._buffer = defaultdict(list)
+        self._lock = threading.RLock()
+        # Serializes the writes to the segments, acquired before _lock
+        self._flush_lock = threading.RLock()
+
+        self._stopped = threading.Event()
+        self._flusher = None
+
+    def start(self):
+        self._compact_segments()
+        self._stopped.clear()
+        self._flusher = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._flusher.start()
+
+    def stop(self):
+        if not self._flusher:
+            return
+
+        self._stopped.set()
+        self._flusher.join()
+        self._flusher = None
+        self.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._storage, name)
+
+    def start_scenario(self, scenario: Scenario):
+        with self._flush_lock, self._lock:
+            if self._scenario_id:
+                logger.warning("Scenario %s was not stopped before starting %s", self._scenario_id, scenario.id)
+                self._compact(self._scenario_id)
+            self._storage.start_scenario(scenario)
+            self._scenario_id = scenario.id
+            self._signals = dict()
+
+    def stop_scenario(self, scenario: Scenario):
+        with self._flush_lock, self._lock:
+            self._storage.stop_scenario(scenario)
+            if scenario.id == self._scenario_id:
+                self._compact(scenario.id)
+                self._scenario_id = None
+                self._signals = dict()
+
+    def add_signal(self, signal: Signal):
+        with self._lock:
+            if not self._scenario_id:
+                return self._storage.add_signal(signal)
+
+            self._signals[signal.id] = signal
+            self._buffer[self._modality(signal)].append('{"signal": ' + marshal(signal) + '}')
+
+    def add_mention(self, mention: Mention):
+        self.add_mentions([mention])
+
+    def add_mentions(self, mentions: List[Mention]):
+        with self._lock:
+            if not self._scenario_id:
+                return self._storage.add_mentions(mentions)
+
+            for mention in mentions:
+                signal = self._signals.get(mention.segment[0].container_id)
+                if not signal:
+                    logger.warning("No signal for mention %s in scenario %s", mention.id, self._scenario_id)
+                    continue
+                signal.mentions.append(mention)
+                self._buffer[self._modality(signal)].append(
+                    '{"signal_id": ' + json.dumps(signal.id) + ', "mention": ' + marshal(mention) + '}')
+
+    def get_signal(self, modality: Modality, signal_id: str) -> Optional[Signal]:
+        with self._lock:
+            if signal_id in self._signals:
+                return self._signals[signal_id]
+
+        return self._storage.get_signal(modality, signal_id)
+
+    def get_scenario_for_id(self, id: str, modality: Modality) -> str:
+        with self._lock:
+            if id in self._signals:
+                return self._scenario_id
+
+        return self._storage.get_scenario_for_id(id, modality)
+
+    def flush(self):
+        """Append the buffered records to the segments, writes to the buffer are not blocked meanwhile."""
+        with self._flush_lock:
+            with self._lock:
+                buffer, self._buffer = self._buffer, defaultdict(list)
+                scenario_id = self._scenario_id
+
+            if not scenario_id or not buffer:
+                return
+
+            segments_dir = os.path.join(self._path, scenario_id, _SEGMENTS_DIR)
+            os.makedirs(segments_dir, exist_ok=True)
+            for modality, records in buffer.items():
+                with open(os.path.join(segments_dir, f"{modality}.jsonl"), 'a') as segment:
+                    segment.write("\n".join(record.replace("\n", " ") for record in records) + "\n")
+
+    def _run(self):
+        while not self._stopped.wait(self._flush_interval):
+            try:
+                self.flush()
+            except:
+                logger.exception("Failed to flush EMISSOR segments for scenario %s", self._scenario_id)
+
+    def _compact_segments(self):
+        """Compact the segments of scenarios that were not stopped, e.g. after a crash."""
+        if not os.path.isdir(self._path):
+            return
+
+        for scenario_id in sorted(os.listdir(self._path)):
+            if os.path.isdir(os.path.join(self._path, scenario_id, _SEGMENTS_DIR)):
+                try:
+                    self._compact(scenario_id)
+                except Exception:
+                    logger.exception("Failed to compact EMISSOR segments of scenario %s", scenario_id)
+
+    def _compact(self, scenario_id: str):
+        """Merge the JSONL segments of a scenario into the signal files of the EMISSOR layout."""
+        self.flush()
+
+        scenario_dir = os.path.join(self._path, scenario_id)
+        segments_dir = os.path.join(scenario_dir, _SEGMENTS_DIR)
+        if not os.path.isdir(segments_dir):
+            return
+
+        for segment_file in sorted(os.listdir(segments_dir)):
+            modality = segment_file[:-len(".jsonl")]
+            signal_path = os.path.join(scenario_dir, f"{modality}.json")
+            signals = self._read_signals(signal_path)
+            self._read_segment(os.path.join(segments_dir, segment_file), signals)
+            with open(signal_path + ".tmp", 'w') as signal_file:
+                json.dump(list(signals.values()), signal_file, indent=2)
+            os.replace(signal_path + ".tmp", signal_path)
+
+        shutil.rmtree(segments_dir)
+        logger.info("Compacted EMISSOR segments of scenario %s", scenario_id)
+
+    @staticmethod
+    def _read_signals(signal_path: str) -> dict:
+        if not os.path.isfile(signal_path):
+            return dict()
+
+        with open(signal_path) as signal_file:
+            return {signal["id"]: signal for signal in json.load(signal_file) or []}
+
+    def _read_segment(self, segment_file: str, signals: dict):
+        with open(segment_file) as segment:
+            for line in segment:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if "signal" in record:
+                    signal = record["signal"]
+                    previous = signals.get(signal["id"])
+                    signals[signal["id"]] = signal
+                    if previous:
+                        self._merge_mentions(signal, previous["mentions"])
+                elif record["signal_id"] in signals:
+                    self._merge_mentions(signals[record["signal_id"]], [record["mention"]])
+
+    @staticmethod
+    def _merge_mentions(signal: dict, mentions: List[dict]):
+        mention_ids = {mention["id"] for mention in signal["mentions"]}
+        signal["mentions"].extend(mention for mention in mentions if mention["id"] not in mention_ids)
+
+    @staticmethod
+    def _modality(signal: Signal) -> str:
+        return signal.modality.name.lower()
@@ -0,0 +1,49 @@
+import logging
+from typing import Optional
+
+from cltl.combot.infra.config import ConfigurationManager
+from cltl.emissordata.api import EmissorDataStorage
+from cltl_service.emissordata.client import EmissorDataClient
+from emissor.representation.scenario import Modality
+
+logger = logging.getLogger(__name__)
+
+
+class LocalEmissorDataClient:
+    """Drop-in replacement for the :class:`EmissorDataClient` that binds to the
+    :class:`EmissorDataStorage` of the application if it is running in the same process.
+
+    Requests are answered by the storage directly, without the HTTP round-trip to
+    the EmissorDataService and the JSON encoding of the response. Without local
+    storage, and for all other methods of the client, requests are sent by the
+    HTTP client.
+    """
+    @classmethod
+    def from_config(cls, storage: Optional[EmissorDataStorage], config_manager: ConfigurationManager):
+        config = config_manager.get_config("cltl.emissor-data")
+        if "url" in config and config.get("url"):
+            url = config.get("url")
+        else:
+            server_config = config_manager.get_config("app.server")
+            port = server_config.get_int("port") if "port" in server_config else 8000
+            url = f"http://0.0.0.0:{port}/emissor"
+
+        if "client" in config and config.get("client") == "http":
+            storage = None
+
+        return cls(storage, url)
+
+    def __init__(self, storage: Optional[EmissorDataStorage], url: str):
+        self._storage = storage
+        self._client = EmissorDataClient(url)
+
+        logger.info("Emissor data client %s", "bound to local storage" if storage else "using " + url)
+
+    def get_scenario_for_id(self, id: str, modality: Modality) -> str:
+        if self._storage is None:
+            return self._client.get_scenario_for_id(id, modality)
+
+        return self._storage.get_scenario_for_id(id, modality)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
@@ -0,0 +1,190 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from cltl.combot.event.emissor import ScenarioStarted, ScenarioStopped
+from cltl.combot.infra.config import ConfigurationManager
+from cltl.combot.infra.event import Event, EventBus
+from cltl.combot.infra.resource import ResourceManager
+from cltl.combot.infra.topic_worker import TopicWorker
+from emissor.representation.scenario import Scenario
+
+from app_service.event_bus.observed import ProcessObserver
+from app_service.session.store import SessionState, SessionStore
+
+logger = logging.getLogger(__name__)
+
+
+def session_id(event: Event) -> Optional[str]:
+    """The scenario of a scenario event or the scenario that contains the signal of a signal event."""
+    scenario = getattr(event.payload, "scenario", None)
+    if scenario is not None and getattr(scenario, "id", None):
+        return scenario.id
+
+    signal = getattr(event.payload, "signal", None)
+
+    return getattr(getattr(signal, "time", None), "container_id", None)
+
+
+def restore_llm_history(llm) -> Callable[[SessionState], None]:
+    """Restore the conversation history of an LLM that keeps its messages in a ``_history`` list."""
+    def restore(state: SessionState):
+        history = getattr(llm, "_history", None)
+        if not isinstance(history, list):
+            logger.warning("Cannot restore the history of %s", type(llm).__name__)
+            return
+
+        instructions = [message for message in history if isinstance(message, dict) and message.get("role") == "system"]
+        history[:] = instructions + state.history
+
+    return restore
+
+
+class SessionStateService(ProcessObserver):
+    """Records the state of the conversations from the events on the event bus in a :class:`SessionStore`.
+
+    A session that is not in memory, e.g. after a restart or when another
+    replica handled the session before, is restored from the store on its first
+    event and passed to the *restorers*. Sessions with restorers are restored
+    before any TopicWorker processes their text input, such that e.g. the LLM
+    responds with the restored history. Stopped scenarios are removed from the
+    store.
+    """
+    @classmethod
+    def from_config(cls, store: SessionStore, serializers: Tuple[Callable, Callable], event_bus: EventBus,
+                    resource_manager: ResourceManager, config_manager: ConfigurationManager,
+                    restorers: Iterable[Callable[[SessionState], None]] = ()):
+        config = config_manager.get_config("app.session")
+        resume = config.get_boolean("resume") if "resume" in config else False
+
+        return cls(store, serializers, config.get("topic_scenario"), config.get("topic_text_in"),
+                   config.get("topic_text_out"), resume, event_bus, resource_manager, restorers)
+
+    def __init__(self, store: SessionStore, serializers: Tuple[Callable, Callable],
+                 scenario_topic: str, text_in_topic: str, text_out_topic: str, resume: bool,
+                 event_bus: EventBus, resource_manager: ResourceManager,
+                 restorers: Iterable[Callable[[SessionState], None]] = ()):
+        self._store = store
+        self._serializer, self._deserializer = serializers
+        self._scenario_topic = scenario_topic
+        self._text_in_topic = text_in_topic
+        self._text_out_topic = text_out_topic
+        self._resume = resume
+        self._event_bus = event_bus
+        self._resource_manager = resource_manager
+        self._restorers = list(restorers)
+
+        self._sessions: Dict[str, SessionState] = dict()
+        self._lock = threading.RLock()
+
+        self._topic_worker = None
+
+    @property
+    def app(self):
+        return None
+
+    def add_restorer(self, restorer: Callable[[SessionState], None]):
+        self._restorers.append(restorer)
+
+    def start(self, timeout=30):
+        self._topic_worker = TopicWorker([self._scenario_topic, self._text_in_topic, self._text_out_topic],
+                                         self._event_bus, buffer_size=64, processor=self._process,
+                                         resource_manager=self._resource_manager,
+                                         name=self.__class__.__name__)
+        self._topic_worker.start().wait()
+
+    def stop(self):
+        if not self._topic_worker:
+            return
+
+        self._topic_worker.stop()
+        self._topic_worker.await_stop()
+        self._topic_worker = None
+
+        with self._lock:
+            for state in self._sessions.values():
+                self._store.snapshot(state)
+
+    def started(self, worker: str, event: Event):
+        if not self._topic_worker or not self._restorers or event.metadata.topic != self._text_in_topic:
+            return None
+
+        current_id = session_id(event)
+        if current_id:
+            try:
+                self._session(current_id)
+            except Exception:
+                logger.exception("Failed to restore session %s before %s", current_id, worker)
+
+        return None
+
+    def resume(self) -> Optional[Scenario]:
+        """Restore the most recent session that was not stopped, if enabled.
+
+        Sessions are loaded until one with a scenario is found, only that one is restored.
+        """
+        if not self._resume:
+            return None
+
+        for stored_id in self._store.sessions():
+            with self._lock:
+                state = self._sessions.get(stored_id) or self._store.load(stored_id)
+            if state and state.scenario:
+                state = self._session(stored_id, loaded=state)
+                logger.info("Resumed session %s with %s messages", stored_id, len(state.history))
+                return self.scenario(state)
+
+        return None
+
+    def release(self, released_id: str):
+        """Remove the session from memory, it is restored from the store on its next event."""
+        with self._lock:
+            state = self._sessions.pop(released_id, None)
+            if state:
+                self._store.snapshot(state)
+
+    def scenario(self, state: SessionState) -> Optional[Scenario]:
+        return self._deserializer(state.scenario).payload.scenario if state.scenario else None
+
+    def _process(self, event: Event):
+        current_id = session_id(event)
+        if not current_id:
+            return
+
+        if event.metadata.topic == self._scenario_topic:
+            if isinstance(event.payload, ScenarioStopped):
+                self._stopped(current_id)
+            else:
+                state = self._session(current_id, restore=not isinstance(event.payload, ScenarioStarted))
+                self._store.append(state, {"scenario": self._serializer(event)})
+        else:
+            role = "user" if event.metadata.topic == self._text_in_topic else "assistant"
+            text = getattr(getattr(event.payload, "signal", None), "text", None)
+            if text:
+                self._store.append(self._session(current_id), {"message": {"role": role, "content": text}})
+
+    def _session(self, current_id: str, restore: bool = True, loaded: Optional[SessionState] = None) -> SessionState:
+        with self._lock:
+            if current_id in self._sessions:
+                return self._sessions[current_id]
+
+            state = loaded or (self._store.load(current_id) if restore else None)
+            if state:
+                start = time.monotonic()
+                for restorer in self._restorers:
+                    try:
+                        restorer(state)
+                    except Exception:
+                        logger.exception("Failed to restore session %s", current_id)
+                logger.info("Restored session %s in %.1f ms", current_id, (time.monotonic() - start) * 1000)
+            else:
+                state = SessionState(current_id)
+            self._sessions[current_id] = state
+
+            return state
+
+    def _stopped(self, current_id: str):
+        with self._lock:
+            self._sessions.pop(current_id, None)
+            self._store.remove(current_id)
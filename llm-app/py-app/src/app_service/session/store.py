@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from cltl.combot.infra.config import ConfigurationManager
+
+logger = logging.getLogger(__name__)
+
+
+_SNAPSHOT = ".snapshot.json"
+_DELTAS = ".deltas.jsonl"
+# Session ids are file names in the store, e.g. no path separators or leading dots
+_SESSION_ID = re.compile(r"^[\w-][\w.-]*$")
+
+
+@dataclass
+class SessionState:
+    """The state of a conversation that is needed to continue it in another process.
+
+    *scenario* is the serialized scenario event of the session, *history* the
+    conversation as ``{"role": ..., "content": ...}`` messages.
+    """
+    session_id: str
+    scenario: Optional[str] = None
+    history: List[dict] = field(default_factory=list)
+    updated: float = 0.0
+
+    def apply(self, delta: dict):
+        if "scenario" in delta:
+            self.scenario = delta["scenario"]
+        if "message" in delta:
+            self.history.append(delta["message"])
+        self.updated = delta.get("timestamp", self.updated)
+
+
+class SessionStore:
+    """Stores the state of each session as a snapshot with the deltas appended since.
+
+    Deltas are appended to ``<session>.deltas.jsonl``. After *snapshot_deltas*
+    deltas the state is written to ``<session>.snapshot.json`` and the deltas are
+    truncated, such that restoring a session reads at most one snapshot and
+    *snapshot_deltas* deltas. Sessions are only read when they are restored.
+    Session ids that are no plain file name are rejected with a ValueError.
+    """
+    @classmethod
+    def from_config(cls, config_manager: ConfigurationManager):
+        config = config_manager.get_config("app.session")
+        snapshot_deltas = config.get_int("snapshot_deltas") if "snapshot_deltas" in config else 20
+        max_history = config.get_int("max_history") if "max_history" in config else 100
+
+        return cls(config.get("path"), snapshot_deltas, max_history)
+
+    def __init__(self, path: str, snapshot_deltas: int = 20, max_history: int = 100):
+        self._path = path
+        self._snapshot_deltas = snapshot_deltas
+        self._max_history = max_history
+        self._delta_counts: Dict[str, int] = dict()
+        self._lock = threading.Lock()
+
+        os.makedirs(self._path, exist_ok=True)
+
+    def sessions(self) -> List[str]:
+        """The stored sessions, the most recently updated first."""
+        files = {}
+        for name in os.listdir(self._path):
+            for suffix in (_SNAPSHOT, _DELTAS):
+                if name.endswith(suffix) and _SESSION_ID.match(name[:-len(suffix)]):
+                    session_id = name[:-len(suffix)]
+                    files[session_id] = max(files.get(session_id, 0.0),
+                                            os.path.getmtime(os.path.join(self._path, name)))
+
+        return sorted(files, key=files.get, reverse=True)
+
+    def append(self, state: SessionState, delta: dict):
+        """Apply the *delta* to the *state* and persist it."""
+        delta = dict(delta, timestamp=time.time())
+        state.apply(delta)
+        with self._lock:
+            with open(self._file(state.session_id, _DELTAS), "a") as deltas:
+                deltas.write(json.dumps(delta) + "\n")
+            count = self._delta_counts.get(state.session_id, 0) + 1
+            self._delta_counts[state.session_id] = count
+
+        if count >= self._snapshot_deltas:
+            self.snapshot(state)
+
+    def snapshot(self, state: SessionState):
+        state.history = state.history[-self._max_history:]
+        with self._lock:
+            snapshot_file = self._file(state.session_id, _SNAPSHOT)
+            with open(snapshot_file + ".tmp", "w") as snapshot:
+                json.dump(asdict(state), snapshot)
+            os.replace(snapshot_file + ".tmp", snapshot_file)
+            open(self._file(state.session_id, _DELTAS), "w").close()
+            self._delta_counts[state.session_id] = 0
+        logger.debug("Snapshot of session %s with %s messages", state.session_id, len(state.history))
+
+    def load(self, session_id: str) -> Optional[SessionState]:
+        with self._lock:
+            snapshot_file = self._file(session_id, _SNAPSHOT)
+            deltas_file = self._file(session_id, _DELTAS)
+            if not os.path.exists(snapshot_file) and not os.path.exists(deltas_file):
+                return None
+
+            state = SessionState(session_id)
+            if os.path.exists(snapshot_file):
+                with open(snapshot_file) as snapshot:
+                    state = SessionState(**json.load(snapshot))
+
+            count = 0
+            if os.path.exists(deltas_file):
+                with open(deltas_file) as deltas:
+                    for line in deltas:
+                        try:
+                            state.apply(json.loads(line))
+                            count += 1
+                        except ValueError:
+                            # Incomplete last line of a crashed process
+                            logger.warning("Skipped invalid delta of session %s", session_id)
+            self._delta_counts[session_id] = count
+
+        state.history = state.history[-self._max_history:]
+
+        return state
+
+    def remove(self, session_id: str):
+        with self._lock:
+            for suffix in (_SNAPSHOT, _DELTAS):
+                if os.path.exists(self._file(session_id, suffix)):
+                    os.remove(self._file(session_id, suffix))
+            self._delta_counts.pop(session_id, None)
+
+    def _file(self, session_id: str, suffix: str) -> str:
+        if not _SESSION_ID.match(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+
+        return os.path.join(self._path, session_id + suffix)
@@ -0,0 +1,183 @@
+import copy
+import functools
+import inspect
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from cltl.combot.infra.event import Event, EventBus
+
+from app_service.event_bus.observed import ProcessObserver
+from app_service.metrics.collector import Histogram
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    trace_id: str
+    worker: str
+    topic: str
+    event_id: str
+    enqueued: Optional[float]
+    start: float
+    end: float
+
+
+class Tracer(ProcessObserver):
+    """Collects the spans of the TopicWorkers per turn.
+
+    A turn is identified by a trace id that is assigned to an event when it is
+    published outside of any TopicWorker (e.g. by the chat UI or ASR), and
+    inherited by all events published while a TopicWorker processes an event
+    of that turn. Per worker the time spent in the queue and in processing is
+    aggregated into histograms. Only the most recent *max_traces* turns are kept.
+
+    The trace id is set on a copy of the metadata of each published event,
+    such that it is passed on by event buses that keep the metadata (the
+    RoutedKombuEventBus sends it as message header). It is also kept by event
+    id in the tracer for event buses that replace the metadata on delivery.
+    """
+    def __init__(self, max_traces: int = 1000):
+        self._max_traces = max_traces
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self._event_traces = OrderedDict()
+        self._enqueued = OrderedDict()
+        self._traces = OrderedDict()
+        self._queue_histograms = defaultdict(Histogram)
+        self._processing_histograms = defaultdict(Histogram)
+
+    @property
+    def current(self) -> Optional[str]:
+        return getattr(self._local, "trace_id", None)
+
+    def trace_id(self, event: Event) -> Optional[str]:
+        trace_id = getattr(event.metadata, "trace_id", None)
+        if trace_id:
+            return trace_id
+
+        with self._lock:
+            return self._event_traces.get(event.id)
+
+    def published(self, event: Event) -> str:
+        trace_id = self.current or str(uuid.uuid4())
+        with self._lock:
+            self._event_traces[event.id] = trace_id
+            self._evict(self._event_traces, 100 * self._max_traces)
+            self._add_trace(trace_id)
+
+        return trace_id
+
+    def enqueued(self, worker: str, event: Event):
+        with self._lock:
+            self._enqueued[(worker, event.id)] = time.time()
+            self._evict(self._enqueued, 100 * self._max_traces)
+
+    def started(self, worker: str, event: Event) -> Any:
+        trace_id = self.trace_id(event)
+        if trace_id:
+            # Turns started in another process
+            with self._lock:
+                self._add_trace(trace_id)
+        previous, self._local.trace_id = self.current, trace_id
+
+        return previous, trace_id
+
+    def finished(self, worker: str, event: Event, state: Any, start: float, end: float, failed: bool):
+        previous, trace_id = state
+        self._local.trace_id = previous
+        self._record(trace_id, worker, event, start, end)
+
+    def traces(self) -> List[str]:
+        with self._lock:
+            return list(self._traces.keys())
+
+    def spans(self, trace_id: str) -> List[Span]:
+        with self._lock:
+            return list(self._traces.get(trace_id, []))
+
+    def stages(self) -> Dict[str, dict]:
+        with self._lock:
+            return {worker: {"queue_seconds": self._queue_histograms[worker].to_dict(),
+                             "processing_seconds": self._processing_histograms[worker].to_dict()}
+                    for worker in self._processing_histograms}
+
+    def chrome_trace(self, trace_ids: List[str] = None) -> dict:
+        """Spans of the given (default all) turns in the Chrome trace event format."""
+        trace_ids = trace_ids or self.traces()
+        events = []
+        for trace_id in trace_ids:
+            for span in self.spans(trace_id):
+                args = {"trace_id": trace_id, "event_id": span.event_id, "topic": span.topic}
+                if span.enqueued is not None:
+                    events.append({"name": span.worker + " (queued)", "cat": "queue", "ph": "X",
+                                   "ts": span.enqueued * 1e6, "dur": (span.start - span.enqueued) * 1e6,
+                                   "pid": trace_id, "tid": span.worker, "args": args})
+                events.append({"name": span.worker, "cat": span.topic, "ph": "X",
+                               "ts": span.start * 1e6, "dur": (span.end - span.start) * 1e6,
+                               "pid": trace_id, "tid": span.worker, "args": args})
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def _record(self, trace_id: Optional[str], worker: str, event: Event, start: float, end: float):
+        with self._lock:
+            enqueued = self._enqueued.pop((worker, event.id), None)
+            if enqueued is not None:
+                self._queue_histograms[worker].observe(start - enqueued)
+            self._processing_histograms[worker].observe(end - start)
+            if trace_id in self._traces:
+                self._traces[trace_id].append(Span(trace_id, worker, event.metadata.topic, event.id,
+                                                   enqueued, start, end))
+
+    def _add_trace(self, trace_id: str):
+        if trace_id not in self._traces:
+            self._traces[trace_id] = []
+            self._evict(self._traces, self._max_traces)
+
+    @staticmethod
+    def _evict(entries: OrderedDict, max_size: int):
+        while len(entries) > max_size:
+            entries.popitem(last=False)
+
+
+class TracingEventBus(EventBus):
+    """Decorates an :class:`EventBus` to assign trace ids to published events and
+    to record when events are delivered to the queues of the subscribers."""
+    def __init__(self, event_bus: EventBus, tracer: Tracer):
+        self._event_bus = event_bus
+        self._tracer = tracer
+        self._handlers = dict()
+
+    def publish(self, topic: str, event: Event):
+        # Events without explicit metadata share the default EventMetadata instance
+        metadata = copy.copy(event.metadata)
+        metadata.trace_id = self._tracer.published(event)
+        self._event_bus.publish(topic, Event(event.id, event.payload, metadata))
+
+    def subscribe(self, topic, handler):
+        worker = getattr(getattr(inspect.unwrap(handler), "__self__", None), "name", None) \
+                 or getattr(handler, "__name__", "handler")
+
+        @functools.wraps(handler)
+        def traced_handler(event):
+            self._tracer.enqueued(worker, event)
+            return handler(event)
+
+        self._handlers[(topic, handler)] = traced_handler
+        self._event_bus.subscribe(topic, traced_handler)
+
+    def unsubscribe(self, topic, handler=None):
+        if handler is None:
+            self._event_bus.unsubscribe(topic)
+            return
+
+        self._event_bus.unsubscribe(topic, self._handlers.pop((topic, handler), handler))
+
+    def __getattr__(self, name):
+        return getattr(self._event_bus, name)
@@ -0,0 +1,100 @@
+import io
+import time
+import unittest
+
+from cltl.combot.event.emissor import TextSignalEvent
+from cltl.combot.infra.event import Event
+from cltl.combot.infra.event.memory import SynchronousEventBus
+from cltl.combot.infra.time_util import timestamp_now
+from emissor.representation.scenario import TextSignal
+
+from app_service.chatui.admission import AdmissionControl
+
+RESPONSE_TOPIC = "cltl.topic.text_out"
+
+
+class AdmissionControlTest(unittest.TestCase):
+    def setUp(self):
+        self.event_bus = SynchronousEventBus()
+        self.forwarded = []
+
+    def tearDown(self):
+        self.admission.stop()
+
+    def _start(self, **kwargs):
+        self.admission = AdmissionControl(self.event_bus, RESPONSE_TOPIC, **kwargs)
+        self.admission.start()
+        self.app = self.admission.wrap(self._chatui)
+
+    def _chatui(self, environ, start_response):
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+        self.forwarded.append((environ["PATH_INFO"], environ["wsgi.input"].read(length).decode("utf-8")))
+        start_response("200 OK", [])
+
+        return [b"{}"]
+
+    def _post(self, chat_id, text, address="10.0.0.1", headers=None):
+        body = text.encode("utf-8")
+        environ = {"REQUEST_METHOD": "POST", "PATH_INFO": f"/chat/{chat_id}", "REMOTE_ADDR": address,
+                   "CONTENT_LENGTH": str(len(body)), "wsgi.input": io.BytesIO(body), **(headers or {})}
+        statuses = []
+        list(self.app(environ, lambda status, response_headers, exc_info=None: statuses.append(status)))
+
+        return int(statuses[0].split()[0])
+
+    def _respond(self, chat_id):
+        signal = TextSignal.for_scenario(chat_id, timestamp_now(), timestamp_now(), None, "reply")
+        self.event_bus.publish(RESPONSE_TOPIC, Event.for_payload(TextSignalEvent.for_agent(signal)))
+
+    def test_tenant_header_does_not_bypass_the_rate_limit(self):
+        self._start(rate=0.01, burst=1)
+
+        self.assertEqual(200, self._post("chat-1", "hello", headers={"HTTP_X_TENANT": "a"}))
+        self.assertEqual(429, self._post("chat-2", "hello", headers={"HTTP_X_TENANT": "b"}))
+        self.assertEqual(200, self._post("chat-3", "hello", address="10.0.0.2"))
+
+    def test_configured_tenant_shares_the_rate_limit(self):
+        self._start(rate=0.01, burst=1, tenant="tenant")
+
+        self.assertEqual(200, self._post("chat-1", "hello", address="10.0.0.1"))
+        self.assertEqual(429, self._post("chat-2", "hello", address="10.0.0.2"))
+
+    def test_rate_limits_are_bounded(self):
+        self._start(max_tenants=2)
+
+        for address in ("10.0.0.1", "10.0.0.2", "10.0.0.3"):
+            self._post(f"chat-{address}", "hello", address=address)
+
+        self.assertEqual(2, self.admission.status()["tenants"])
+
+    def test_response_of_another_chat_does_not_complete_the_turn(self):
+        self._start()
+        self._post("chat-1", "hello")
+
+        self._respond("chat-2")
+
+        self.assertEqual(1, self.admission.status()["in_flight"])
+        self.assertEqual(1, self.admission.status()["unmatched"])
+
+    def test_response_without_chat_completes_the_single_turn(self):
+        self._start()
+        self._post("chat-1", "hello")
+
+        self.event_bus.publish(RESPONSE_TOPIC, Event.for_payload("reply"))
+
+        self.assertEqual(0, self.admission.status()["in_flight"])
+
+    def test_turns_are_coalesced_until_the_response(self):
+        self._start()
+        self.assertEqual(200, self._post("chat-1", "hello"))
+        self.assertEqual(202, self._post("chat-1", "how are"))
+        self.assertEqual(202, self._post("chat-1", "you?"))
+
+        self._respond("chat-1")
+
+        for _ in range(200):
+            if len(self.forwarded) == 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual([("/chat/chat-1", "hello"), ("/chat/chat-1", "how are you?")], self.forwarded)
+        self.assertEqual(1, self.admission.status()["in_flight"])
@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+import unittest
+
+from cltl.combot.infra.time_util import timestamp_now
+from emissor.representation.scenario import Modality, Scenario, TextSignal
+
+from app_service.emissordata.append_storage import AppendOnlyEmissorDataStorage
+
+
+class _Storage:
+    """Stands in for the wrapped storage and records the calls it receives."""
+    def __init__(self):
+        self.calls = []
+
+    def start_scenario(self, scenario):
+        self.calls.append(("start_scenario", scenario.id))
+
+    def stop_scenario(self, scenario):
+        self.calls.append(("stop_scenario", scenario.id))
+
+    def get_signal(self, modality, signal_id):
+        self.calls.append(("get_signal", signal_id))
+
+    def get_scenario_for_id(self, id, modality):
+        self.calls.append(("get_scenario_for_id", id))
+
+    def get_scenario(self, scenario_id):
+        self.calls.append(("get_scenario", scenario_id))
+
+
+class AppendOnlyEmissorDataStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.wrapped = _Storage()
+        self.storage = AppendOnlyEmissorDataStorage(self.wrapped, self.path, flush_interval=60)
+        self.storage.start()
+        self.scenario = Scenario.new_instance("scenario-1", timestamp_now(), None, None, {})
+        self.storage.start_scenario(self.scenario)
+
+    def tearDown(self):
+        self.storage.stop()
+
+    def _signal(self, text):
+        signal = TextSignal.for_scenario(self.scenario.id, timestamp_now(), timestamp_now(), None, text)
+        self.storage.add_signal(signal)
+
+        return signal
+
+    def test_reads_do_not_compact(self):
+        signal = self._signal("hello")
+        self.storage.flush()
+
+        self.assertIs(signal, self.storage.get_signal(Modality.TEXT, signal.id))
+        self.assertEqual(self.scenario.id, self.storage.get_scenario_for_id(signal.id, Modality.TEXT))
+        self.storage.get_scenario(self.scenario.id)
+
+        self.assertFalse(os.path.exists(os.path.join(self.path, self.scenario.id, "text.json")))
+        self.assertTrue(os.path.isfile(os.path.join(self.path, self.scenario.id, "segments", "text.jsonl")))
+        self.assertEqual([("start_scenario", self.scenario.id), ("get_scenario", self.scenario.id)],
+                         self.wrapped.calls)
+
+    def test_reads_of_other_signals_use_the_wrapped_storage(self):
+        self.storage.get_signal(Modality.TEXT, "other")
+
+        self.assertEqual(("get_signal", "other"), self.wrapped.calls[-1])
+
+    def test_segments_are_compacted_when_the_scenario_stops(self):
+        signal = self._signal("hello")
+
+        self.storage.stop_scenario(self.scenario)
+
+        with open(os.path.join(self.path, self.scenario.id, "text.json")) as signal_file:
+            self.assertEqual([signal.id], [record["id"] for record in json.load(signal_file)])
+        self.assertFalse(os.path.exists(os.path.join(self.path, self.scenario.id, "segments")))
@@ -0,0 +1,32 @@
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from app_service.audio.storage import AsyncAudioStorage
+
+
+def _frame(value):
+    return np.full(4, value, dtype=np.int16)
+
+
+class AsyncAudioStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.storage = AsyncAudioStorage(tempfile.mkdtemp(), compression="flac", queue_size=2)
+
+    def test_store_does_not_block_when_the_writer_falls_behind(self):
+        # The writer is not running yet, such that the queue fills up
+        self.storage._writer = threading.Thread(target=self.storage._run, daemon=True)
+        self.storage.store("signal-1", (_frame(value) for value in range(5)), 16000)
+
+        self.assertEqual({"queued": 2, "capacity": 2, "dropped": 3}, self.storage.stats)
+
+        self.storage._writer.start()
+        self.storage.stop()
+
+        frames, _ = self.storage.get("signal-1")
+        self.assertEqual(list(range(5)), [frame[0] for frame in frames])
+        self.storage._read_cache.clear()
+        frames, _ = self.storage.get("signal-1")
+        self.assertEqual(list(range(5)), [frame[0] for frame in frames])
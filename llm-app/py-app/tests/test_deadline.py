@@ -0,0 +1,82 @@
+import time
+import unittest
+
+from cltl.combot.event.emissor import TextSignalEvent
+from cltl.combot.infra.event import Event
+from cltl.combot.infra.event.memory import SynchronousEventBus
+from cltl.combot.infra.time_util import timestamp_now
+from emissor.representation.scenario import TextSignal
+
+from app_service.reply.deadline import DeadlineService
+
+INPUT_TOPIC = "cltl.topic.text_in"
+REPLY_TOPIC = "cltl.topic.reply"
+RESPONSE_TOPIC = "cltl.topic.text_out"
+
+
+class DeadlineCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.event_bus = SynchronousEventBus()
+        self.responses = []
+        self.event_bus.subscribe(RESPONSE_TOPIC, lambda event: self.responses.append(event.payload.signal.text))
+
+        self.service = DeadlineService(INPUT_TOPIC, REPLY_TOPIC, RESPONSE_TOPIC, 60.0, "llm", None, [], "merge",
+                                       10, 600.0, self.event_bus, None)
+        self.service.start()
+
+    def tearDown(self):
+        self.service.stop()
+
+    def _publish(self, topic, scenario_id, text):
+        signal = TextSignal.for_scenario(scenario_id, timestamp_now(), timestamp_now(), None, text)
+        self.event_bus.publish(topic, Event.for_payload(TextSignalEvent.for_speaker(signal)))
+
+    def _await(self, condition):
+        for _ in range(200):
+            if condition():
+                return
+            time.sleep(0.01)
+        self.fail("Timed out")
+
+    def _miss_deadline(self, scenario_id, text):
+        fallbacks = sum(self.service.status()["fallbacks"].values())
+        self._publish(INPUT_TOPIC, scenario_id, text)
+        self._await(lambda: self.service.status()["pending"] > 0)
+        self.service.check(time.monotonic() + 120)
+        self._await(lambda: sum(self.service.status()["fallbacks"].values()) > fallbacks)
+
+    def test_cached_reply_is_used_in_the_same_scenario(self):
+        self._publish(INPUT_TOPIC, "scenario-1", "How are you?")
+        self._await(lambda: self.service.status()["pending"] == 1)
+        self._publish(REPLY_TOPIC, "scenario-1", "Fine, thanks")
+        self._await(lambda: len(self.responses) == 1)
+
+        self._miss_deadline("scenario-1", "how are  you?")
+
+        self._await(lambda: len(self.responses) == 2)
+        self.assertEqual(["Fine, thanks", "Fine, thanks"], self.responses)
+        self.assertEqual({"cache": 1}, self.service.status()["fallbacks"])
+
+    def test_cached_reply_is_not_used_in_another_scenario(self):
+        self._publish(INPUT_TOPIC, "scenario-1", "What is my name?")
+        self._await(lambda: self.service.status()["pending"] == 1)
+        self._publish(REPLY_TOPIC, "scenario-1", "Your name is Alice")
+        self._await(lambda: len(self.responses) == 1)
+
+        self._miss_deadline("scenario-2", "What is my name?")
+
+        self.assertEqual(["Your name is Alice"], self.responses)
+        self.assertEqual({"none": 1}, self.service.status()["fallbacks"])
+
+    def test_late_reply_is_merged(self):
+        self._publish(INPUT_TOPIC, "scenario-1", "Hello")
+        self._await(lambda: self.service.status()["pending"] == 1)
+        self._publish(REPLY_TOPIC, "scenario-1", "Hi")
+        self._await(lambda: len(self.responses) == 1)
+
+        self._miss_deadline("scenario-1", "Hello")
+        self._publish(REPLY_TOPIC, "scenario-1", "Hi again")
+
+        self._await(lambda: len(self.responses) == 3)
+        self.assertEqual(["Hi", "Hi", "Hi again"], self.responses)
+        self.assertEqual({"merged": 1}, self.service.status()["late"])
@@ -0,0 +1,93 @@
+import json
+import os
+import tempfile
+import unittest
+
+from cltl.combot.infra.event import Event
+from cltl.combot.infra.event.memory import SynchronousEventBus
+from cltl.combot.infra.event_log import LogWriter
+from cltl_service.combot.event_log.service import EventLogService
+
+from app_service.event_log.policy import EventLogPolicy, PolicyLogWriter
+from app_service.event_log.writer import BufferedLogWriter
+
+TOPIC = "cltl.topic.text_in"
+AUDIO_TOPIC = "cltl.topic.microphone"
+
+
+def _read_segments(log_dir):
+    records = []
+    for name in sorted(os.listdir(log_dir)):
+        with open(os.path.join(log_dir, name)) as segment:
+            records += [json.loads(line) for line in segment if line.strip()]
+
+    return records
+
+
+class BufferedLogWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        self.event_bus = SynchronousEventBus()
+
+    def _log(self, writer, payloads, topics=(TOPIC,)):
+        service = EventLogService(list(topics), writer, self.event_bus)
+        service.start()
+        try:
+            for topic, payload in payloads:
+                self.event_bus.publish(topic, Event.for_payload(payload))
+        finally:
+            service.stop()
+
+    def test_event_log_service_puts_events(self):
+        writer = BufferedLogWriter(self.log_dir, vars, flush_interval=0.01)
+
+        self._log(writer, [(TOPIC, {"text": "hello"}), (TOPIC, {"text": "world"})])
+
+        records = _read_segments(self.log_dir)
+        self.assertEqual([{"text": "hello"}, {"text": "world"}], [record["payload"] for record in records])
+        self.assertEqual([TOPIC, TOPIC], [record["metadata"]["topic"] for record in records])
+        self.assertEqual(2, writer.stats["written"])
+
+    def test_full_buffer_drops_events(self):
+        writer = BufferedLogWriter(self.log_dir, vars, queue_size=1)
+
+        writer.put(Event.for_payload("first"))
+        writer.put(Event.for_payload("second"))
+
+        self.assertEqual(1, writer.stats["dropped"])
+
+
+class PolicyLogWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        self.event_bus = SynchronousEventBus()
+
+    def _log(self, writer, payloads):
+        service = EventLogService([TOPIC, AUDIO_TOPIC], writer, self.event_bus)
+        service.start()
+        try:
+            for topic, payload in payloads:
+                self.event_bus.publish(topic, Event.for_payload(payload))
+        finally:
+            service.stop()
+
+    def test_policy_is_applied_to_logged_events(self):
+        policy = EventLogPolicy(vars, exclude=[AUDIO_TOPIC], sample={TOPIC: 2})
+        writer = PolicyLogWriter(BufferedLogWriter(self.log_dir, vars, flush_interval=0.01), policy)
+
+        self._log(writer, [(TOPIC, "one"), (AUDIO_TOPIC, "audio"), (TOPIC, "two"), (TOPIC, "three")])
+
+        self.assertEqual(["one", "three"], [record["payload"] for record in _read_segments(self.log_dir)])
+        self.assertEqual({AUDIO_TOPIC: 1, TOPIC: 1}, policy.skipped)
+
+    def test_policy_is_applied_with_the_combot_log_writer(self):
+        policy = EventLogPolicy(vars, metadata_only=[AUDIO_TOPIC])
+        writer = PolicyLogWriter(LogWriter(self.log_dir, vars), policy)
+
+        self._log(writer, [(AUDIO_TOPIC, "audio")])
+
+        log_file, = os.listdir(self.log_dir)
+        with open(os.path.join(self.log_dir, log_file)) as log:
+            content = log.read()
+        self.assertIn('"payload_type": "str"', content)
+        self.assertNotIn('"audio"', content)
@@ -0,0 +1,75 @@
+import threading
+import unittest
+
+from cltl.combot.infra.event import Event
+from cltl.combot.infra.event.memory import SynchronousEventBus
+
+from app_service.event_bus.lanes import CONTROL, MEDIA, PriorityEventBus, TopicLanes
+
+CONTROL_TOPIC = "cltl.topic.control"
+MEDIA_TOPIC = "cltl.topic.media"
+
+
+class LanesTest(unittest.TestCase):
+    def setUp(self):
+        self.latencies = []
+        self.event_bus = PriorityEventBus(SynchronousEventBus(),
+                                          TopicLanes({CONTROL: [CONTROL_TOPIC], MEDIA: [MEDIA_TOPIC]}),
+                                          observer=lambda lane, seconds: self.latencies.append(lane))
+        self.release = threading.Event()
+        self.media = []
+        self.media_delivered = threading.Event()
+        self.control = []
+        self.control_delivered = threading.Event()
+
+        self.event_bus.subscribe(MEDIA_TOPIC, self._media)
+        self.event_bus.subscribe(CONTROL_TOPIC, self._control)
+
+    def tearDown(self):
+        self.release.set()
+        self.event_bus.close()
+
+    def _media(self, event):
+        self.media.append(event.payload)
+        self.media_delivered.set()
+        self.release.wait()
+
+    def _control(self, event):
+        self.control.append(event.payload)
+        self.control_delivered.set()
+
+    def _publish(self, topic, payload):
+        self.event_bus.publish(topic, Event.for_payload(payload))
+
+    def test_control_events_are_not_delayed_by_media_events(self):
+        self._publish(MEDIA_TOPIC, "media-1")
+        self.assertTrue(self.media_delivered.wait(1))
+        self._publish(MEDIA_TOPIC, "media-2")
+
+        self._publish(CONTROL_TOPIC, "control-1")
+
+        self.assertTrue(self.control_delivered.wait(1))
+        self.assertEqual(["control-1"], self.control)
+        self.assertEqual(["media-1"], self.media)
+
+    def test_events_are_delivered_in_order_per_lane(self):
+        self.release.set()
+        for payload in ("media-1", "media-2", "media-3"):
+            self._publish(MEDIA_TOPIC, payload)
+
+        self.event_bus.close()
+
+        self.assertEqual(["media-1", "media-2", "media-3"], self.media)
+        self.assertEqual([MEDIA] * 3, self.latencies)
+
+    def test_unsubscribed_handlers_are_not_delivered(self):
+        self.event_bus.unsubscribe(CONTROL_TOPIC, self._control)
+
+        self._publish(CONTROL_TOPIC, "control-1")
+        self.event_bus.close()
+
+        self.assertEqual([], self.control)
+
+
+if __name__ == '__main__':
+    unittest.main()
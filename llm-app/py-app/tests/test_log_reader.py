@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+from cltl.combot.event.emissor import TextSignalEvent
+from cltl.combot.infra.event import Event
+from cltl.combot.infra.event.memory import SynchronousEventBus
+from cltl.combot.infra.event_log import LogWriter
+from cltl.combot.infra.time_util import timestamp_now
+from cltl_service.combot.event_log.service import EventLogService
+from emissor.representation.scenario import TextSignal
+from emissor.representation.util import serializer
+
+from app_service.event_log.writer import BufferedLogWriter
+from app_service.replay.log_reader import read_event_log
+
+TOPIC = "cltl.topic.text_in"
+OTHER_TOPIC = "cltl.topic.text_out"
+
+
+class ReadEventLogTest(unittest.TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+
+    def _log(self, writer, texts):
+        event_bus = SynchronousEventBus()
+        service = EventLogService([TOPIC, OTHER_TOPIC], writer, event_bus)
+        service.start()
+        try:
+            for topic, text in texts:
+                signal = TextSignal.for_scenario("scenario-1", timestamp_now(), timestamp_now(), None, text)
+                event_bus.publish(topic, Event.for_payload(TextSignalEvent.for_speaker(signal)))
+        finally:
+            service.stop()
+
+    def test_read_log_writer_file(self):
+        self._log(LogWriter(self.log_dir, serializer), [(TOPIC, "hello"), (OTHER_TOPIC, "hi"), (TOPIC, "bye")])
+
+        events = read_event_log(self.log_dir)
+
+        self.assertEqual([TOPIC, OTHER_TOPIC, TOPIC], [event.topic for event in events])
+        self.assertEqual(["hello", "hi", "bye"], [event.payload.signal.text for event in events])
+
+    def test_read_log_writer_file_with_topics(self):
+        self._log(LogWriter(self.log_dir, serializer), [(TOPIC, "hello"), (OTHER_TOPIC, "hi")])
+
+        events = read_event_log(self.log_dir, [OTHER_TOPIC])
+
+        self.assertEqual(["hi"], [event.payload.signal.text for event in events])
+
+    def test_read_incomplete_log_writer_file(self):
+        self._log(LogWriter(self.log_dir, serializer), [(TOPIC, "hello"), (TOPIC, "bye")])
+        log_file, = os.listdir(self.log_dir)
+        log_path = os.path.join(self.log_dir, log_file)
+        with open(log_path) as log:
+            content = log.read()
+        # Crashed while writing the second event
+        with open(log_path, 'w') as log:
+            log.write(content[:content.rindex('"bye"')])
+
+        events = read_event_log(log_path)
+
+        self.assertEqual(["hello"], [event.payload.signal.text for event in events])
+
+    def test_read_buffered_log_writer_segments(self):
+        self._log(BufferedLogWriter(self.log_dir, serializer, flush_interval=0.01), [(TOPIC, "hello"), (TOPIC, "bye")])
+
+        events = read_event_log(self.log_dir)
+
+        self.assertEqual(["hello", "bye"], [event.payload.signal.text for event in events])
@@ -0,0 +1,128 @@
+import threading
+import unittest
+
+from cltl.combot.infra.event import Event
+from cltl.combot.infra.event.memory import SynchronousEventBus
+from cltl.combot.infra.topic_worker import TopicWorker
+
+from app_service.event_bus.observed import ObservedEventBus, ProcessObserver
+from app_service.health.checks import topic_workers_idle
+from app_service.metrics.collector import MetricsCollector
+
+TOPIC = "cltl.topic.text_in"
+
+
+class _RecordingObserver(ProcessObserver):
+    def __init__(self):
+        self.calls = []
+
+    def delivered(self, worker, event):
+        self.calls.append(("delivered", worker, event.payload))
+
+    def skipped(self, worker, event_id):
+        self.calls.append(("skipped", worker, event_id))
+
+    def started(self, worker, event):
+        self.calls.append(("started", worker, event.payload))
+
+        return event.payload
+
+    def finished(self, worker, event, state, start, end, failed):
+        self.calls.append(("finished", worker, state, failed))
+
+
+class ObservedEventBusTest(unittest.TestCase):
+    def setUp(self):
+        self.observer = _RecordingObserver()
+        self.collector = MetricsCollector()
+        self.event_bus = ObservedEventBus(SynchronousEventBus(), [self.observer, self.collector])
+        self.processing = threading.Event()
+        self.release = threading.Event()
+        self.processed = threading.Event()
+        self.workers = []
+
+    def tearDown(self):
+        self.release.set()
+        self._stop()
+
+    def _stop(self):
+        while self.workers:
+            worker = self.workers.pop()
+            worker.stop()
+            worker.await_stop()
+
+    def _start(self, processor, name="ObservedTest", event_bus=None):
+        worker = TopicWorker([TOPIC], event_bus or self.event_bus, buffer_size=1, processor=processor, name=name)
+        worker.start().wait()
+        self.workers.append(worker)
+
+        return worker
+
+    def _blocking(self, event):
+        self.processing.set()
+        self.release.wait()
+        if event.payload == "last":
+            self.processed.set()
+
+    def _publish(self, payload, event_id=None):
+        event = Event(event_id, payload) if event_id else Event.for_payload(payload)
+        self.event_bus.publish(TOPIC, event)
+
+        return event
+
+    def test_processing_is_observed(self):
+        self._start(lambda event: self.processed.set())
+
+        self._publish("text")
+
+        self.assertTrue(self.processed.wait(1))
+        self._stop()
+        self.assertEqual([("delivered", "ObservedTest", "text"), ("started", "ObservedTest", "text"),
+                          ("finished", "ObservedTest", "text", False)], self.observer.calls)
+
+    def test_only_workers_of_the_event_bus_are_observed(self):
+        self._start(lambda event: None, name="Plain", event_bus=SynchronousEventBus())
+
+        self.assertIs(TopicWorker.process, type(self.workers[0]).process)
+        self.assertNotIn("process", vars(self.workers[0]))
+
+    def test_events_overwritten_in_the_queue_are_skipped(self):
+        self._start(self._blocking)
+        self._publish("first")
+        self.assertTrue(self.processing.wait(1))
+
+        overwritten = self._publish("second")
+        self._publish("last")
+        # The event in process and the events delivered after it
+        self.assertEqual({"ObservedTest": 3}, self.event_bus.pending())
+        self.assertFalse(topic_workers_idle(self.event_bus))
+
+        self.release.set()
+        self.assertTrue(self.processed.wait(1))
+        self._stop()
+
+        self.assertIn(("skipped", "ObservedTest", overwritten.id), self.observer.calls)
+        self.assertNotIn(("started", "ObservedTest", "second"), self.observer.calls)
+        self.assertEqual({"ObservedTest": 0}, self.event_bus.pending())
+        self.assertTrue(topic_workers_idle(self.event_bus))
+
+        exposition = self.collector.exposition()
+        self.assertIn('cltl_topic_worker_received_total{worker="ObservedTest"} 3', exposition)
+        self.assertIn('cltl_topic_worker_dropped_total{worker="ObservedTest"} 1', exposition)
+        self.assertIn('cltl_topic_worker_processed_total{worker="ObservedTest"} 2', exposition)
+        self.assertIn('cltl_topic_worker_queue_depth{worker="ObservedTest"} 0', exposition)
+
+    def test_observer_added_later(self):
+        self._start(lambda event: self.processed.set())
+        observer = _RecordingObserver()
+        self.event_bus.add_observer(observer)
+
+        self._publish("text")
+
+        self.assertTrue(self.processed.wait(1))
+        self._stop()
+        self.assertIn(("started", "ObservedTest", "text"), observer.calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
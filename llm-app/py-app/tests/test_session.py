@@ -0,0 +1,58 @@
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+
+from cltl.combot.infra.event.memory import SynchronousEventBus
+
+from app_service.session.service import SessionStateService
+from app_service.session.store import SessionState, SessionStore
+
+
+def _serializer(event):
+    return event
+
+
+def _deserializer(scenario):
+    return SimpleNamespace(payload=SimpleNamespace(scenario=scenario))
+
+
+class SessionStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = SessionStore(os.path.join(self.path, "sessions"))
+
+    def test_session_ids_outside_the_store_are_rejected(self):
+        for session_id in ("../escaped", "/tmp/escaped", "nested/session", ".hidden", ".."):
+            with self.assertRaises(ValueError):
+                self.store.append(SessionState(session_id), {"message": {"role": "user", "content": "hello"}})
+            with self.assertRaises(ValueError):
+                self.store.load(session_id)
+
+        self.assertEqual(["sessions"], os.listdir(self.path))
+
+    def test_load_appended_session(self):
+        self.store.append(SessionState("scenario-1"), {"message": {"role": "user", "content": "hello"}})
+
+        state = self.store.load("scenario-1")
+
+        self.assertEqual([{"role": "user", "content": "hello"}], state.history)
+        self.assertEqual(["scenario-1"], self.store.sessions())
+
+
+class SessionResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.store = SessionStore(tempfile.mkdtemp())
+        self.restored = []
+        self.service = SessionStateService(self.store, (_serializer, _deserializer), "cltl.topic.scenario",
+                                           "cltl.topic.text_in", "cltl.topic.text_out", True,
+                                           SynchronousEventBus(), None, [self.restored.append])
+
+    def test_only_the_resumed_session_is_restored(self):
+        self.store.append(SessionState("scenario-1"), {"scenario": "scenario-1"})
+        time.sleep(0.01)
+        self.store.append(SessionState("scenario-2"), {"message": {"role": "user", "content": "hello"}})
+
+        self.assertEqual("scenario-1", self.service.resume())
+        self.assertEqual(["scenario-1"], [state.session_id for state in self.restored])
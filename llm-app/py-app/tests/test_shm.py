@@ -0,0 +1,66 @@
+import unittest
+import uuid
+
+import numpy as np
+
+from app_service.audio.shm import _WRITING, SharedAudioRing
+
+
+def _frame(value):
+    return np.full((4, 1), value, dtype=np.int16)
+
+
+class SharedAudioRingTest(unittest.TestCase):
+    def setUp(self):
+        self.ring = SharedAudioRing(f"test-{uuid.uuid4().hex[:8]}", capacity=3, frame_size=4, create=True)
+
+    def tearDown(self):
+        self.ring.close()
+
+    def test_read_written_frames(self):
+        for value in range(2):
+            self.ring.write(_frame(value))
+
+        self.assertEqual(2, self.ring.head)
+        np.testing.assert_array_equal(_frame(1), self.ring.read(1))
+        with self.assertRaises(IndexError):
+            self.ring.read(2)
+
+    def test_overwritten_frame_is_not_read(self):
+        for value in range(4):
+            self.ring.write(_frame(value))
+
+        with self.assertRaises(IndexError):
+            self.ring.read(0)
+        np.testing.assert_array_equal(_frame(3), self.ring.read(3))
+
+    def test_frame_is_not_read_while_it_is_overwritten(self):
+        for value in range(3):
+            self.ring.write(_frame(value))
+
+        frames = self.ring._frames
+        copy = np.ndarray.copy
+
+        class Overwriting(np.ndarray):
+            def copy(array):
+                # The producer starts to write frame 3 into the slot of frame 0 during the copy
+                self.ring._slots[0] = _WRITING
+                frames[0] = _frame(3)
+                return copy(array)
+
+        self.ring._frames = frames.view(Overwriting)
+        try:
+            with self.assertRaises(IndexError):
+                self.ring.read(0)
+        finally:
+            self.ring._frames = frames
+
+    def test_attached_ring_reads_the_frames(self):
+        self.ring.write(_frame(7))
+
+        attached = SharedAudioRing(self.ring.name)
+        try:
+            np.testing.assert_array_equal(_frame(7), attached.read(0))
+            self.assertEqual([7], [frame[0, 0] for frame in attached.frames(0, timeout=0.01)])
+        finally:
+            attached.close()
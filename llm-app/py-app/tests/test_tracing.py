@@ -0,0 +1,84 @@
+import json
+import threading
+import unittest
+
+from cltl.combot.infra.event import Event
+from cltl.combot.infra.event.api import EventMetadata
+from cltl.combot.infra.event.memory import SynchronousEventBus
+
+from app_service.event_bus.routed import RoutedKombuEventBus
+from app_service.tracing.tracer import Tracer, TracingEventBus
+
+TOPIC = "cltl.topic.text_in"
+
+
+def _serializer(event):
+    # Like the EMISSOR serializer, only the fields of the combot EventMetadata are kept
+    return json.dumps({"id": event.id, "payload": event.payload,
+                       "metadata": {"timestamp": event.metadata.timestamp, "topic": event.metadata.topic}})
+
+
+def _deserializer(body):
+    event = json.loads(body)
+
+    return Event(event["id"], event["payload"], EventMetadata(**event["metadata"]))
+
+
+class _RecordingEventBus(SynchronousEventBus):
+    def __init__(self):
+        super().__init__()
+        self.published = []
+
+    def publish(self, topic, event):
+        self.published.append(event)
+        super().publish(topic, event)
+
+
+class TracingEventBusTest(unittest.TestCase):
+    def setUp(self):
+        self.tracer = Tracer()
+        self.received = []
+
+    def test_published_event_carries_its_trace_id(self):
+        inner_event_bus = _RecordingEventBus()
+        inner_event_bus.subscribe(TOPIC, self.received.append)
+        event_bus = TracingEventBus(inner_event_bus, self.tracer)
+
+        first, second = Event.for_payload("first"), Event.for_payload("second")
+        event_bus.publish(TOPIC, first)
+        event_bus.publish(TOPIC, second)
+
+        trace_ids = [event.metadata.trace_id for event in inner_event_bus.published]
+        self.assertEqual([self.tracer.trace_id(first), self.tracer.trace_id(second)], trace_ids)
+        self.assertNotEqual(trace_ids[0], trace_ids[1])
+        self.assertFalse(hasattr(first.metadata, "trace_id"))
+        # The SynchronousEventBus replaces the metadata, the trace id is kept by event id
+        self.assertEqual(trace_ids, [self.tracer.trace_id(event) for event in self.received])
+
+    def test_trace_id_is_sent_with_the_routed_event_bus(self):
+        routed_event_bus = RoutedKombuEventBus("memory://", "cltl.test", _serializer, _deserializer)
+        subscribed, received = threading.Event(), threading.Event()
+
+        def handler(event):
+            if event.payload == "subscribed":
+                subscribed.set()
+                return
+            self.received.append(event)
+            received.set()
+
+        try:
+            routed_event_bus.subscribe(TOPIC, handler)
+            for _ in range(50):
+                routed_event_bus.publish(TOPIC, Event.for_payload("subscribed"))
+                if subscribed.wait(0.1):
+                    break
+
+            event = Event.for_payload("text")
+            TracingEventBus(routed_event_bus, self.tracer).publish(TOPIC, event)
+            self.assertTrue(received.wait(5))
+
+            self.assertEqual(self.tracer.trace_id(event), self.received[0].metadata.trace_id)
+            # A tracer in another process takes the trace id from the metadata
+            self.assertEqual(self.tracer.trace_id(event), Tracer().trace_id(self.received[0]))
+        finally:
+            routed_event_bus.close()
@@ -1,6 +1,6 @@
 import logging.config
 import os
-import time
+from typing import Callable, Dict, List
 
 from cltl.combot.event.emissor import SIG, MEN
 from cltl.combot.infra.config.k8config import K8LocalConfigurationContainer
@@ -23,6 +23,24 @@ from flask import Flask
 from werkzeug.middleware.dispatcher import DispatcherMiddleware
 from werkzeug.serving import run_simple
 
+from app_service.admin.service import AdminService
+from app_service.emissordata.client import LocalEmissorDataClient
+from app_service.emissordata.query import EmissorQueryService
+from app_service.event_bus.lanes import PriorityEventBus, TopicLanes
+from app_service.event_bus.observed import ObservedEventBus, ProcessObserver
+from app_service.event_bus.routed import RoutedKombuEventBus, TenantContext
+from app_service.event_log.policy import EventLogPolicy, PolicyLogWriter
+from app_service.event_log.writer import BufferedLogWriter
+from app_service.health.checks import event_bus_connected, topic_workers_alive, topic_workers_idle, url_reachable
+from app_service.health.service import HealthService
+from app_service.metrics.collector import MetricsCollector, MetricsEventBus
+from app_service.metrics.service import MetricsService
+from app_service.reply.deadline import DeadlineService
+from app_service.scaling.partition import PartitionedEventBus, ReplicaMembership
+from app_service.session.reaper import SessionReaper
+from app_service.session.service import SessionStateService
+from app_service.session.store import SessionState, SessionStore
+
 logging.config.fileConfig(os.environ.get('CLTL_LOGGING_CONFIG', default='config/logging.config'),
                           disable_existing_loggers=False)
 logger = logging.getLogger(__name__)
@@ -56,17 +74,154 @@ class InfraContainer(KombuEventBusContainer, K8LocalConfigurationContainer, Thre
         config = self.config_manager.get_config("cltl.event")
         implementation = config.get("implementation")
         if implementation == "internal":
-            return SynchronousEventBus()
+            event_bus = SynchronousEventBus()
         elif implementation == "kombu":
-            return super().event_bus
+            event_bus = self.routed_event_bus or super().event_bus
         else:
             raise ValueError("Unknown implementation: " + implementation)
 
+        if self.topic_lanes:
+            lane_latency = self.metrics_service.collector.lane_latency if self.metrics_service else None
+            event_bus = PriorityEventBus(event_bus, self.topic_lanes, observer=lane_latency)
+
+        if self.membership:
+            topics = self.config_manager.get_config("app.scaling").get("topics", multi=True)
+            event_bus = PartitionedEventBus(event_bus, self.membership, topics)
+
+        if self.metrics_service:
+            event_bus = MetricsEventBus(event_bus, self.metrics_service.collector)
+
+        # The tenant is entered before the other observers are notified
+        observers = [TenantContext(self.routed_event_bus)] if self.routed_event_bus else []
+
+        return ObservedEventBus(event_bus, observers + self.process_observers())
+
+    def process_observers(self) -> List[ProcessObserver]:
+        return [self.metrics_service.collector] if self.metrics_service else []
+
+    @property
+    @singleton
+    def routed_event_bus(self) -> RoutedKombuEventBus:
+        if self.config_manager.get_config("cltl.event").get("implementation") != "kombu":
+            return None
+
+        config = self.config_manager.get_config("cltl.event.kombu")
+        if "routing" not in config or config.get("routing") != "tenant":
+            return None
+
+        return RoutedKombuEventBus.from_config(self.event_bus_serializer, self.config_manager, self.topic_lanes)
+
+    @property
+    @singleton
+    def topic_lanes(self) -> TopicLanes:
+        config = self.config_manager.get_config("cltl.event.lanes")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return TopicLanes.from_config(self.config_manager)
+
+    @property
+    @singleton
+    def membership(self) -> ReplicaMembership:
+        config = self.config_manager.get_config("app.scaling")
+        if config.get("mode") != "partitioned":
+            return None
+        if self.config_manager.get_config("cltl.event").get("implementation") == "kombu" and not self.routed_event_bus:
+            # The combot Kombu event bus shares one queue per topic, replicas would compete for the events
+            raise ValueError("Partitioned scaling requires 'routing: tenant' in [cltl.event.kombu]")
+
+        return ReplicaMembership.from_config(self.config_manager, self.routed_event_bus)
+
+    @property
+    @singleton
+    def admin_service(self):
+        config = self.config_manager.get_config("app.admin")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return AdminService.from_config(self.config_manager)
+
+    @property
+    @singleton
+    def health_service(self) -> HealthService:
+        return HealthService.from_config(self.readiness_checks(), lambda: topic_workers_idle(self.event_bus), self.config_manager)
+
+    @property
+    @singleton
+    def metrics_service(self):
+        config = self.config_manager.get_config("app.metrics")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return MetricsService(MetricsCollector())
+
+    def readiness_checks(self) -> Dict[str, Callable[[], bool]]:
+        checks = {
+            "event_bus": lambda: event_bus_connected(self.event_bus),
+            "topic_workers": lambda: topic_workers_alive(self),
+        }
+        if self.membership:
+            checks["membership"] = lambda: self.membership.discovered
+
+        return checks
+
+    def start(self):
+        if self.membership:
+            self.membership.start(self.event_bus)
+
+    def stop(self):
+        if self.membership:
+            self.membership.stop()
+        if self.admin_service:
+            self.admin_service.stop()
+
+
+class SessionContainer(InfraContainer):
+    @property
+    @singleton
+    def session_service(self) -> SessionStateService:
+        config = self.config_manager.get_config("app.session")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return SessionStateService.from_config(SessionStore.from_config(self.config_manager),
+                                               self.event_bus_serializer, self.event_bus, self.resource_manager,
+                                               self.config_manager, self.session_restorers())
+
+    @property
+    @singleton
+    def session_reaper(self) -> SessionReaper:
+        config = self.config_manager.get_config("app.reaper")
+        if not config.get_boolean("enabled"):
+            return None
+
+        return SessionReaper.from_config(self.event_bus, self.resource_manager, self.config_manager,
+                                         self.session_releasers(), self.routed_event_bus)
+
+    def session_restorers(self) -> List[Callable[[SessionState], None]]:
+        return []
+
+    def session_releasers(self) -> List[Callable[[str], None]]:
+        return [self.session_service.release] if self.session_service else []
+
     def start(self):
-        pass
+        super().start()
+        if self.session_service:
+            logger.info("Start Session State")
+            self.event_bus.add_observer(self.session_service)
+            self.session_service.start()
+        if self.session_reaper:
+            logger.info("Start Session Reaper")
+            self.session_reaper.start()
 
     def stop(self):
-        pass
+        if self.session_reaper:
+            logger.info("Stop Session Reaper")
+            self.session_reaper.stop()
+        if self.session_service:
+            logger.info("Stop Session State")
+            self.session_service.stop()
+        super().stop()
 
 
 class EmissorStorageContainer(InfraContainer):
@@ -84,20 +239,27 @@ class EmissorStorageContainer(InfraContainer):
     @property
     @singleton
     def emissor_data_client(self) -> EmissorDataClient:
-        return EmissorDataClient("http://0.0.0.0:8000/emissor")
+        return LocalEmissorDataClient.from_config(self.emissor_storage, self.config_manager)
+
+    @property
+    @singleton
+    def emissor_query_service(self) -> EmissorQueryService:
+        return EmissorQueryService.from_config(self.event_bus, self.resource_manager, self.config_manager)
 
     def start(self):
         logger.info("Start Emissor Data Storage")
         super().start()
         self.emissor_data_service.start()
+        self.emissor_query_service.start()
 
     def stop(self):
         logger.info("Stop Emissor Data Storage")
+        self.emissor_query_service.stop()
         self.emissor_data_service.stop()
         super().stop()
 
 
-class LLMContainer(EmissorStorageContainer, InfraContainer):
+class LLMContainer(EmissorStorageContainer, SessionContainer):
     @property
     @singleton
     def llm(self) -> LLM:
@@ -123,14 +285,29 @@ class LLMContainer(EmissorStorageContainer, InfraContainer):
         return LLMService.from_config(self.llm, self.emissor_data_client,
                                         self.event_bus, self.resource_manager, self.config_manager, self.emissor_storage)
 
+    @property
+    @singleton
+    def deadline_service(self) -> DeadlineService:
+        return DeadlineService.from_config(self.event_bus, self.resource_manager, self.config_manager,
+                                           self.config_manager.get_config("cltl.llm").get("model"),
+                                           self.routed_event_bus)
+
+    def readiness_checks(self) -> Dict[str, Callable[[], bool]]:
+        checks = super().readiness_checks()
+        checks["llm"] = lambda: url_reachable(self.config_manager.get_config("cltl.llm").get("url"))
+
+        return checks
+
     def start(self):
         logger.info("Start LLM")
         super().start()
+        self.deadline_service.start()
         self.llm_service.start()
 
     def stop(self):
         logger.info("Stop LLM")
         self.llm_service.stop()
+        self.deadline_service.stop()
         super().stop()
 
 
@@ -140,8 +317,13 @@ class ApplicationContainer(LLMContainer, EmissorStorageContainer):
     def log_writer(self):
         config = self.config_manager.get_config("cltl.event_log")
 
-        # Serialize in a plain JSON format
-        return LogWriter(config.get("log_dir"), emissor_serializer)
+        if "writer" in config and config.get("writer") == "buffered":
+            writer = BufferedLogWriter.from_config(emissor_serializer, self.config_manager)
+        else:
+            # Serialize in a plain JSON format
+            writer = LogWriter(config.get("log_dir"), emissor_serializer)
+
+        return PolicyLogWriter(writer, EventLogPolicy.from_config(emissor_serializer, self.config_manager))
 
     @property
     @singleton
@@ -151,12 +333,18 @@ class ApplicationContainer(LLMContainer, EmissorStorageContainer):
     def start(self):
         logger.info("Start EventLog")
         super().start()
+        if isinstance(self.log_writer.writer, BufferedLogWriter):
+            self.log_writer.writer.start()
         self.event_log_service.start()
+        self.health_service.set_started()
 
     def stop(self):
+        self.health_service.set_started(False)
         try:
             logger.info("Stop EventLog")
             self.event_log_service.stop()
+            if isinstance(self.log_writer.writer, BufferedLogWriter):
+                self.log_writer.writer.stop()
         finally:
             try:
                 logger.info("Stop EventBus")
@@ -174,14 +362,25 @@ def main():
     with application as started_app:
         routes = {
             '/emissor': started_app.emissor_data_service.app,
+            '/emissor/query': started_app.emissor_query_service.app,
+            '/deadline': started_app.deadline_service.app,
+            '/health': started_app.health_service.app,
         }
+        if started_app.membership:
+            routes['/scaling'] = started_app.membership.app
+        if started_app.admin_service:
+            routes['/admin'] = started_app.admin_service.app
+        if started_app.metrics_service:
+            routes['/metrics'] = started_app.metrics_service.app
+        if started_app.session_reaper:
+            routes['/sessions'] = started_app.session_reaper.app
 
         web_app = DispatcherMiddleware(Flask("LLM server app"), routes)
 
         port = started_app.config_manager.get_config("app.server").get_int("port")
         run_simple('0.0.0.0', port, web_app, threaded=True, use_reloader=False, use_debugger=False, use_evalex=True)
 
-        time.sleep(1)
+        started_app.health_service.wait_idle()
 
 
 if __name__ == '__main__':
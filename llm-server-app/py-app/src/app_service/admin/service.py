@@ -0,0 +1,131 @@
+import logging
+
+from cltl.combot.infra.config import ConfigurationManager
+from flask import Flask, Response, jsonify, request
+
+from app_service.admin.profiler import AllocationTracker, SamplingProfiler
+
+logger = logging.getLogger(__name__)
+
+
+_KEY_TYPES = ("filename", "lineno", "traceback")
+
+
+class AdminService:
+    """Profiling endpoints that can be used while the application is serving.
+
+    ``/profiler`` starts (POST ``/profiler/start``) and stops (POST ``/profiler/stop``)
+    a sampling profiler over the TopicWorker threads and returns the collapsed
+    stacks (GET ``/profiler/stacks``). ``/memory`` starts and stops tracing of
+    allocations, takes snapshots with their top allocations and diffs two snapshots.
+    ``/startup`` returns the phases of the application start, if a startup report is provided.
+    """
+    @classmethod
+    def from_config(cls, config_manager: ConfigurationManager, startup_report=None):
+        config = config_manager.get_config("app.admin")
+        max_snapshots = config.get_int("max_snapshots") if "max_snapshots" in config else 10
+
+        return cls(SamplingProfiler(), AllocationTracker(max_snapshots), startup_report)
+
+    def __init__(self, profiler: SamplingProfiler, allocations: AllocationTracker, startup_report=None):
+        self._profiler = profiler
+        self._allocations = allocations
+        self._startup_report = startup_report
+        self._app = None
+
+    def stop(self):
+        self._profiler.stop()
+        self._allocations.stop()
+
+    @property
+    def app(self):
+        if self._app:
+            return self._app
+
+        self._app = Flask(__name__)
+
+        @self._app.route('/profiler', methods=['GET'])
+        def profiler_status():
+            return jsonify(self._profiler.status())
+
+        @self._app.route('/profiler/start', methods=['POST'])
+        def profiler_start():
+            try:
+                self._profiler.start(request.args.get("interval", default=0.01, type=float),
+                                     request.args.get("duration", default=60.0, type=float),
+                                     request.args.get("threads", default="workers") == "all")
+            except ValueError as e:
+                return Response(str(e), status=409)
+
+            return jsonify(self._profiler.status())
+
+        @self._app.route('/profiler/stop', methods=['POST'])
+        def profiler_stop():
+            self._profiler.stop()
+            return Response(self._profiler.collapsed(), mimetype="text/plain")
+
+        @self._app.route('/profiler/stacks', methods=['GET'])
+        def profiler_stacks():
+            return Response(self._profiler.collapsed(), mimetype="text/plain")
+
+        @self._app.route('/memory', methods=['GET'])
+        def memory_status():
+            return jsonify(self._allocations.status())
+
+        @self._app.route('/memory/start', methods=['POST'])
+        def memory_start():
+            self._allocations.start(request.args.get("frames", default=1, type=int))
+            return jsonify(self._allocations.status())
+
+        @self._app.route('/memory/stop', methods=['POST'])
+        def memory_stop():
+            self._allocations.stop()
+            return jsonify(self._allocations.status())
+
+        @self._app.route('/memory/snapshot', methods=['POST'])
+        def memory_snapshot():
+            try:
+                stat_args = self._stat_args()
+            except ValueError as e:
+                return Response(str(e), status=400)
+
+            try:
+                snapshot_id = self._allocations.snapshot()
+            except ValueError as e:
+                return Response(str(e), status=409)
+
+            return jsonify({"id": snapshot_id, "top": self._allocations.top(snapshot_id, **stat_args)})
+
+        @self._app.route('/memory/diff', methods=['GET'])
+        def memory_diff():
+            try:
+                stat_args = self._stat_args()
+            except ValueError as e:
+                return Response(str(e), status=400)
+
+            try:
+                diff = self._allocations.diff(request.args.get("from", type=int), request.args.get("to", type=int),
+                                              **stat_args)
+            except KeyError as e:
+                return Response(str(e), status=404)
+
+            return jsonify(diff)
+
+        @self._app.route('/startup', methods=['GET'])
+        def startup():
+            if not self._startup_report:
+                return Response("No startup report available", status=404)
+
+            return jsonify(self._startup_report.to_dict())
+
+        return self._app
+
+    def _stat_args(self):
+        key_type = request.args.get("key", default="lineno")
+        if key_type not in _KEY_TYPES:
+            raise ValueError(f"Unsupported key {key_type}, supported: {', '.join(_KEY_TYPES)}")
+
+        return {
+            "key_type": key_type,
+            "limit": request.args.get("limit", default=20, type=int),
+        }
@@ -0,0 +1,266 @@
+import bisect
+import json
+import logging
+import os
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, asdict
+from typing import FrozenSet, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_MODALITIES = ("text", "audio", "image", "video")
+
+
+def tokenize(text: str) -> List[str]:
+    return [token.lower() for token in _TOKEN.findall(text or "")]
+
+
+@dataclass
+class SignalEntry:
+    scenario_id: str
+    signal_id: str
+    modality: str
+    start: int
+    end: int
+    speaker: Optional[str]
+    agent: Optional[str]
+    text: Optional[str]
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class _ScenarioIndex:
+    def __init__(self, scenario_id: str, speaker: Optional[str], agent: Optional[str], start: int, end: Optional[int]):
+        self.scenario_id = scenario_id
+        self.speaker = speaker
+        self.agent = agent
+        self.start = start
+        self.end = end
+        self.signature = None
+        self.entries = []
+        self.starts = []
+        self.ids = set()
+
+    def add(self, entry: SignalEntry) -> bool:
+        if entry.signal_id in self.ids:
+            return False
+
+        position = bisect.bisect_right(self.starts, entry.start)
+        self.starts.insert(position, entry.start)
+        self.entries.insert(position, entry)
+        self.ids.add(entry.signal_id)
+
+        return True
+
+    def range(self, start: Optional[int], end: Optional[int]) -> List[SignalEntry]:
+        lower = bisect.bisect_left(self.starts, start) if start is not None else 0
+        upper = bisect.bisect_right(self.starts, end) if end is not None else len(self.starts)
+
+        return self.entries[lower:upper]
+
+
+class EmissorIndex:
+    """Incremental index over the scenarios stored in EMISSOR layout.
+
+    Per scenario signals are kept sorted by start time, in addition there is an
+    index from speaker and agent names to scenarios and an inverted index from
+    text tokens to signals. Scenarios are re-read from disk only if their files
+    changed since they were last indexed.
+    """
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.RLock()
+        self._scenarios = dict()
+        self._by_person = defaultdict(set)
+        self._tokens = defaultdict(set)
+        self._signals = dict()
+
+    @property
+    def scenario_count(self):
+        return len(self._scenarios)
+
+    def refresh(self):
+        """Index all scenarios that were added or changed on disk."""
+        if not os.path.isdir(self._path):
+            return
+
+        updated = 0
+        for scenario_id in os.listdir(self._path):
+            if os.path.isdir(os.path.join(self._path, scenario_id)):
+                updated += self.update(scenario_id)
+
+        if updated:
+            logger.info("Indexed %s scenarios, %s in total", updated, len(self._scenarios))
+
+    def update(self, scenario_id: str) -> bool:
+        scenario_dir = os.path.join(self._path, scenario_id)
+        signature = self._signature(scenario_dir)
+        with self._lock:
+            if scenario_id in self._scenarios and self._scenarios[scenario_id].signature == signature:
+                return False
+
+        scenario_file = os.path.join(scenario_dir, scenario_id + ".json")
+        if not os.path.isfile(scenario_file):
+            return False
+
+        try:
+            with open(scenario_file) as f:
+                scenario_json = json.load(f)
+            signals = [signal for modality in _MODALITIES
+                       for signal in self._read_signals(scenario_dir, modality)]
+        except (OSError, ValueError):
+            logger.warning("Failed to index scenario %s", scenario_id, exc_info=True)
+            return False
+
+        context = scenario_json.get("context") or {}
+        scenario = _ScenarioIndex(scenario_id, self._name(context.get("speaker")), self._name(context.get("agent")),
+                                  scenario_json.get("start"), scenario_json.get("end"))
+        scenario.signature = signature
+
+        with self._lock:
+            previous = self._scenarios.get(scenario_id)
+            self._remove(scenario_id)
+            self._scenarios[scenario_id] = scenario
+            for person in filter(None, (scenario.speaker, scenario.agent)):
+                self._by_person[person.lower()].add(scenario_id)
+            for signal_json in signals:
+                self._add(scenario, self._entry(scenario, signal_json))
+            # Keep signals added from events that are not yet written to disk
+            for entry in previous.entries if previous else []:
+                entry.speaker, entry.agent = scenario.speaker, scenario.agent
+                self._add(scenario, entry)
+
+        return True
+
+    def add_signal(self, scenario_id: str, signal_id: str, modality: str, start: int, end: int, text: str = None):
+        """Add a single signal of a running scenario without reading the scenario from disk."""
+        with self._lock:
+            scenario = self._scenarios.get(scenario_id)
+            if not scenario:
+                scenario = _ScenarioIndex(scenario_id, None, None, start, None)
+                self._scenarios[scenario_id] = scenario
+            self._add(scenario, SignalEntry(scenario_id, signal_id, modality.lower(), start, end,
+                                            scenario.speaker, scenario.agent, text))
+
+    def signals(self, start: int = None, end: int = None, speaker: str = None, modality: str = None,
+                scenario_id: str = None, limit: int = 100) -> List[SignalEntry]:
+        """Signals in a time range, ordered by scenario and start time."""
+        with self._lock:
+            results = []
+            for scenario in self._candidate_scenarios(speaker, scenario_id):
+                if not self._overlaps(scenario, start, end):
+                    continue
+                results.extend(entry for entry in scenario.range(start, end)
+                               if not modality or entry.modality == modality.lower())
+                if len(results) >= limit:
+                    break
+
+            return results[:limit]
+
+    def search(self, keywords: str, start: int = None, end: int = None, speaker: str = None, modality: str = None,
+               scenario_id: str = None, limit: int = 100) -> List[SignalEntry]:
+        """Signals that contain all tokens of *keywords*, optionally restricted like :meth:`signals`."""
+        tokens = tokenize(keywords)
+        if not tokens:
+            return []
+
+        with self._lock:
+            matches = set.intersection(*(self._tokens.get(token, set()) for token in tokens))
+            scenarios = {scenario.scenario_id for scenario in self._candidate_scenarios(speaker, scenario_id)}
+            entries = (self._signals[key] for key in matches)
+            results = [entry for entry in entries
+                       if entry.scenario_id in scenarios
+                       and (start is None or entry.start >= start)
+                       and (end is None or entry.start <= end)
+                       and (not modality or entry.modality == modality.lower())]
+
+        return sorted(results, key=lambda entry: entry.start)[:limit]
+
+    def _candidate_scenarios(self, speaker: Optional[str], scenario_id: Optional[str]) -> Iterable[_ScenarioIndex]:
+        if scenario_id:
+            scenario_ids = {scenario_id} if scenario_id in self._scenarios else set()
+        elif speaker:
+            scenario_ids = self._by_person.get(speaker.lower(), set())
+        else:
+            scenario_ids = self._scenarios.keys()
+
+        return sorted((self._scenarios[scenario_id] for scenario_id in scenario_ids),
+                      key=lambda scenario: scenario.start or 0)
+
+    def _add(self, scenario: _ScenarioIndex, entry: SignalEntry):
+        if not scenario.add(entry):
+            return
+
+        key = (scenario.scenario_id, entry.signal_id)
+        self._signals[key] = entry
+        for token in set(tokenize(entry.text)):
+            self._tokens[token].add(key)
+
+    def _remove(self, scenario_id: str):
+        scenario = self._scenarios.pop(scenario_id, None)
+        if not scenario:
+            return
+
+        for person in filter(None, (scenario.speaker, scenario.agent)):
+            self._by_person[person.lower()].discard(scenario_id)
+        for entry in scenario.entries:
+            key = (scenario_id, entry.signal_id)
+            self._signals.pop(key, None)
+            for token in set(tokenize(entry.text)):
+                self._tokens[token].discard(key)
+                if not self._tokens[token]:
+                    del self._tokens[token]
+
+    def _read_signals(self, scenario_dir: str, modality: str) -> List[dict]:
+        signals = []
+        signal_file = os.path.join(scenario_dir, modality + ".json")
+        if os.path.isfile(signal_file):
+            with open(signal_file) as f:
+                signals.extend(json.load(f))
+
+        # Segments of the append-only storage of a running scenario
+        segment_file = os.path.join(scenario_dir, "segments", modality + ".jsonl")
+        if os.path.isfile(segment_file):
+            with open(segment_file) as f:
+                signals.extend(json.loads(line)["signal"] for line in f if '"signal":' in line[:12])
+
+        return signals
+
+    @staticmethod
+    def _entry(scenario: _ScenarioIndex, signal_json: dict) -> SignalEntry:
+        time = signal_json.get("time") or {}
+        modality = str(signal_json.get("modality", "")).split(".")[-1].lower()
+        text = signal_json.get("text")
+        if text is None and isinstance(signal_json.get("seq"), list):
+            text = "".join(token for token in signal_json["seq"] if isinstance(token, str))
+
+        return SignalEntry(scenario.scenario_id, signal_json["id"], modality, time.get("start") or 0,
+                           time.get("end") or 0, scenario.speaker, scenario.agent, text)
+
+    @staticmethod
+    def _overlaps(scenario: _ScenarioIndex, start: Optional[int], end: Optional[int]) -> bool:
+        if start is not None and scenario.end is not None and scenario.end < start:
+            return False
+        if end is not None and scenario.start is not None and scenario.start > end:
+            return False
+
+        return True
+
+    @staticmethod
+    def _name(agent: Optional[dict]) -> Optional[str]:
+        return agent.get("name") if isinstance(agent, dict) else None
+
+    @staticmethod
+    def _signature(scenario_dir: str) -> FrozenSet:
+        signature = set()
+        for directory in (scenario_dir, os.path.join(scenario_dir, "segments")):
+            if os.path.isdir(directory):
+                signature.update((entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+                                 for entry in os.scandir(directory) if entry.name.endswith(("json", "jsonl")))
+
+        return frozenset(signature)
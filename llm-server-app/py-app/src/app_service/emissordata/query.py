@@ -0,0 +1,104 @@
+import logging
+
+from cltl.combot.event.emissor import ScenarioEvent, ScenarioStarted, ScenarioStopped, TextSignalEvent
+from cltl.combot.infra.config import ConfigurationManager
+from cltl.combot.infra.event import Event, EventBus
+from cltl.combot.infra.resource import ResourceManager
+from cltl.combot.infra.topic_worker import TopicWorker
+from flask import Flask, jsonify, request
+
+from app_service.emissordata.index import EmissorIndex
+
+logger = logging.getLogger(__name__)
+
+
+class EmissorQueryService:
+    """Range and keyword queries over the stored EMISSOR scenarios.
+
+    The :class:`EmissorIndex` is built from the storage folder on start and
+    maintained from the scenario and text events on the event bus.
+    """
+    @classmethod
+    def from_config(cls, event_bus: EventBus, resource_manager: ResourceManager,
+                    config_manager: ConfigurationManager):
+        path = config_manager.get_config("cltl.emissor-data").get("path")
+        config = config_manager.get_config("cltl.emissor-data.query")
+        topics = config.get("topics", multi=True)
+        max_results = config.get_int("max_results") if "max_results" in config else 1000
+
+        return cls(EmissorIndex(path), topics, max_results, event_bus, resource_manager)
+
+    def __init__(self, index: EmissorIndex, topics, max_results: int,
+                 event_bus: EventBus, resource_manager: ResourceManager):
+        self._index = index
+        self._topics = topics
+        self._max_results = max_results
+        self._event_bus = event_bus
+        self._resource_manager = resource_manager
+
+        self._topic_worker = None
+        self._app = None
+
+    @property
+    def index(self) -> EmissorIndex:
+        return self._index
+
+    def start(self, timeout=30):
+        self._index.refresh()
+        self._topic_worker = TopicWorker(self._topics, self._event_bus,
+                                         buffer_size=64, processor=self._process,
+                                         resource_manager=self._resource_manager,
+                                         name=self.__class__.__name__)
+        self._topic_worker.start().wait()
+
+    def stop(self):
+        if not self._topic_worker:
+            return
+
+        self._topic_worker.stop()
+        self._topic_worker.await_stop()
+        self._topic_worker = None
+
+    @property
+    def app(self):
+        if self._app:
+            return self._app
+
+        self._app = Flask(__name__)
+
+        @self._app.route('/signals', methods=['GET'])
+        def signals():
+            results = self._index.signals(**self._query_args())
+            return jsonify([entry.to_dict() for entry in results])
+
+        @self._app.route('/search', methods=['GET'])
+        def search():
+            keywords = request.args.get("q", "")
+            results = self._index.search(keywords, **self._query_args())
+            return jsonify([entry.to_dict() for entry in results])
+
+        @self._app.route('/refresh', methods=['POST'])
+        def refresh():
+            self._index.refresh()
+            return jsonify({"scenarios": self._index.scenario_count})
+
+        return self._app
+
+    def _query_args(self):
+        return {
+            "start": request.args.get("start", type=int),
+            "end": request.args.get("end", type=int),
+            "speaker": request.args.get("speaker"),
+            "modality": request.args.get("modality"),
+            "scenario_id": request.args.get("scenario"),
+            "limit": min(request.args.get("limit", default=100, type=int), self._max_results),
+        }
+
+    def _process(self, event: Event):
+        payload = event.payload
+        if isinstance(payload, (ScenarioStarted, ScenarioEvent, ScenarioStopped)):
+            self._index.update(payload.scenario.id)
+        elif isinstance(payload, TextSignalEvent):
+            signal = payload.signal
+            self._index.add_signal(signal.time.container_id, signal.id, "text",
+                                   signal.time.start, signal.time.end, signal.text)
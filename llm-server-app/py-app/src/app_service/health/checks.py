@@ -0,0 +1,76 @@
+import logging
+import urllib.error
+import urllib.request
+from typing import Dict, Optional
+
+from cltl.combot.infra.event import EventBus
+
+from app_service.event_bus.observed import ObservedEventBus
+
+logger = logging.getLogger(__name__)
+
+
+def topic_workers(container) -> Dict[str, object]:
+    """The TopicWorkers of the services of an application container, by service name."""
+    workers = {}
+    for name in dir(type(container)):
+        if not name.endswith("_service"):
+            continue
+        try:
+            service = getattr(container, name)
+        except Exception:
+            continue
+        worker = getattr(service, "_topic_worker", None) if service else None
+        if worker is not None:
+            workers[name] = worker
+
+    return workers
+
+
+def topic_workers_alive(container) -> bool:
+    workers = topic_workers(container)
+    stopped = [name for name, worker in workers.items() if not worker.is_alive()]
+    if stopped:
+        logger.debug("TopicWorkers not running: %s", stopped)
+
+    return not stopped
+
+
+def topic_workers_idle(event_bus: ObservedEventBus) -> bool:
+    return not any(event_bus.pending().values())
+
+
+def event_bus_connected(event_bus: EventBus, timeout: float = 1.0) -> bool:
+    """Check that the broker of a Kombu event bus is reachable, an in-memory event bus is always connected.
+
+    The connection of the event bus itself is only used to create the connections
+    of its producers and consumers, the broker is reached with a short-lived clone.
+    """
+    connection = getattr(event_bus, "_connection", None) or getattr(event_bus, "connection", None)
+    if connection is None or not hasattr(connection, "clone"):
+        return True
+
+    probe = connection.clone(connect_timeout=timeout)
+    try:
+        probe.ensure_connection(max_retries=1, interval_start=0, interval_step=0, interval_max=0)
+        return True
+    except Exception as e:
+        logger.debug("Broker of the event bus not reachable: %s", e)
+        return False
+    finally:
+        probe.release()
+
+
+def url_reachable(url: Optional[str], timeout: float = 1.0) -> bool:
+    """Any HTTP response counts as reachable, the endpoint may not support GET on the base URL."""
+    if not url:
+        return True
+
+    try:
+        with urllib.request.urlopen(url, timeout=timeout):
+            return True
+    except urllib.error.HTTPError:
+        return True
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        logger.debug("%s not reachable: %s", url, e)
+        return False
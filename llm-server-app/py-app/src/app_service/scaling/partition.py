@@ -0,0 +1,317 @@
+import functools
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+
+from cltl.combot.infra.config import ConfigurationManager
+from cltl.combot.infra.event import Event, EventBus
+from flask import Flask, jsonify
+
+from app_service.event_bus.routed import RoutedKombuEventBus
+from app_service.scaling.ring import HashRing
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReplicaEvent:
+    type: str
+    replica: str
+    timestamp: float
+
+
+def default_replica_id() -> str:
+    return f"{os.environ.get('HOSTNAME') or socket.gethostname()}-{os.getpid()}"
+
+
+def partition_key(event: Event, tenant: Optional[str] = None) -> Optional[str]:
+    """The *tenant* of the event, or the scenario it belongs to if it has no tenant."""
+    if tenant:
+        return tenant
+
+    payload = event.payload
+    scenario = getattr(payload, "scenario", None)
+    if scenario is not None and getattr(scenario, "id", None):
+        return scenario.id
+
+    signal = getattr(payload, "signal", None)
+    container_id = getattr(getattr(signal, "time", None), "container_id", None)
+    if container_id:
+        return container_id
+
+    return None
+
+
+def _field(payload, name: str):
+    return payload.get(name) if isinstance(payload, dict) else getattr(payload, name, None)
+
+
+class ReplicaMembership:
+    """Tracks the running replicas of a service and assigns partition keys to them.
+
+    Replicas announce themselves with heartbeats on the membership topic and
+    leave with a final announcement on stop, replicas without heartbeat within
+    *member_timeout* are removed. Partition keys are assigned to replicas with
+    a consistent hash ring, such that on join or leave only the keys of the
+    affected ring segments move to another replica. Events without partition
+    key are owned by the first replica in the ring.
+
+    A starting replica does not know the other replicas yet, it is
+    :attr:`discovered` once it received the heartbeats of the running replicas,
+    i.e. after two heartbeat intervals. The tenant of an event is taken from
+    the routing of the event on the *routed_event_bus*.
+    """
+    @classmethod
+    def from_config(cls, config_manager: ConfigurationManager,
+                    routed_event_bus: Optional[RoutedKombuEventBus] = None):
+        config = config_manager.get_config("app.scaling")
+        replica_id = config.get("replica_id") if "replica_id" in config else None
+
+        return cls(replica_id or default_replica_id(), config.get("membership_topic"),
+                   config.get_float("heartbeat_interval"), config.get_float("member_timeout"),
+                   routed_event_bus=routed_event_bus)
+
+    def __init__(self, replica_id: str, membership_topic: str, heartbeat_interval: float = 2.0,
+                 member_timeout: float = 10.0, max_keys: int = 10000,
+                 routed_event_bus: Optional[RoutedKombuEventBus] = None):
+        self._replica_id = replica_id
+        self._membership_topic = membership_topic
+        self._heartbeat_interval = heartbeat_interval
+        self._member_timeout = member_timeout
+        self._max_keys = max_keys
+        self._routed_event_bus = routed_event_bus
+        self._discovery = 2 * heartbeat_interval
+
+        self._lock = threading.Lock()
+        self._members = {replica_id: time.monotonic()}
+        self._ring = HashRing([replica_id])
+        self._keys = OrderedDict()
+        self._rebalances = 0
+        self._owned = 0
+        self._skipped = 0
+
+        self._event_bus = None
+        self._thread = None
+        self._started = None
+        self._discovered = threading.Event()
+        self._discovery_callbacks = []
+        self._running = threading.Event()
+        self._wakeup = threading.Event()
+        self._app = None
+
+    @property
+    def replica_id(self) -> str:
+        return self._replica_id
+
+    @property
+    def discovered(self) -> bool:
+        """Whether the replica received the heartbeats of the running replicas."""
+        return self._discovered.is_set()
+
+    def start(self, event_bus: EventBus):
+        self._event_bus = event_bus
+        self._event_bus.subscribe(self._membership_topic, self._on_member)
+        self._started = time.monotonic()
+        self._discovered.clear()
+        self._running.set()
+        self._wakeup.clear()
+        self._announce("heartbeat")
+        self._thread = threading.Thread(target=self._heartbeat, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+        logger.info("Started replica %s", self._replica_id)
+
+    def stop(self):
+        if not self._running.is_set():
+            return
+
+        self._running.clear()
+        self._wakeup.set()
+        self._thread.join()
+        self._announce("leave")
+        self._event_bus.unsubscribe(self._membership_topic, self._on_member)
+        logger.info("Stopped replica %s", self._replica_id)
+
+    def on_discovered(self, callback: Callable[[], None]):
+        """Call *callback* once the replica discovered the running replicas."""
+        with self._lock:
+            if not self._discovered.is_set():
+                self._discovery_callbacks.append(callback)
+                return
+
+        callback()
+
+    def owns(self, event: Event) -> bool:
+        tenant = self._routed_event_bus.tenant_of(event) if self._routed_event_bus else None
+        key = partition_key(event, tenant)
+        with self._lock:
+            if key is None:
+                owned = min(self._ring.members) == self._replica_id
+            else:
+                owned = self._ring.owner(key) == self._replica_id
+            if owned and key is not None:
+                self._keys[key] = True
+                self._keys.move_to_end(key)
+                while len(self._keys) > self._max_keys:
+                    self._keys.popitem(last=False)
+            if owned:
+                self._owned += 1
+            else:
+                self._skipped += 1
+
+        return owned
+
+    def status(self) -> dict:
+        with self._lock:
+            return {"replica": self._replica_id, "members": sorted(self._members), "discovered": self.discovered,
+                    "rebalances": self._rebalances,
+                    "owned_events": self._owned, "skipped_events": self._skipped, "keys": len(self._keys)}
+
+    @property
+    def app(self):
+        if self._app:
+            return self._app
+
+        self._app = Flask(__name__)
+
+        @self._app.route('/', methods=['GET'])
+        def status():
+            return jsonify(self.status())
+
+        return self._app
+
+    def _announce(self, event_type: str):
+        self._event_bus.publish(self._membership_topic,
+                                Event.for_payload(ReplicaEvent(event_type, self._replica_id, time.time())))
+
+    def _heartbeat(self):
+        while self._running.is_set():
+            try:
+                self._announce("heartbeat")
+                now = time.monotonic()
+                with self._lock:
+                    expired = [member for member, seen in self._members.items()
+                               if member != self._replica_id and now - seen > self._member_timeout]
+                if expired:
+                    logger.warning("Replicas %s timed out", expired)
+                    self._update(remove=expired)
+                if not self._discovered.is_set() and now - self._started >= self._discovery:
+                    self._set_discovered()
+            except Exception:
+                logger.exception("Failed to send heartbeat of replica %s", self._replica_id)
+            self._wakeup.wait(self._heartbeat_interval)
+
+    def _set_discovered(self):
+        with self._lock:
+            self._discovered.set()
+            callbacks, self._discovery_callbacks = self._discovery_callbacks, []
+            logger.info("Replica %s discovered replicas %s", self._replica_id, sorted(self._members))
+
+        for callback in callbacks:
+            callback()
+
+    def _on_member(self, event: Event):
+        event_type = _field(event.payload, "type")
+        replica = _field(event.payload, "replica")
+        if not replica or replica == self._replica_id:
+            return
+
+        if event_type == "leave":
+            self._update(remove=[replica])
+        else:
+            self._update(add=[replica])
+
+    def _update(self, add: Iterable[str] = (), remove: Iterable[str] = ()):
+        now = time.monotonic()
+        with self._lock:
+            for member in add:
+                self._members[member] = now
+            for member in remove:
+                self._members.pop(member, None)
+
+            if set(self._members) == self._ring.members:
+                return
+
+            ring = self._ring.with_members(self._members)
+            moved = [key for key in self._ring.moved(ring, self._keys) if ring.owner(key) != self._replica_id]
+            for key in moved:
+                del self._keys[key]
+            self._ring = ring
+            self._rebalances += 1
+
+        logger.info("Rebalanced partitions over replicas %s, moved %s conversations from %s",
+                    sorted(ring.members), len(moved), self._replica_id)
+
+
+class PartitionedEventBus(EventBus):
+    """Decorates an :class:`EventBus` to deliver events on partitioned topics only
+    to subscribers if the event's partition key is assigned to this replica.
+
+    Events are held until the replica discovered the running replicas and then
+    delivered in order.
+
+    Every replica must receive all events of the partitioned topics, i.e. the
+    decorated event bus must consume them from a queue of its own, such as the
+    subscription queues of the :class:`RoutedKombuEventBus`. On a queue shared by
+    the replicas, as the one per topic of the combot Kombu event bus, an event
+    delivered to a replica that does not own it would be lost.
+    """
+    def __init__(self, event_bus: EventBus, membership: ReplicaMembership, topics: Iterable[str]):
+        self._event_bus = event_bus
+        self._membership = membership
+        self._topics = set(topics)
+        self._handlers = dict()
+
+        self._lock = threading.Lock()
+        self._holding = True
+        self._held = []
+        self._membership.on_discovered(self._release)
+
+    def publish(self, topic: str, event: Event):
+        self._event_bus.publish(topic, event)
+
+    def subscribe(self, topic, handler):
+        if topic not in self._topics:
+            self._event_bus.subscribe(topic, handler)
+            return
+
+        @functools.wraps(handler)
+        def partitioned_handler(event):
+            with self._lock:
+                if self._holding:
+                    self._held.append((handler, event))
+                    return
+            if self._membership.owns(event):
+                return handler(event)
+
+        self._handlers[(topic, handler)] = partitioned_handler
+        self._event_bus.subscribe(topic, partitioned_handler)
+
+    def unsubscribe(self, topic, handler=None):
+        if handler is None:
+            self._event_bus.unsubscribe(topic)
+            return
+
+        self._event_bus.unsubscribe(topic, self._handlers.pop((topic, handler), handler))
+
+    def __getattr__(self, name):
+        return getattr(self._event_bus, name)
+
+    def _release(self):
+        while True:
+            with self._lock:
+                if not self._held:
+                    self._holding = False
+                    break
+                handler, event = self._held.pop(0)
+            try:
+                if self._membership.owns(event):
+                    handler(event)
+            except Exception:
+                logger.exception("Failed to deliver held event %s", event.id)
+
+        logger.info("Released held events of replica %s", self._membership.replica_id)
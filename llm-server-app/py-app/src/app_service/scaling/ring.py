@@ -0,0 +1,40 @@
+import bisect
+import hashlib
+from typing import Iterable, List, Optional
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes.
+
+    Adding or removing a member only moves the keys of the ring segments of
+    that member, all other keys stay with their current owner.
+    """
+    def __init__(self, members: Iterable[str] = (), replicas: int = 100):
+        self._replicas = replicas
+        self._members = frozenset(members)
+        self._ring = sorted((_hash(f"{member}#{idx}"), member)
+                            for member in self._members for idx in range(replicas))
+        self._hashes = [point for point, _ in self._ring]
+
+    @property
+    def members(self) -> frozenset:
+        return self._members
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._ring:
+            return None
+
+        idx = bisect.bisect(self._hashes, _hash(key)) % len(self._ring)
+
+        return self._ring[idx][1]
+
+    def with_members(self, members: Iterable[str]) -> "HashRing":
+        return HashRing(members, self._replicas)
+
+    def moved(self, other: "HashRing", keys: Iterable[str]) -> List[str]:
+        """The keys that have a different owner in the *other* ring."""
+        return [key for key in keys if self.owner(key) != other.owner(key)]
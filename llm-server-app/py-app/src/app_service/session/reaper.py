@@ -0,0 +1,186 @@
+import contextlib
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+from cltl.combot.event.emissor import ScenarioStopped
+from cltl.combot.infra.config import ConfigurationManager
+from cltl.combot.infra.event import Event, EventBus
+from cltl.combot.infra.resource import ResourceManager
+from cltl.combot.infra.time_util import timestamp_now
+from cltl.combot.infra.topic_worker import TopicWorker
+from emissor.representation.scenario import Scenario
+from flask import Flask, jsonify
+
+from app_service.event_bus.routed import RoutedKombuEventBus
+from app_service.session.service import session_id
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Activity:
+    tenant: Optional[str]
+    last: float
+    scenario: Optional[Scenario] = None
+
+
+def parse_timeouts(values: Iterable[str]) -> Dict[str, float]:
+    """Parse ``<tenant>:<seconds>`` entries."""
+    timeouts = {}
+    for value in values:
+        if not value:
+            continue
+        tenant, _, seconds = value.rpartition(":")
+        timeouts[tenant.strip()] = float(seconds)
+
+    return timeouts
+
+
+class SessionReaper:
+    """Stops sessions without activity within the idle timeout of their tenant.
+
+    The reaper publishes :class:`ScenarioStopped` for an idle session, such
+    that its EMISSOR data is flushed and the session state is removed, and
+    passes the session id to the *releasers* to free the remaining
+    session-scoped resources. Any event of the session on the activity topics
+    counts as activity.
+
+    The tenant of a session is taken from the routing of its events on the
+    *routed_event_bus*, the ScenarioStopped event is published in that tenant.
+    """
+    @classmethod
+    def from_config(cls, event_bus: EventBus, resource_manager: ResourceManager, config_manager: ConfigurationManager,
+                    releasers: Iterable[Callable[[str], None]] = (),
+                    routed_event_bus: Optional[RoutedKombuEventBus] = None):
+        config = config_manager.get_config("app.reaper")
+        tenant_timeouts = parse_timeouts(config.get("tenant_timeouts", multi=True)) \
+            if "tenant_timeouts" in config else {}
+
+        return cls(config.get("topic_scenario"), config.get("topics", multi=True),
+                   config.get_float("idle_timeout"), tenant_timeouts, config.get_float("check_interval"),
+                   event_bus, resource_manager, releasers, routed_event_bus)
+
+    def __init__(self, scenario_topic: str, topics: List[str], idle_timeout: float, tenant_timeouts: Dict[str, float],
+                 check_interval: float, event_bus: EventBus, resource_manager: ResourceManager,
+                 releasers: Iterable[Callable[[str], None]] = (),
+                 routed_event_bus: Optional[RoutedKombuEventBus] = None):
+        self._scenario_topic = scenario_topic
+        self._topics = [topic for topic in topics if topic and topic != scenario_topic]
+        self._idle_timeout = idle_timeout
+        self._tenant_timeouts = tenant_timeouts
+        self._check_interval = check_interval
+        self._event_bus = event_bus
+        self._resource_manager = resource_manager
+        self._releasers = list(releasers)
+        self._routed_event_bus = routed_event_bus
+
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, _Activity] = dict()
+        self._reaped = 0
+        self._stopped = 0
+
+        self._topic_worker = None
+        self._thread = None
+        self._running = threading.Event()
+        self._wakeup = threading.Event()
+        self._app = None
+
+    def start(self, timeout=30):
+        self._topic_worker = TopicWorker([self._scenario_topic] + self._topics, self._event_bus,
+                                         provides=[self._scenario_topic], buffer_size=64, processor=self._process,
+                                         resource_manager=self._resource_manager, name=self.__class__.__name__)
+        self._topic_worker.start().wait()
+
+        self._running.set()
+        self._wakeup.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{self.__class__.__name__}-check", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._topic_worker:
+            return
+
+        self._running.clear()
+        self._wakeup.set()
+        self._thread.join()
+        self._topic_worker.stop()
+        self._topic_worker.await_stop()
+        self._topic_worker = None
+
+    def status(self) -> dict:
+        with self._lock:
+            return {"active": len(self._sessions), "reaped": self._reaped, "stopped": self._stopped,
+                    "idle_timeout": self._idle_timeout, "tenant_timeouts": self._tenant_timeouts}
+
+    @property
+    def app(self):
+        if self._app:
+            return self._app
+
+        self._app = Flask(__name__)
+
+        @self._app.route('/', methods=['GET'])
+        def status():
+            return jsonify(self.status())
+
+        return self._app
+
+    def reap(self, now: Optional[float] = None) -> List[str]:
+        """Stop all idle sessions and return their ids."""
+        now = now if now is not None else time.monotonic()
+        with self._lock:
+            idle = {idle_id: activity for idle_id, activity in self._sessions.items()
+                    if now - activity.last > self._tenant_timeouts.get(activity.tenant, self._idle_timeout)}
+            for idle_id in idle:
+                del self._sessions[idle_id]
+            self._reaped += len(idle)
+
+        for idle_id, activity in idle.items():
+            logger.info("Stop session %s of tenant %s after %.0fs without activity",
+                        idle_id, activity.tenant, now - activity.last)
+            if activity.scenario is not None:
+                activity.scenario.ruler.end = timestamp_now()
+                with self._in_tenant(activity.tenant):
+                    self._event_bus.publish(self._scenario_topic,
+                                            Event.for_payload(ScenarioStopped.create(activity.scenario)))
+            for releaser in self._releasers:
+                try:
+                    releaser(idle_id)
+                except Exception:
+                    logger.exception("Failed to release session %s", idle_id)
+
+        return list(idle)
+
+    def _process(self, event: Event):
+        current_id = session_id(event)
+        if not current_id:
+            return
+
+        with self._lock:
+            if event.metadata.topic == self._scenario_topic and isinstance(event.payload, ScenarioStopped):
+                if self._sessions.pop(current_id, None):
+                    self._stopped += 1
+                return
+
+            activity = self._sessions.setdefault(current_id, _Activity(None, time.monotonic()))
+            activity.tenant = activity.tenant or self._tenant_of(event)
+            activity.last = time.monotonic()
+            if event.metadata.topic == self._scenario_topic:
+                activity.scenario = event.payload.scenario
+
+    def _tenant_of(self, event: Event) -> Optional[str]:
+        return self._routed_event_bus.tenant_of(event) if self._routed_event_bus else None
+
+    def _in_tenant(self, tenant: Optional[str]):
+        return self._routed_event_bus.in_tenant(tenant) if self._routed_event_bus else contextlib.nullcontext()
+
+    def _run(self):
+        while self._running.is_set():
+            try:
+                self.reap()
+            except Exception:
+                logger.exception("Failed to reap idle sessions")
+            self._wakeup.wait(self._check_interval)